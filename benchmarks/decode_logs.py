@@ -0,0 +1,111 @@
+# Compares the web3 event decoding path with fwx.decoder on synthetic logs.
+# Usage: python benchmarks/decode_logs.py [number_of_logs]
+import sys
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List
+)
+from eth_abi import encode
+from eth_utils import keccak
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+
+from fwx.constant import load_abi
+from fwx.contract import (
+    ERC20Contract,
+    FWXPerpCoreContract
+)
+from fwx.decoder import (
+    decode_logs,
+    event_topic
+)
+from fwx.w3 import get_offline_rpc_detail
+from fwx.registry import get_chain_registry
+
+CHAIN_ID = 8453
+# a token the registry knows, so building the wrapper needs no RPC
+TOKEN_ADDRESS = get_chain_registry(CHAIN_ID).get_token('USDC').address
+
+CORE_ADDRESS = Web3.to_checksum_address('0x' + '11'*20)
+OWNER = '0x' + 'ab'*20
+ROUTER = '0x' + 'cd'*20
+PAIR = b'\x01'*32
+
+def make_log(event_abi:Dict[str,Any],values:List[Any],address:str,block:int,index:int) -> Dict[str,Any]:
+    topics = ['0x' + event_topic(event_abi).hex()]
+    types:List[str] = []
+    data:List[Any] = []
+    for arg,value in zip(event_abi['inputs'],values):
+        if arg['indexed']:
+            topics.append('0x' + encode([arg['type']],[value]).hex())
+        else:
+            types.append(arg['type'])
+            data.append(value)
+    return {'address':address.lower(),
+            'topics':topics,
+            'data':'0x' + encode(types,data).hex(),
+            'blockNumber':hex(block),
+            'logIndex':hex(index),
+            'transactionIndex':'0x0',
+            'transactionHash':'0x' + keccak(block.to_bytes(8,'big') + index.to_bytes(4,'big')).hex(),
+            'blockHash':'0x' + keccak(block.to_bytes(32,'big')).hex(),
+            'removed':False}
+
+def make_logs(count:int) -> List[Dict[str,Any]]:
+    core_events = {e['name']:e for e in load_abi('FWX_PERP_CORE_ABI') if e['type'] == 'event'}
+    transfer = next(e for e in load_abi('ERC20_ABI') if e['type'] == 'event' and e['name'] == 'Transfer')
+    samples = [
+        (core_events['OpenPosition'],[OWNER,7,1,65000*10**18,5*10**18,10**18,True,PAIR,10**9,ROUTER],CORE_ADDRESS),
+        (core_events['ClosePosition'],[OWNER,7,1,10**18,66000*10**18,-1234*10**18,True,True,PAIR,10**9,ROUTER],CORE_ADDRESS),
+        (core_events['CollectFees'],[OWNER,7,1,PAIR,10**6,2*10**6,3*10**6,0,0,0],CORE_ADDRESS),
+        (core_events['LiquidatePosition'],[OWNER,7,2,False,ROUTER,10**18,64000*10**18,PAIR,ROUTER],CORE_ADDRESS),
+        (transfer,[OWNER,ROUTER,10**18],TOKEN_ADDRESS),
+    ]
+    return [make_log(*samples[i % len(samples)][:2],samples[i % len(samples)][2],1000 + i//10,i % 10) for i in range(count)]
+
+def run(name:str,decode:Callable[[List[Any]],List[Any]],logs:List[Any],repeat:int=3) -> List[Any]:
+    best = float('inf')
+    events:List[Any] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = decode(logs)
+        best = min(best,time.perf_counter() - start)
+    print(f"{name:<10} {len(events):>8} events {best*1000:>9.1f} ms {len(events)/best:>12,.0f} events/s")
+    return events
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    w3 = Web3()
+    rpc_detail = get_offline_rpc_detail('http://localhost:8545',CHAIN_ID)
+    core = FWXPerpCoreContract(w3,rpc_detail,CORE_ADDRESS)
+    token = ERC20Contract(w3,rpc_detail,TOKEN_ADDRESS)
+    # web3 formats logs from eth_getLogs before either decoder sees them
+    logs = [log_entry_formatter(log) for log in make_logs(count)]
+
+    # the current path: web3 decodes each log, then the SDK rebuilds it as a typed NamedTuple
+    processors = {
+        core.eventOpenPosition().topic:(core.eventOpenPosition(),core.get_process_open_position_event_log),
+        core.eventClosePosition().topic:(core.eventClosePosition(),core.get_process_close_position_event_log),
+        core.contract.events.CollectFees().topic:(core.contract.events.CollectFees(),lambda e:e),
+        core.contract.events.LiquidatePosition().topic:(core.contract.events.LiquidatePosition(),lambda e:e),
+        token.eventTransfer().topic:(token.eventTransfer(),token.process_transfer_event_log),
+    }
+    def decode_web3(logs:List[Any]) -> List[Any]:
+        events = []
+        for log in logs:
+            event,process = processors[log['topics'][0].to_0x_hex()]
+            events.append(process(event.process_log(log)))
+        return events
+
+    print(f"decoding {count} logs")
+    slow = run('web3',decode_web3,logs)
+    fast = run('fwx',decode_logs,logs)
+    # CollectFees and LiquidatePosition have no SDK processor on the web3 path, so only compare the others
+    mismatches = sum(1 for a,b in zip(slow,fast) if isinstance(a,tuple) and (a != b or a.args != b.args))
+    print(f"mismatches {mismatches}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+from typing import (
+    List,
+    Tuple,
+    Optional
+)
+from web3 import AsyncWeb3
+from eth_typing import (
+    ChecksumAddress,
+)
+from web3.types import (
+    BlockIdentifier,
+    Wei
+)
+
+from fwx.types import (
+    RPCDetail,
+    FWXPerpCoreGetPositionRespond,
+    FWXPerpCoreTPSLRespond,
+    FWXPerpHelperGetBalanceRespond,
+    FWXPerpHelperGetAllPositionRespond
+)
+from fwx.async_w3 import (
+    AsyncWeb3HTTP,
+)
+from fwx.contract import (
+    ERC20ContractBase,
+    FWXMembershipContractBase,
+    FWXPerpCoreContract,
+    FWXPerpHelperContractBase,
+)
+
+# The *Base classes only build ContractFunction objects, which works the same on
+# an AsyncWeb3 instance; mixing in AsyncWeb3HTTP swaps the blocking helpers for
+# coroutines and the methods below await the calls.
+
+class AsyncERC20Contract(ERC20ContractBase,AsyncWeb3HTTP):
+
+    def __init__(self,
+                 w3: AsyncWeb3,
+                 rpc_detail: RPCDetail,
+                 contract_address: ChecksumAddress
+                 ) -> None:
+        super().__init__(w3, rpc_detail, contract_address) # type: ignore
+        self.token_symbol:Optional[str] = None
+        self.decimal:Optional[int] = None
+        self.unit_type:Optional[str] = None
+        self.created_block = 0
+        token_detail = self.registry.find_token(self.address)
+        if token_detail is not None:
+            self.token_symbol = token_detail.symbol
+            self.decimal = token_detail.decimal
+            self.unit_type = token_detail.unit_type
+            self.created_block = token_detail.created_block
+
+    async def load_token_detail(self) -> None:
+        if self.token_symbol is not None:
+            return
+        self.token_symbol = await self.symbol().call()
+        self.decimal = await self.decimals().call()
+        if self.decimal == 18:
+            self.unit_type = 'ether'
+        elif self.decimal == 9:
+            self.unit_type = 'gwei'
+        else:
+            raise ValueError('Decimal is not 9 or 18')
+
+    async def get_balance_of(self,address:ChecksumAddress,block_identifier:BlockIdentifier='latest') -> Wei:
+
+        return await self.balanceOf(address).call(block_identifier=block_identifier)
+
+    async def get_balance_of_with_label(self,address:ChecksumAddress,block_identifier:BlockIdentifier='latest') -> Tuple[ChecksumAddress,Wei]:
+
+        return address,await self.get_balance_of(address,block_identifier)
+
+    async def get_allowance(self,owner:ChecksumAddress,spender:ChecksumAddress,block_identifier:BlockIdentifier='latest') -> Wei:
+
+        return await self.allowance(owner,spender).call(block_identifier=block_identifier)
+
+class AsyncFWXMembershipContract(FWXMembershipContractBase,AsyncWeb3HTTP):
+
+    def __init__(self,
+                 w3: AsyncWeb3,
+                 rpc_detail: RPCDetail,
+                 contract_address: ChecksumAddress
+                 ) -> None:
+        super().__init__(w3, rpc_detail, contract_address) # type: ignore
+
+    async def get_default_membership(self,
+                                     wallet_address: ChecksumAddress) -> int:
+        return await self.getDefaultMembership(wallet_address).call()
+
+# built on the sync contract for its event decoding, so every blocking view helper is overridden below
+class AsyncFWXPerpCoreContract(FWXPerpCoreContract,AsyncWeb3HTTP):
+
+    def __init__(self,
+                 w3: AsyncWeb3,
+                 rpc_detail: RPCDetail,
+                 contract_address: ChecksumAddress
+                 ) -> None:
+        super().__init__(w3, rpc_detail, contract_address) # type: ignore
+
+    async def get_position(self, # type: ignore
+                           nft_id:int,
+                           underlying_address:ChecksumAddress)->FWXPerpCoreGetPositionRespond:
+        res = await self.getPosition(nft_id,underlying_address).call()
+
+        return FWXPerpCoreGetPositionRespond(*res)
+
+    async def get_tpsl(self, # type: ignore
+                       nft_id:int,
+                       pos_id:int)->FWXPerpCoreTPSLRespond:
+        res = await self.tpsls(nft_id,pos_id).call()
+
+        return FWXPerpCoreTPSLRespond(*res)
+
+    async def is_liquidable(self, # type: ignore
+                            nft_id:int,
+                            pos_id:int)->bool:
+        return await self.isLiquidable(nft_id,pos_id).call()
+
+    async def get_trading_fee_rate(self, # type: ignore
+                                   underlying_address:ChecksumAddress)->int:
+        return await self.tradingFeeRates(underlying_address).call()
+
+    async def get_maintenance_margin_ratio(self, # type: ignore
+                                           underlying_address:ChecksumAddress)->int:
+        return await self.maintenanceMarginRatio(underlying_address).call()
+
+class AsyncFWXPerpHelperContract(FWXPerpHelperContractBase,AsyncWeb3HTTP):
+
+    def __init__(self,
+                 w3: AsyncWeb3,
+                 rpc_detail: RPCDetail,
+                 contract_address: ChecksumAddress
+                 ) -> None:
+        super().__init__(w3, rpc_detail, contract_address) # type: ignore
+
+    async def get_max_contract_size(self,
+                                    perps_core_address:ChecksumAddress,
+                                    nft_id:int,
+                                    underlying_address:ChecksumAddress,
+                                    is_new_long:bool,
+                                    leverage:int,
+                                    safety_factor:int,
+                                    pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> Wei:
+
+        return await self.getMaxContractSize(perps_core_address,nft_id,underlying_address,is_new_long,leverage,safety_factor,pyth_data).call()
+
+    async def get_balance(self,
+                          perps_core_address:ChecksumAddress,
+                          nft_id:int,
+                          pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> FWXPerpHelperGetBalanceRespond:
+
+        res = await self.getBalance(perps_core_address,nft_id,pyth_data).call()
+        return FWXPerpHelperGetBalanceRespond(*res)
+
+    async def get_all_active_positions(self,
+                                       perps_core_address:ChecksumAddress,
+                                       nft_id:int,
+                                       pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
+
+        res = await self.getAllActivePositions(perps_core_address,nft_id,pyth_data).call()
+        result:list[FWXPerpHelperGetAllPositionRespond] = []
+        for pos in res:
+            if len(pos) > 0:
+                result.append(FWXPerpHelperGetAllPositionRespond(*pos))
+
+        if len(result) == 0:
+            return None
+
+        return result
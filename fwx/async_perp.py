@@ -0,0 +1,362 @@
+from web3 import (
+    AsyncWeb3,
+    Web3
+)
+from web3.types import (
+    Wei,
+)
+from web3.contract.async_contract import (
+    AsyncContractFunction,
+)
+from eth_typing import (
+    ChecksumAddress,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Optional,
+    Union
+)
+import inspect
+import logging
+from hexbytes import HexBytes
+
+from fwx.types import (
+    RPCDetail,
+    TxParamsInput,
+    FWXPerpHelperGetBalanceRespond,
+    FWXPerpHelperGetAllPositionRespond
+)
+from fwx.constant import (
+    MAX_UINT
+)
+from fwx.async_w3 import (
+    AsyncWeb3HTTPWallet
+)
+from fwx.async_contract import (
+    AsyncERC20Contract,
+    AsyncFWXMembershipContract,
+    AsyncFWXPerpCoreContract,
+    AsyncFWXPerpHelperContract
+)
+from fwx.pyth import (
+    AsyncHermesClient,
+    AsyncPythPriceCache,
+    HermesPriceStream,
+    RawPythData,
+    to_price_snapshot,
+    create_pyth_data,
+    create_pyth_update_data
+)
+
+class AsyncPerp:
+
+    def __init__(self,
+                 w3:AsyncWeb3,
+                 rpc_detail:RPCDetail,
+                 membership_address: str,
+                 perp_core_address: str,
+                 helper_address: str,
+                 usdc_address: str,
+                 hermes_client: Optional[AsyncHermesClient]=None,
+                 price_cache: Optional[Union[AsyncPythPriceCache,HermesPriceStream]]=None
+                 ) -> None:
+        if hermes_client is None:
+            hermes_client = AsyncHermesClient()
+        if price_cache is None:
+            price_cache = AsyncPythPriceCache(hermes_client,max_age=0)
+        self.hermes_client = hermes_client
+        self.price_cache = price_cache
+        self.membership = AsyncFWXMembershipContract(w3, rpc_detail, Web3.to_checksum_address(membership_address))
+        self.core = AsyncFWXPerpCoreContract(w3, rpc_detail, Web3.to_checksum_address(perp_core_address))
+        self.helper = AsyncFWXPerpHelperContract(w3, rpc_detail, Web3.to_checksum_address(helper_address))
+        self.usdc = AsyncERC20Contract(w3, rpc_detail, Web3.to_checksum_address(usdc_address))
+
+    async def get_pyth_data(self) -> List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
+        pyth_data = self.price_cache.get_pyth_data()
+        if inspect.isawaitable(pyth_data):
+            pyth_data = await pyth_data
+        return pyth_data
+
+    async def get_perp_balance(self,
+                               nft_id:int)->FWXPerpHelperGetBalanceRespond:
+        pyth_data = await self.get_pyth_data()
+
+        return await self.helper.get_balance(self.core.address,nft_id,pyth_data)
+
+    async def get_all_positions(self,nft_id:int) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
+        pyth_data = await self.get_pyth_data()
+
+        return await self.helper.get_all_active_positions(self.core.address,
+                                                          nft_id,
+                                                          pyth_data)
+
+    def deposit_collateral_in_wei(self,
+                                  nft_id:int,
+                                  amount:int,
+                                  underlying_address:str,)->AsyncContractFunction:
+        deposit_func = self.core.depositCollateral(nft_id,self.usdc.address,Web3.to_checksum_address(underlying_address),amount)
+        return deposit_func # type: ignore
+
+    async def get_max_contract_size(self,
+                                    nft_id:int,
+                                    underlying_address:ChecksumAddress,
+                                    raw_pyth_data:RawPythData,
+                                    is_new_long:bool,
+                                    leverage:int,
+                                    safety_factor:int=980000)->Wei:
+        pyth_data = create_pyth_data(raw_pyth_data)
+        leverage = leverage*10**18
+
+        return await self.helper.get_max_contract_size(self.core.address,
+                                                       nft_id,
+                                                       underlying_address,
+                                                       is_new_long,
+                                                       leverage,
+                                                       safety_factor,
+                                                       pyth_data)
+
+    async def open_position_given_contract_size_in_wei(self,
+                                                       nft_id:int,
+                                                       is_long:bool,
+                                                       is_new_long:bool,
+                                                       contract_size:int,
+                                                       leverage:int,
+                                                       underlying_address:ChecksumAddress,
+                                                       raw_pyth_data:RawPythData)->AsyncContractFunction:
+        max_contract_size = await self.get_max_contract_size(nft_id,
+                                                             underlying_address,
+                                                             raw_pyth_data,
+                                                             is_new_long,
+                                                             leverage)
+        logging.info(f"Max contract size: {max_contract_size}")
+        if contract_size > max_contract_size:
+            contract_size = max_contract_size
+            logging.warning("Contract size is too large, setting to max contract size")
+        leverage = leverage*10**18
+        pyth_updata_data = create_pyth_update_data(raw_pyth_data)
+        func = self.core.openPosition(nft_id,
+                                      is_long,
+                                      self.usdc.address,
+                                      Web3.to_checksum_address(underlying_address),
+                                      contract_size,
+                                      leverage,
+                                      pyth_updata_data,
+                                      )
+        return func # type: ignore
+
+    def get_contract_size_given_volumn(self,
+                                       volume:float,
+                                       underlying_symbol:str,
+                                       raw_pyth_data:RawPythData,
+                                       )->float:
+        try:
+            price = to_price_snapshot(raw_pyth_data).get_price(underlying_symbol)
+        except ValueError:
+            raise ValueError("Invalid underlying symbol")
+
+        return volume/price
+
+    def close_position_with_pos_id(self,
+                                   raw_pyth_data:RawPythData,
+                                   nft_id:int,
+                                   pos_id:int,
+                                   closing_size:int,
+                                   )->AsyncContractFunction:
+
+        pyth_update_data = create_pyth_update_data(raw_pyth_data)
+        func =  self.core.closePosition(nft_id,
+                                        pos_id,
+                                        closing_size,
+                                        pyth_update_data)
+        return func # type: ignore
+
+class AsyncFWXPerpSDK(AsyncWeb3HTTPWallet):
+    def __init__(self,
+                 w3:AsyncWeb3,
+                 rpc_detail:RPCDetail,
+                 private_key:str,
+                 membership_address:str,
+                 perp_core_address:str,
+                 helper_address:str,
+                 usdc_address:str,
+                 nft_id:int=0,
+                 hermes_client:Optional[AsyncHermesClient]=None,
+                 price_cache:Optional[Union[AsyncPythPriceCache,HermesPriceStream]]=None) -> None:
+        super().__init__(w3, rpc_detail, private_key)
+        self.perp = AsyncPerp(self.w3, rpc_detail, membership_address, perp_core_address, helper_address, usdc_address, hermes_client, price_cache)
+        self.hermes_client = self.perp.hermes_client
+        self.price_cache = self.perp.price_cache
+        self.nft_id = nft_id
+
+    def _resolve_nft_id(self,nft_id:int) -> int:
+        if nft_id == 0:
+            if self.nft_id == 0:
+                raise ValueError("NFT ID is not set. Please call get_nft_id() first.")
+            nft_id = self.nft_id
+        return nft_id
+
+    async def get_raw_pyth_data(self,list_of_pyth_id:List[str])->Dict[str,Any]:
+        return await self.hermes_client.get_raw_pyth_data(list_of_pyth_id)
+
+    async def _send_function(self,
+                             func:AsyncContractFunction,
+                             tx_params_input:TxParamsInput) -> HexBytes:
+        txn_params = await self.create_txn_params(tx_params_input)
+        txn_params = self.prepare_function_transaction(func,txn_params) # type: ignore
+        txn = await self.send_transaction(txn_params)
+        await self.w3.eth.wait_for_transaction_receipt(txn)
+        return txn
+
+    async def get_nft_id(self,referal_id:int)->None:
+        self.nft_id = await self.perp.membership.get_default_membership(self.wallet_address)
+        if self.nft_id == 0:
+            logging.info("Minting NFT ID")
+            await self._send_function(self.perp.membership.mint(referal_id),TxParamsInput()) # type: ignore
+            self.nft_id = await self.perp.membership.get_default_membership(self.wallet_address)
+
+    async def get_perp_balance(self,
+                               nft_id:int=0)->FWXPerpHelperGetBalanceRespond:
+
+        return await self.perp.get_perp_balance(self._resolve_nft_id(nft_id))
+
+    async def get_all_positions(self,nft_id:int=0) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
+
+        return await self.perp.get_all_positions(self._resolve_nft_id(nft_id))
+
+    async def deposit_collateral_in_wei(self,
+                                        amount:int,
+                                        underlying_address:str,
+                                        tx_params_input:TxParamsInput=TxParamsInput(),
+                                        nft_id:int=0)->HexBytes:
+        nft_id = self._resolve_nft_id(nft_id)
+
+        owner = self.wallet_address
+        spender = self.perp.core.address
+        allowance:int = int(await self.perp.usdc.get_allowance(owner,spender))
+
+        if allowance < amount:
+            await self._send_function(self.perp.usdc.approve(spender,MAX_UINT),TxParamsInput()) # type: ignore
+
+        deposit_func = self.perp.deposit_collateral_in_wei(nft_id, amount, underlying_address)
+        return await self._send_function(deposit_func,tx_params_input)
+
+    async def deposit_collateral(self,
+                                 amount:int,
+                                 underlying_address:str,
+                                 tx_params_input:TxParamsInput=TxParamsInput(),
+                                 nft_id:int=0)->HexBytes:
+
+        amount_in_wei = Web3.to_wei(amount,'mwei')
+
+        return await self.deposit_collateral_in_wei(amount_in_wei,
+                                                    underlying_address,
+                                                    tx_params_input,
+                                                    nft_id)
+
+    async def get_max_contract_size(self,
+                                    underlying_address:ChecksumAddress,
+                                    raw_pyth_data:RawPythData,
+                                    is_new_long:bool,
+                                    leverage:int,
+                                    safety_factor:int=980000,
+                                    nft_id:int=0)->Wei:
+
+        return await self.perp.get_max_contract_size(self._resolve_nft_id(nft_id),
+                                                     underlying_address,
+                                                     raw_pyth_data,
+                                                     is_new_long,
+                                                     leverage,
+                                                     safety_factor)
+
+    async def open_position_given_contract_size_in_wei(self,
+                                                       is_long:bool,
+                                                       is_new_long:bool,
+                                                       contract_size:int,
+                                                       leverage:int,
+                                                       underlying_address:ChecksumAddress,
+                                                       raw_pyth_data:RawPythData,
+                                                       nft_id:int=0,
+                                                       tx_params_input:TxParamsInput=TxParamsInput(),
+                                                       )->HexBytes:
+        func = await self.perp.open_position_given_contract_size_in_wei(self._resolve_nft_id(nft_id),
+                                                                         is_long,
+                                                                         is_new_long,
+                                                                         contract_size,
+                                                                         leverage,
+                                                                         underlying_address,
+                                                                         raw_pyth_data)
+        value = len(raw_pyth_data['parsed']) + len(raw_pyth_data['binary'])
+        tx_params_input = tx_params_input._replace(value=Wei(value))
+        return await self._send_function(func,tx_params_input)
+
+    def get_contract_size_given_volumn(self,
+                                       volume:float,
+                                       underlying_symbol:str,
+                                       raw_pyth_data:RawPythData,
+                                       )->float:
+
+        return self.perp.get_contract_size_given_volumn(volume,underlying_symbol,raw_pyth_data)
+
+    async def open_position_given_contract_size(self,
+                                                is_long:bool,
+                                                contract_size:float,
+                                                leverage:int,
+                                                underlying_address:ChecksumAddress,
+                                                raw_pyth_data:RawPythData,
+                                                is_new_long:bool,
+                                                tx_params_input:TxParamsInput=TxParamsInput(),
+                                                nft_id:int=0)->HexBytes:
+        underlying = self.registry.get_token(underlying_address)
+        contract_size_in_wei = Web3.to_wei(contract_size,underlying.unit_type)
+
+        return await self.open_position_given_contract_size_in_wei(is_long,
+                                                                   is_new_long,
+                                                                   contract_size_in_wei,
+                                                                   leverage,
+                                                                   underlying_address,
+                                                                   raw_pyth_data,
+                                                                   nft_id,
+                                                                   tx_params_input)
+
+    async def open_position_given_volumn(self,
+                                         is_long:bool,
+                                         volume:float,
+                                         leverage:int,
+                                         underlying_address:ChecksumAddress,
+                                         raw_pyth_data:RawPythData,
+                                         is_new_long:bool,
+                                         tx_params_input:TxParamsInput=TxParamsInput(),
+                                         nft_id:int=0)->HexBytes:
+        contract_size = self.get_contract_size_given_volumn(volume,self.registry.get_symbol(underlying_address),raw_pyth_data)
+
+        return await self.open_position_given_contract_size(is_long,
+                                                            contract_size,
+                                                            leverage,
+                                                            underlying_address,
+                                                            raw_pyth_data,
+                                                            is_new_long,
+                                                            tx_params_input,
+                                                            nft_id)
+
+    async def close_position_with_pos_id(self,
+                                         raw_pyth_data:RawPythData,
+                                         pos_id:int,
+                                         closing_size:int,
+                                         nft_id:int=0,
+                                         tx_params_input:TxParamsInput=TxParamsInput()
+                                         )->HexBytes:
+        func = self.perp.close_position_with_pos_id(raw_pyth_data,
+                                                    self._resolve_nft_id(nft_id),
+                                                    pos_id,
+                                                    closing_size)
+
+        value = len(raw_pyth_data['parsed']) + len(raw_pyth_data['binary'])
+        tx_params_input = tx_params_input._replace(value=Wei(value))
+        return await self._send_function(func,tx_params_input)
+
+    async def close(self) -> None:
+        await self.hermes_client.close()
+        await self.w3.provider.disconnect()
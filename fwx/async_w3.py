@@ -0,0 +1,236 @@
+import asyncio
+from hexbytes import HexBytes
+from web3 import (
+    AsyncWeb3,
+    AsyncHTTPProvider
+)
+from typing import (
+    Any,
+    Optional,
+    Dict,
+    Tuple
+)
+from eth_typing import (
+    ChecksumAddress,
+    BlockIdentifier
+)
+from web3.contract.async_contract import (
+    AsyncContractEvent
+)
+from web3.types import (
+    EventData,
+    TxReceipt,
+    TxParams,
+    Wei,
+    Nonce,
+)
+from web3._utils.events import (
+    EventLogErrorFlags,
+)
+from eth_account import Account
+from eth_account.datastructures import (
+    SignedTransaction,
+)
+from eth_account.signers.local import (
+    LocalAccount,
+)
+
+from fwx.types import (
+    RPCDetail,
+    TxParamsInput,
+)
+from fwx.w3 import (
+    Web3HTTP,
+    get_chain_detail,
+    is_nonce_error
+)
+import logging
+
+async def get_async_rpc_detail(rpc:str)->RPCDetail:
+    w3 = AsyncWeb3(AsyncHTTPProvider(rpc))
+    chain_id = await w3.eth.chain_id
+    await w3.provider.disconnect()
+    chain_detail = get_chain_detail(str(chain_id))
+
+    return RPCDetail(
+        rpc = rpc,
+        chain_id = chain_id,
+        chain_detail = chain_detail
+    )
+
+class AsyncWeb3HTTP(Web3HTTP):
+    # Web3HTTP.__init__ is skipped: its log backfiller drives a blocking client, so only the chain
+    # binding is shared, and an offline chain id is checked on the first request like on the sync path
+    def __init__(self,
+                 w3:AsyncWeb3,
+                 rpc_detail:RPCDetail) -> None:
+        self.w3:AsyncWeb3 = w3 # type: ignore
+        self.bind_chain(rpc_detail)
+
+    def backfill_event_data(self,*args:Any,**kwargs:Any) -> Any:
+        raise ValueError("Chunked backfill needs a blocking Web3 client, use get_event_data_with_block on AsyncWeb3")
+
+    async def get_event_data_with_txn(self, # type: ignore
+                                      txn:HexBytes,
+                                      event:AsyncContractEvent, # type: ignore
+                                      error:EventLogErrorFlags=EventLogErrorFlags.Discard) -> Tuple[EventData]:
+        receipt:TxReceipt = await self.w3.eth.get_transaction_receipt(txn)
+        if not receipt:
+            raise ValueError(f"Transaction {txn.to_0x_hex()} not found")
+        return self.process_receipt(receipt, event, error) # type: ignore
+
+    async def get_event_data_with_block(self, # type: ignore
+                                        event:AsyncContractEvent, # type: ignore
+                                        argument_filters:Optional[Dict[str, Any]]=None,
+                                        from_block:Optional[BlockIdentifier]=None,
+                                        to_block:Optional[BlockIdentifier]=None,)-> Tuple[EventData]:
+        return await event.get_logs(
+            argument_filters=argument_filters,
+            from_block=from_block,
+            to_block=to_block
+        )
+
+    async def get_base_fee(self, # type: ignore
+                           block_identifier:BlockIdentifier='pending') -> Wei:
+        block_data = await self.w3.eth.get_block(block_identifier)
+        return block_data.get('baseFeePerGas', Wei(0))
+
+class AsyncNonceManager:
+    def __init__(self,
+                 w3:AsyncWeb3,
+                 address:ChecksumAddress) -> None:
+        self.w3 = w3
+        self.address = address
+        self._lock:Optional[asyncio.Lock] = None
+        self._next_nonce:Optional[int] = None
+        
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def sync(self) -> Nonce:
+        async with self._get_lock():
+            self._next_nonce = await self.w3.eth.get_transaction_count(self.address,'pending')
+            return Nonce(self._next_nonce)
+
+    async def next_nonce(self) -> Nonce:
+        async with self._get_lock():
+            if self._next_nonce is None:
+                self._next_nonce = await self.w3.eth.get_transaction_count(self.address,'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return Nonce(nonce)
+
+    def release(self,nonce:Nonce) -> None:
+        if self._next_nonce is not None and nonce == self._next_nonce - 1:
+            self._next_nonce = nonce
+        else:
+            self._next_nonce = None
+
+    def reset(self) -> None:
+        self._next_nonce = None
+
+class AsyncWeb3HTTPWallet(AsyncWeb3HTTP):
+    def __init__(self,
+                 w3:AsyncWeb3,
+                 rpc_detail:RPCDetail,
+                 private_key:str) -> None:
+        super().__init__(w3, rpc_detail)
+        self.__private_key = private_key
+        account:LocalAccount = Account.from_key(private_key)
+        self.wallet_address:ChecksumAddress = account.address
+        self.last_nonce:Optional[Nonce] = None
+        self.nonce_manager = AsyncNonceManager(self.w3,self.wallet_address)
+
+    async def create_txn_params(self,
+                                tx_params_input:TxParamsInput)->TxParams:
+
+        txn_params:TxParams = {'from':self.wallet_address,
+                               'chainId':self.chain_id}
+
+        for key,value in tx_params_input._asdict().items():
+            if value is not None:
+                txn_params[key] = value
+
+        return txn_params
+
+    async def checking_txn_params(self,
+                                  txn_params:TxParams,
+                                  trick:float=1.5,
+                                  priority_multipier:float=1) -> TxParams:
+
+        if 'to' not in txn_params:
+            raise ValueError("Destination address is required")
+
+        if 'from' not in txn_params:
+            txn_params['from'] = self.wallet_address
+
+        if 'chainId' not in txn_params:
+            txn_params['chainId'] = self.chain_id
+
+        if 'value' not in txn_params:
+            txn_params['value'] = Wei(0)
+
+        # fee and gas lookups are independent, so issue them together
+        async def no_lookup() -> None:
+            return None
+        priority,base_fee,gas = await asyncio.gather(
+            self.w3.eth.max_priority_fee if 'maxPriorityFeePerGas' not in txn_params else no_lookup(),
+            self.get_base_fee() if 'maxFeePerGas' not in txn_params else no_lookup(),
+            self.w3.eth.estimate_gas(txn_params) if 'gas' not in txn_params else no_lookup(),
+        )
+
+        if priority is not None:
+            max_priority_fee = int(priority * priority_multipier)
+            txn_params['maxPriorityFeePerGas'] = Wei(max_priority_fee)
+        else:
+            max_priority_fee = int(txn_params['maxPriorityFeePerGas'])
+
+        if base_fee is not None:
+            max_fee_per_gas = int(base_fee * 2 + max_priority_fee)
+            txn_params['maxFeePerGas'] = Wei(max_fee_per_gas)
+
+        if gas is not None:
+            txn_params['gas'] = Wei(int(gas * trick))
+
+        return txn_params
+
+    async def send_transaction(self,
+                               txn_params:TxParams,
+                               trick:float=1.5,
+                               priority_multipier:float=1) -> HexBytes:
+        txn_params = await self.checking_txn_params(txn_params, trick, priority_multipier)
+        if 'nonce' in txn_params:
+            return await self._sign_and_send(txn_params)
+
+        txn_params['nonce'] = await self.nonce_manager.next_nonce()
+        try:
+            txn_hash = await self._sign_and_send(txn_params)
+        except Exception as e:
+            if not is_nonce_error(e):
+                self.nonce_manager.release(txn_params['nonce'])
+                raise
+            logging.warning(f"Nonce {txn_params['nonce']} rejected, resyncing with chain: {e}")
+            await self.nonce_manager.sync()
+            txn_params['nonce'] = await self.nonce_manager.next_nonce()
+            try:
+                txn_hash = await self._sign_and_send(txn_params)
+            except Exception as retry_error:
+                # hand the nonce back so the next send does not leave a gap behind it
+                if is_nonce_error(retry_error):
+                    self.nonce_manager.reset()
+                else:
+                    self.nonce_manager.release(txn_params['nonce'])
+                raise
+        self.last_nonce = txn_params['nonce']
+
+        return txn_hash
+
+    async def _sign_and_send(self,
+                             txn_params:TxParams) -> HexBytes:
+        signed_txn:SignedTransaction = Account.sign_transaction(txn_params,
+                                                                private_key=self.__private_key)
+        txn_hash:HexBytes = await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+        return txn_hash
@@ -0,0 +1,259 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set
+)
+import logging
+import threading
+import time
+from eth_typing import (
+    ChecksumAddress,
+)
+
+from fwx.types import (
+    BaseEventData,
+    BookPosition,
+    PositionMark,
+)
+from fwx.decoder import (
+    select_log_decoders,
+)
+from fwx.events import (
+    EventFollower,
+)
+from fwx.perp import (
+    Perp,
+)
+from fwx.pyth import (
+    RawPythData,
+    to_price_snapshot,
+)
+
+BOOK_EVENTS = ('OpenPosition','ClosePosition','LiquidatePosition','TriggerTPSL','SetTPSL')
+
+class PositionBook:
+
+    # open positions per nft id, kept current from core events so reads are memory lookups. Events cannot
+    # carry everything (underlying of a pair seen for the first time, funding, a reorged-out block), so an
+    # nft is reconciled against the helper when it is first read, when its stream has a gap and every
+    # reconcile_interval seconds once start() runs. Without nft_ids only nfts already read are tracked, so
+    # a busy core does not turn every nft it emits into helper calls
+    def __init__(self,
+                 perp:Perp,
+                 nft_ids:Optional[Iterable[int]]=None,
+                 reconcile_interval:float=60) -> None:
+        self.perp = perp
+        self.nft_ids:Optional[Set[int]] = set(nft_ids) if nft_ids is not None else None
+        self.reconcile_interval = reconcile_interval
+        self.follower:Optional[EventFollower] = None
+        self.drift_count = 0
+        self._lock = threading.RLock()
+        self._positions:Dict[int,Dict[int,BookPosition]] = {}
+        self._pairs:Dict[bytes,ChecksumAddress] = {}
+        self._reconciled_block:Dict[int,int] = {}
+        self._reconciled_at:Dict[int,float] = {}
+        self._dirty:Set[int] = set()
+        self._stop = threading.Event()
+        self._thread:Optional[threading.Thread] = None
+
+    def is_tracked(self,nft_id:int) -> bool:
+        if self.nft_ids is None:
+            return nft_id in self._reconciled_block
+        return nft_id in self.nft_ids
+
+    def apply(self,event:BaseEventData) -> None:
+        args:Any = getattr(event,'args',None)
+        nft_id = getattr(args,'nft_id',None)
+        if event.event not in BOOK_EVENTS or nft_id is None or not self.is_tracked(nft_id):
+            return
+        with self._lock:
+            # the last reconciliation already includes this block
+            if event.block_number <= self._reconciled_block.get(nft_id,-1):
+                return
+            if nft_id not in self._reconciled_block:
+                self._dirty.add(nft_id)
+            positions = self._positions.setdefault(nft_id,{})
+            position = positions.get(args.pos_id)
+            if event.event == 'OpenPosition':
+                positions[args.pos_id] = self._open(nft_id,position,args,event.block_number)
+                return
+            if position is None:
+                self._dirty.add(nft_id)
+                return
+            if event.event == 'ClosePosition':
+                self._reduce(positions,position,args.closing_size,args.collateral_swap_amount_unlocked,event.block_number)
+            elif event.event == 'LiquidatePosition':
+                self._reduce(positions,position,args.liquidated_size,position.collateral_swapped_amount,event.block_number)
+            elif event.event == 'SetTPSL':
+                positions[args.pos_id] = position._replace(tp_price=args.tp_price,sl_price=args.sl_price,block_number=event.block_number)
+            elif event.event == 'TriggerTPSL':
+                positions[args.pos_id] = position._replace(tp_price=0,sl_price=0,block_number=event.block_number)
+
+    def _open(self,
+              nft_id:int,
+              position:Optional[BookPosition],
+              args:Any,
+              block_number:int) -> BookPosition:
+        if position is None:
+            underlying_address = self._pairs.get(args.pair_bytes32)
+            if underlying_address is None:
+                self._dirty.add(nft_id)
+            return BookPosition(nft_id,args.pos_id,args.is_long,underlying_address,args.pair_bytes32,args.entry_price,args.contract_size,
+                                args.collateral_swap_amount_locked,args.leverage,0,0,block_number)
+        # adding to a position moves the entry to the size-weighted average
+        contract_size = position.contract_size + args.contract_size
+        entry_price = (position.entry_price*position.contract_size + args.entry_price*args.contract_size)//contract_size
+        return position._replace(entry_price=entry_price,
+                                 contract_size=contract_size,
+                                 collateral_swapped_amount=position.collateral_swapped_amount + args.collateral_swap_amount_locked,
+                                 leverage=args.leverage,
+                                 pair_bytes32=args.pair_bytes32,
+                                 block_number=block_number)
+
+    def _reduce(self,
+                positions:Dict[int,BookPosition],
+                position:BookPosition,
+                size:int,
+                collateral_unlocked:int,
+                block_number:int) -> None:
+        contract_size = position.contract_size - size
+        if contract_size <= 0:
+            del positions[position.pos_id]
+            return
+        positions[position.pos_id] = position._replace(contract_size=contract_size,
+                                                       collateral_swapped_amount=max(position.collateral_swapped_amount - collateral_unlocked,0),
+                                                       block_number=block_number)
+
+    def retract(self,event:BaseEventData) -> None:
+        # a retracted event cannot be undone locally, so the nft is rebuilt from the helper instead
+        nft_id = getattr(getattr(event,'args',None),'nft_id',None)
+        if nft_id is not None and self.is_tracked(nft_id):
+            with self._lock:
+                self._dirty.add(nft_id)
+
+    def reconcile(self,
+                  nft_id:int,
+                  block_number:Optional[int]=None) -> List[BookPosition]:
+        # held across the helper call so no event lands between the read and the swap
+        with self._lock:
+            if block_number is None:
+                block_number = self.follower.delivered_block if self.follower is not None else self.perp.core.w3.eth.block_number
+            rows = self.perp.helper.get_all_active_positions(self.perp.core.address,nft_id,self.perp.price_cache.get_pyth_data(),block_number) or []
+            old = self._positions.get(nft_id,{})
+            positions:Dict[int,BookPosition] = {}
+            for row in rows:
+                previous = old.get(row.pos_id)
+                pair_bytes32 = previous.pair_bytes32 if previous is not None else None
+                if pair_bytes32 is not None:
+                    self._pairs[pair_bytes32] = row.underlying_address
+                positions[row.pos_id] = BookPosition(nft_id,row.pos_id,row.is_long,row.underlying_address,pair_bytes32,row.entry_price,
+                                                     row.contract_size,row.collateral_swapped_amount,row.leverage,row.tp_price,row.sl_price,block_number)
+            if nft_id in self._reconciled_block and nft_id not in self._dirty and self._has_drift(old,positions):
+                self.drift_count += 1
+                logging.warning(f"Position book for nft {nft_id} drifted from the helper at block {block_number}, resynced")
+            self._positions[nft_id] = positions
+            self._reconciled_block[nft_id] = block_number
+            self._reconciled_at[nft_id] = time.monotonic()
+            self._dirty.discard(nft_id)
+            return list(positions.values())
+
+    def _has_drift(self,
+                   old:Dict[int,BookPosition],
+                   new:Dict[int,BookPosition]) -> bool:
+        if set(old) != set(new):
+            return True
+        return any((p.contract_size,p.is_long) != (new[pos_id].contract_size,new[pos_id].is_long) for pos_id,p in old.items())
+
+    def _ensure_fresh(self,nft_id:int) -> None:
+        if nft_id not in self._reconciled_block or nft_id in self._dirty:
+            self.reconcile(nft_id)
+
+    def get_positions(self,nft_id:int) -> List[BookPosition]:
+        self._ensure_fresh(nft_id)
+        with self._lock:
+            return sorted(self._positions.get(nft_id,{}).values(),key=lambda p: p.pos_id)
+
+    def get_position(self,
+                     nft_id:int,
+                     pos_id:int) -> Optional[BookPosition]:
+        self._ensure_fresh(nft_id)
+        with self._lock:
+            return self._positions.get(nft_id,{}).get(pos_id)
+
+    def get_marks(self,
+                  nft_id:int,
+                  raw_pyth_data:Optional[RawPythData]=None) -> List[PositionMark]:
+        # pnl is (mark - entry) * size in the price's 18 decimals, scaled down by the underlying's decimals
+        snapshot = to_price_snapshot(raw_pyth_data) if raw_pyth_data is not None else self.perp.price_cache.get_price_snapshot()
+        registry = self.perp.core.registry
+        marks:List[PositionMark] = []
+        for position in self.get_positions(nft_id):
+            if position.underlying_address is None:
+                continue
+            # an underlying without a feed in this snapshot cannot be marked, the rest of the nft still can
+            try:
+                token = registry.get_token(position.underlying_address)
+                price = snapshot.get_feed(token.symbol).price
+            except ValueError:
+                continue
+            scale = 18 + price.expo
+            mark_price = price.price*10**scale if scale >= 0 else price.price//10**-scale
+            pnl = (mark_price - position.entry_price)*position.contract_size//10**token.decimal
+            marks.append(PositionMark(position.pos_id,
+                                      position.is_long,
+                                      position.underlying_address,
+                                      position.entry_price,
+                                      mark_price,
+                                      position.contract_size,
+                                      pnl if position.is_long else -pnl,
+                                      position.tp_price,
+                                      position.sl_price))
+        return marks
+
+    def make_follower(self,
+                      from_block:Optional[int]=None,
+                      confirmations:int=2,
+                      **kwargs:Any) -> EventFollower:
+        core = self.perp.core
+        self.follower = EventFollower(core.w3,
+                                      core.address,
+                                      core.w3.eth.block_number if from_block is None else from_block,
+                                      on_event=self.apply,
+                                      on_retract=self.retract,
+                                      confirmations=confirmations,
+                                      decoders=select_log_decoders(*BOOK_EVENTS),
+                                      backfiller=core.log_backfiller,
+                                      **kwargs)
+        return self.follower
+
+    def _due(self) -> List[int]:
+        now = time.monotonic()
+        with self._lock:
+            nft_ids = self.nft_ids if self.nft_ids is not None else set(self._reconciled_block)
+            return [nft_id for nft_id in nft_ids if nft_id in self._dirty or now - self._reconciled_at.get(nft_id,0) >= self.reconcile_interval]
+
+    def start(self,poll_interval:float=1) -> 'PositionBook':
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,args=(poll_interval,),name='position-book',daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self,poll_interval:float) -> None:
+        while not self._stop.is_set():
+            for nft_id in self._due():
+                try:
+                    self.reconcile(nft_id)
+                except Exception as e:
+                    logging.warning(f"Position book reconcile for nft {nft_id} failed: {e}")
+            self._stop.wait(poll_interval)
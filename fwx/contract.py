@@ -1,16 +1,19 @@
 from typing import (
     Any,
+    Callable,
     List,
     Dict,
     Tuple,
     Optional
 )
+from hexbytes import HexBytes
 from web3 import Web3
 from web3._utils.contracts import (
     prepare_transaction,
 )
 from eth_utils.abi import (
     abi_to_signature,
+    get_abi_output_types,
 )
 from eth_typing import (
     ChecksumAddress,
@@ -19,9 +22,16 @@ from web3.contract.contract import (
     ContractFunction,
     ContractEvent
 )
+from web3.contract.utils import (
+    format_contract_call_return_data_curried,
+)
+from web3.exceptions import (
+    Web3Exception,
+)
 
 from web3.types import (
     TxParams,
+    TxReceipt,
     BlockIdentifier,
     Wei
 )
@@ -31,9 +41,12 @@ from web3.types import (
 
 from fwx.types import (
     RPCDetail,
+    BaseEventData,
     ERC20TransferEventData,
     ERC20TransferArgs,
     FWXPerpCoreGetPositionRespond,
+    FWXPerpCoreTPSLRespond,
+    MulticallRespond,
     FWXPerpCoreOpenPositionEventData,
     FWXPerpCoreOpenPositionArgs,
     FWXPerpCoreClosePositionEventData,
@@ -44,17 +57,136 @@ from fwx.types import (
 from fwx.w3 import (
     Web3HTTP,
 )
+from fwx.provider import (
+    RPCPoolProvider,
+)
 from fwx.constant import (
-    FWX_MEMBERSHIP_ABI,
-    FWX_PERP_CORE_ABI,
-    FWX_PERP_HELPER_ABI,
-    ERC20_ABI,
+    MULTICALL3_ADDRESS,
+    load_abi,
+)
+from fwx.decoder import (
+    CORE_EVENT_NAMES,
+    decode_logs,
+    select_log_decoders,
 )
 
+def decode_function_result(func:ContractFunction,return_data:bytes) -> Any:
+    # same decoding and normalization ContractFunction.call applies to eth_call output
+    return format_contract_call_return_data_curried(func.w3,
+                                                    func.decode_tuples,
+                                                    func.abi,
+                                                    func.abi_element_identifier,
+                                                    (),
+                                                    get_abi_output_types(func.abi),
+                                                    return_data)
+
+def format_all_active_positions(res:List[Any]) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
+    result:list[FWXPerpHelperGetAllPositionRespond] = []
+    for pos in res:
+        if len(pos) > 0:
+            result.append(FWXPerpHelperGetAllPositionRespond(*pos))
+            
+    if len(result) == 0:
+        return None
+    
+    return result
+
+class BatchCall:
+    __slots__ = ('func','formatter','_value','_error','_done')
+    
+    def __init__(self,
+                 func:ContractFunction,
+                 formatter:Optional[Callable[[Any],Any]]=None) -> None:
+        self.func = func
+        self.formatter = formatter
+        self._value:Any = None
+        self._error:Optional[Exception] = None
+        self._done = False
+        
+    def set_result(self,value:Any) -> None:
+        self._value = self.formatter(value) if self.formatter is not None else value
+        self._done = True
+        
+    def set_exception(self,error:Exception) -> None:
+        self._error = error
+        self._done = True
+        
+    def done(self) -> bool:
+        return self._done
+        
+    def result(self) -> Any:
+        if not self._done:
+            raise ValueError("Batch has not been executed yet")
+        if self._error is not None:
+            raise self._error
+        return self._value
+    
+    def __repr__(self) -> str:
+        return f"BatchCall({self.func.fn_name}, {self._value if self._done else 'pending'})"
+
+class ContractCallBatch:
+    
+    # queued calls go out as one JSON-RPC batch when the with-block exits
+    # with a multicall contract they are packed into one aggregate3 eth_call instead,
+    # so every result is read at the same block
+    def __init__(self,
+                 w3:Web3,
+                 block_identifier:BlockIdentifier='latest',
+                 multicall:Optional['Multicall3Contract']=None) -> None:
+        self.w3 = w3
+        self.block_identifier = block_identifier
+        self.multicall = multicall
+        self.block_number:Optional[int] = None
+        self.calls:List[BatchCall] = []
+        
+    def add(self,
+            func:ContractFunction,
+            formatter:Optional[Callable[[Any],Any]]=None) -> BatchCall:
+        call = BatchCall(func,formatter)
+        self.calls.append(call)
+        return call
+    
+    def execute(self) -> List[Any]:
+        pending = [call for call in self.calls if not call.done()]
+        if len(pending) > 0 and self.multicall is not None:
+            respond = self.multicall.aggregate([call.func for call in pending],block_identifier=self.block_identifier)
+            self.block_number = respond.block_number
+            for call,result in zip(pending,respond.results):
+                call.set_result(result)
+        elif len(pending) > 0:
+            try:
+                with self.w3.batch_requests() as batch:
+                    for call in pending:
+                        batch.add(call.func.call(block_identifier=self.block_identifier))
+                    responses = batch.execute()
+            except Web3Exception:
+                # web3 gives up on the whole reply at its first error entry, or the node refused the batch;
+                # read each call on its own so the others still get their results and the failures their errors
+                for call in pending:
+                    try:
+                        call.set_result(call.func.call(block_identifier=self.block_identifier))
+                    except Web3Exception as e:
+                        call.set_exception(e)
+            else:
+                for call,response in zip(pending,responses):
+                    call.set_result(response)
+        return [call.result() for call in self.calls]
+    
+    @property
+    def results(self) -> List[Any]:
+        return [call.result() for call in self.calls]
+    
+    def __enter__(self) -> 'ContractCallBatch':
+        return self
+    
+    def __exit__(self,exc_type:Any,exc_value:Any,traceback:Any) -> None:
+        if exc_type is None:
+            self.execute()
+
 class BaseContract(Web3HTTP):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address:ChecksumAddress,
                  abi: List[Dict[str, Any]]
@@ -63,6 +195,16 @@ class BaseContract(Web3HTTP):
         self.address = contract_address
         self.contract = self.load_contract(abi,self.address)
         
+    def hedged_call(self,
+                    func:ContractFunction,
+                    block_identifier:BlockIdentifier='latest') -> Any:
+        # with a pooled provider, a slow eth_call is raced against the next endpoint
+        provider = func.w3.provider
+        if not isinstance(provider,RPCPoolProvider):
+            return func.call(block_identifier=block_identifier)
+        with provider.hedging():
+            return func.call(block_identifier=block_identifier)
+        
     def get_func_data(self,
                       func:ContractFunction,)->TxParams:
         abi_element_identifier = abi_to_signature(func.abi)
@@ -77,12 +219,12 @@ class BaseContract(Web3HTTP):
 class ERC20ContractBase(BaseContract):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress,
-                 abi: List[Dict[str, Any]] = ERC20_ABI
+                 abi: Optional[List[Dict[str, Any]]] = None
                  ) -> None:
-        super().__init__(w3, rpc_detail, contract_address, abi)
+        super().__init__(w3, rpc_detail, contract_address, abi if abi is not None else load_abi('ERC20_ABI'))
         
     def balanceOf(self,address:ChecksumAddress) -> ContractFunction:
         
@@ -129,17 +271,18 @@ class ERC20ContractBase(BaseContract):
 class ERC20Contract(ERC20ContractBase):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress
                  ) -> None:
         super().__init__(w3, rpc_detail, contract_address)
-        try:
-            self.token_symbol = rpc_detail.chain_detail.address_map[self.address]
-            self.decimal = rpc_detail.chain_detail.token_details[self.token_symbol].decimal
-            self.unit_type = rpc_detail.chain_detail.token_details[self.token_symbol].unit_type
-            self.created_block = rpc_detail.chain_detail.token_details[self.token_symbol].created_block
-        except:
+        token_detail = self.registry.find_token(self.address)
+        if token_detail is not None:
+            self.token_symbol = token_detail.symbol
+            self.decimal = token_detail.decimal
+            self.unit_type = token_detail.unit_type
+            self.created_block = token_detail.created_block
+        else:
             self.token_symbol = self.symbol().call()
             self.decimal = self.decimals().call()
             if self.decimal == 18:
@@ -180,12 +323,12 @@ class ERC20Contract(ERC20ContractBase):
 class FWXMembershipContractBase(BaseContract):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress,
-                 abi: List[Dict[str, Any]] = FWX_MEMBERSHIP_ABI
+                 abi: Optional[List[Dict[str, Any]]] = None
                  ) -> None:
-        super().__init__(w3, rpc_detail, contract_address, abi)
+        super().__init__(w3, rpc_detail, contract_address, abi if abi is not None else load_abi('FWX_MEMBERSHIP_ABI'))
         
     def getDefaultMembership(self,
                              wallet_address: ChecksumAddress) -> ContractFunction:
@@ -198,12 +341,11 @@ class FWXMembershipContractBase(BaseContract):
 class FWXMembershipContract(FWXMembershipContractBase):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress
                  ) -> None:
         super().__init__(w3, rpc_detail, contract_address)
-        self.w3 = w3
         
     def get_default_membership(self,
                              wallet_address: ChecksumAddress) -> int:
@@ -216,12 +358,12 @@ class FWXMembershipContract(FWXMembershipContractBase):
 class FWXPerpCoreContractBase(BaseContract):
 
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress,
-                 abi: List[Dict[str, Any]] = FWX_PERP_CORE_ABI
+                 abi: Optional[List[Dict[str, Any]]] = None
                  ) -> None:
-        super().__init__(w3, rpc_detail, contract_address,abi)
+        super().__init__(w3, rpc_detail, contract_address,abi if abi is not None else load_abi('FWX_PERP_CORE_ABI'))
         
     def getPosition(self,
                     nft_id:int,
@@ -229,6 +371,28 @@ class FWXPerpCoreContractBase(BaseContract):
         
         return self.contract.functions.getPosition(nft_id,underlying_address)
     
+    def tpsls(self,
+              nft_id:int,
+              pos_id:int)->ContractFunction:
+        
+        return self.contract.functions.tpsls(nft_id,pos_id)
+    
+    def isLiquidable(self,
+                     nft_id:int,
+                     pos_id:int)->ContractFunction:
+        
+        return self.contract.functions.isLiquidable(nft_id,pos_id)
+    
+    def tradingFeeRates(self,
+                        underlying_address:ChecksumAddress)->ContractFunction:
+        
+        return self.contract.functions.tradingFeeRates(underlying_address)
+    
+    def maintenanceMarginRatio(self,
+                               underlying_address:ChecksumAddress)->ContractFunction:
+        
+        return self.contract.functions.maintenanceMarginRatio(underlying_address)
+    
     # Transaction Section
     def depositCollateral(self,
                           nft_id:int,
@@ -280,16 +444,46 @@ class FWXPerpCoreContractBase(BaseContract):
 
     def eventClosePosition(self) -> ContractEvent:
         return self.contract.events.ClosePosition()
+
+    def eventCollectFees(self) -> ContractEvent:
+        return self.contract.events.CollectFees()
+
+    def eventLiquidatePosition(self) -> ContractEvent:
+        return self.contract.events.LiquidatePosition()
+
+    def eventTriggerTPSL(self) -> ContractEvent:
+        return self.contract.events.TriggerTPSL()
+
+    def eventSetTPSL(self) -> ContractEvent:
+        return self.contract.events.SetTPSL()
+
+    def eventDeposit(self) -> ContractEvent:
+        return self.contract.events.Deposit()
+
+    def eventWithdraw(self) -> ContractEvent:
+        return self.contract.events.Withdraw()
+
+    def eventDepositCollateral(self) -> ContractEvent:
+        return self.contract.events.DepositCollateral()
+
+    def eventWithdrawCollateral(self) -> ContractEvent:
+        return self.contract.events.WithdrawCollateral()
+
+    def eventUpdateGlobalStat(self) -> ContractEvent:
+        return self.contract.events.UpdateGlobalStat()
+
+    def eventUpdateWallet(self) -> ContractEvent:
+        return self.contract.events.UpdateWallet()
     
 class FWXPerpCoreContract(FWXPerpCoreContractBase):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress
                  ) -> None:
         super().__init__(w3, rpc_detail, contract_address)
-        self.w3 = w3
+        self.decoders = select_log_decoders(*CORE_EVENT_NAMES)
         
     def get_position(self,
                     nft_id:int,
@@ -298,6 +492,26 @@ class FWXPerpCoreContract(FWXPerpCoreContractBase):
         
         return FWXPerpCoreGetPositionRespond(*res)
     
+    def get_tpsl(self,
+                 nft_id:int,
+                 pos_id:int)->FWXPerpCoreTPSLRespond:
+        res = self.tpsls(nft_id,pos_id).call()
+        
+        return FWXPerpCoreTPSLRespond(*res)
+    
+    def is_liquidable(self,
+                      nft_id:int,
+                      pos_id:int)->bool:
+        return self.isLiquidable(nft_id,pos_id).call()
+    
+    def get_trading_fee_rate(self,
+                             underlying_address:ChecksumAddress)->int:
+        return self.tradingFeeRates(underlying_address).call()
+    
+    def get_maintenance_margin_ratio(self,
+                                     underlying_address:ChecksumAddress)->int:
+        return self.maintenanceMarginRatio(underlying_address).call()
+    
     def get_process_open_position_event_log(self,
                                             event_log: EventData,) -> FWXPerpCoreOpenPositionEventData:
         
@@ -343,15 +557,22 @@ class FWXPerpCoreContract(FWXPerpCoreContractBase):
                                                 transaction_index=base_event_data.transaction_index,
                                                 args=FWXPerpCoreClosePositionArgs(owener,nft_id,position_id,closing_size,closing_price,pnl,is_long,clooe_all_positions,pair_bytes,collateral_swap_amount_unlocked,router_address))
         
+    def decode_events(self,logs:List[Any]) -> List[BaseEventData]:
+        # every core event in one pass; logs of other contracts are skipped
+        return decode_logs(logs,self.address,self.decoders)
+    
+    def decode_receipt(self,receipt:TxReceipt) -> List[BaseEventData]:
+        return decode_logs(receipt['logs'],self.address,self.decoders)
+        
 class FWXPerpHelperContractBase(BaseContract):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress,
-                 abi: List[Dict[str, Any]] = FWX_PERP_HELPER_ABI
+                 abi: Optional[List[Dict[str, Any]]] = None
                  ) -> None:
-        super().__init__(w3, rpc_detail, contract_address,abi)
+        super().__init__(w3, rpc_detail, contract_address,abi if abi is not None else load_abi('FWX_PERP_HELPER_ABI'))
         
     def getMaxContractSize(self,
                            perps_core_address:ChecksumAddress,
@@ -381,12 +602,11 @@ class FWXPerpHelperContractBase(BaseContract):
 class FWXPerpHelperContract(FWXPerpHelperContractBase):
     
     def __init__(self, 
-                 w3: Web3, 
+                 w3: Optional[Web3], 
                  rpc_detail: RPCDetail,
                  contract_address: ChecksumAddress
                  ) -> None:
         super().__init__(w3, rpc_detail, contract_address)
-        self.w3 = w3
         
     def get_max_contract_size(self,
                               perps_core_address:ChecksumAddress,
@@ -397,28 +617,58 @@ class FWXPerpHelperContract(FWXPerpHelperContractBase):
                               safety_factor:int,
                               pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> Wei:
         
-        return self.getMaxContractSize(perps_core_address,nft_id,underlying_address,is_new_long,leverage,safety_factor,pyth_data).call()
+        return self.hedged_call(self.getMaxContractSize(perps_core_address,nft_id,underlying_address,is_new_long,leverage,safety_factor,pyth_data))
     
     def get_balance(self,
                     perps_core_address:ChecksumAddress,
                     nft_id:int,
                     pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> FWXPerpHelperGetBalanceRespond:
         
-        res = self.getBalance(perps_core_address,nft_id,pyth_data).call()
+        res = self.hedged_call(self.getBalance(perps_core_address,nft_id,pyth_data))
         return FWXPerpHelperGetBalanceRespond(*res)
     
     def get_all_active_positions(self,
                                  perps_core_address:ChecksumAddress,
                                  nft_id:int,
-                                 pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
-        
-        res = self.getAllActivePositions(perps_core_address,nft_id,pyth_data).call()
-        result:list[FWXPerpHelperGetAllPositionRespond] = []
-        for pos in res:
-            if len(pos) > 0:
-                result.append(FWXPerpHelperGetAllPositionRespond(*pos))
-                
-        if len(result) == 0:
-            return None
-        
-        return result
\ No newline at end of file
+                                 pyth_data:List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]],
+                                 block_identifier:BlockIdentifier='latest') -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
+        
+        res = self.hedged_call(self.getAllActivePositions(perps_core_address,nft_id,pyth_data),block_identifier)
+        return format_all_active_positions(res)
+
+class Multicall3Contract(BaseContract):
+    
+    def __init__(self, 
+                 w3: Optional[Web3], 
+                 rpc_detail: RPCDetail,
+                 contract_address: ChecksumAddress = MULTICALL3_ADDRESS,
+                 abi: Optional[List[Dict[str, Any]]] = None
+                 ) -> None:
+        super().__init__(w3, rpc_detail, contract_address, abi if abi is not None else load_abi('MULTICALL3_ABI'))
+        
+    def aggregate3(self,
+                   calls:List[Tuple[ChecksumAddress,bool,bytes]])->ContractFunction:
+        
+        return self.contract.functions.aggregate3(calls)
+    
+    def getBlockNumber(self)->ContractFunction:
+        
+        return self.contract.functions.getBlockNumber()
+    
+    def aggregate(self,
+                  funcs:List[ContractFunction],
+                  allow_failure:bool=False,
+                  block_identifier:BlockIdentifier='latest')->MulticallRespond:
+        # getBlockNumber rides along so callers know which block every result was read at;
+        # with allow_failure a reverted call yields None instead of reverting the whole batch
+        block_number_func = self.getBlockNumber()
+        calls = [(self.address,False,HexBytes(block_number_func._encode_transaction_data()))]
+        for func in funcs:
+            calls.append((func.address,allow_failure,HexBytes(func._encode_transaction_data())))
+        res = self.aggregate3(calls).call(block_identifier=block_identifier)
+        
+        block_number = decode_function_result(block_number_func,res[0][1])
+        results:List[Any] = []
+        for func,(success,return_data) in zip(funcs,res[1:]):
+            results.append(decode_function_result(func,return_data) if success else None)
+        return MulticallRespond(block_number,results)
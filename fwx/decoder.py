@@ -0,0 +1,241 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type
+)
+from functools import lru_cache
+from hexbytes import HexBytes
+from eth_typing import (
+    ChecksumAddress,
+)
+from eth_utils import (
+    keccak,
+    to_checksum_address,
+)
+
+from fwx.types import (
+    BaseEventData,
+    ERC20TransferEventData,
+    ERC20TransferArgs,
+    FWXPerpCoreOpenPositionEventData,
+    FWXPerpCoreOpenPositionArgs,
+    FWXPerpCoreClosePositionEventData,
+    FWXPerpCoreClosePositionArgs,
+    FWXPerpCoreCollectFeesEventData,
+    FWXPerpCoreCollectFeesArgs,
+    FWXPerpCoreLiquidatePositionEventData,
+    FWXPerpCoreLiquidatePositionArgs,
+    FWXPerpCoreTriggerTPSLEventData,
+    FWXPerpCoreTriggerTPSLArgs,
+    FWXPerpCoreSetTPSLEventData,
+    FWXPerpCoreSetTPSLArgs,
+    FWXPerpCoreDepositEventData,
+    FWXPerpCoreDepositArgs,
+    FWXPerpCoreWithdrawEventData,
+    FWXPerpCoreWithdrawArgs,
+    FWXPerpCoreDepositCollateralEventData,
+    FWXPerpCoreDepositCollateralArgs,
+    FWXPerpCoreWithdrawCollateralEventData,
+    FWXPerpCoreWithdrawCollateralArgs,
+    FWXPerpCoreUpdateGlobalStatEventData,
+    FWXPerpCoreUpdateGlobalStatArgs,
+    FWXPerpCoreUpdateWalletEventData,
+    FWXPerpCoreUpdateWalletArgs,
+)
+from fwx.constant import (
+    load_abi,
+)
+
+WordDecoder = Callable[[bytes],Any]
+
+# the same few owners, routers and contracts show up in almost every log, so checksumming is memoized
+@lru_cache(maxsize=4096)
+def checksum_address_bytes(address:bytes) -> ChecksumAddress:
+    return to_checksum_address(address)
+
+@lru_cache(maxsize=4096)
+def checksum_address_str(address:str) -> ChecksumAddress:
+    return to_checksum_address(address)
+
+def _as_bytes(value:Any) -> bytes:
+    # HexBytes slices into new HexBytes objects, which costs more than the decoding itself
+    if type(value) is bytes:
+        return value
+    if isinstance(value,bytes):
+        return bytes(value)
+    return bytes.fromhex(value[2:] if value[:2] in ('0x','0X') else value)
+
+def _as_hexbytes(value:Any) -> HexBytes:
+    if type(value) is HexBytes:
+        return value
+    return HexBytes(value)
+
+def _as_int(value:Any) -> int:
+    if isinstance(value,int):
+        return value
+    return int(value,16)
+
+def _decode_uint(word:bytes) -> int:
+    return int.from_bytes(word,'big')
+
+def _decode_int(word:bytes) -> int:
+    return int.from_bytes(word,'big',signed=True)
+
+def _decode_bool(word:bytes) -> bool:
+    return word[31] != 0
+
+def _decode_address(word:bytes) -> ChecksumAddress:
+    return checksum_address_bytes(word[12:])
+
+def _decode_bytes32(word:bytes) -> bytes:
+    return bytes(word)
+
+def get_word_decoder(abi_type:str) -> WordDecoder:
+    if abi_type == 'address':
+        return _decode_address
+    if abi_type == 'bool':
+        return _decode_bool
+    if abi_type == 'bytes32':
+        return _decode_bytes32
+    if abi_type.startswith('uint'):
+        return _decode_uint
+    if abi_type.startswith('int'):
+        return _decode_int
+    raise ValueError(f"Type {abi_type} is not a static ABI word and cannot be fast decoded")
+
+def event_topic(event_abi:Dict[str,Any]) -> bytes:
+    return keccak(text=f"{event_abi['name']}({','.join(i['type'] for i in event_abi['inputs'])})")
+
+class LogDecoder:
+
+    # compiled from one event ABI: each argument is read straight from its topic or data word
+    __slots__ = ('name','topic','topic_count','data_size','event_type','args_type','fields')
+
+    def __init__(self,
+                 event_abi:Dict[str,Any],
+                 event_type:Type[BaseEventData],
+                 args_type:Type[Any]) -> None:
+        self.name:str = event_abi['name']
+        self.topic = event_topic(event_abi)
+        self.event_type = event_type
+        self.args_type = args_type
+        self.fields:List[Tuple[bool,int,WordDecoder]] = []
+        topic_index = 1
+        data_offset = 0
+        for arg in event_abi['inputs']:
+            decoder = get_word_decoder(arg['type'])
+            if arg['indexed']:
+                self.fields.append((True,topic_index,decoder))
+                topic_index += 1
+            else:
+                self.fields.append((False,data_offset,decoder))
+                data_offset += 32
+        self.topic_count = topic_index
+        self.data_size = data_offset
+
+    def decode_args(self,
+                    topics:List[Any],
+                    data:bytes) -> Any:
+        return self.args_type(*[decoder(_as_bytes(topics[i])) if indexed else decoder(data[i:i + 32]) for indexed,i,decoder in self.fields])
+
+    def decode(self,log:Any) -> Optional[BaseEventData]:
+        # None when the log only shares topic0, e.g. an ERC721 Transfer against the ERC20 decoder
+        topics = log['topics']
+        data = _as_bytes(log['data'])
+        if len(topics) != self.topic_count or len(data) < self.data_size:
+            return None
+        address = log['address']
+        return self.event_type(checksum_address_str(address) if isinstance(address,str) else checksum_address_bytes(address),  # type: ignore
+                               _as_hexbytes(log['blockHash']),
+                               _as_int(log['blockNumber']),
+                               _as_int(log['logIndex']),
+                               _as_hexbytes(log['transactionHash']),
+                               _as_int(log['transactionIndex']),
+                               self.decode_args(topics,data))
+
+    def __repr__(self) -> str:
+        return f"LogDecoder({self.name}, 0x{self.topic.hex()})"
+
+def _find_event_abi(abi:List[Dict[str,Any]],name:str) -> Dict[str,Any]:
+    for item in abi:
+        if item.get('type') == 'event' and item.get('name') == name:
+            return item
+    raise ValueError(f"Event {name} not found in ABI")
+
+# (abi name, event name, event data type, args type) for every event with a decoder; get_log_decoders
+# turns this into the topic0 table, so one pass over a receipt or log range decodes all of them
+DECODED_EVENTS:List[Tuple[str,str,Type[BaseEventData],Type[Any]]] = [
+    ('FWX_PERP_CORE_ABI','OpenPosition',FWXPerpCoreOpenPositionEventData,FWXPerpCoreOpenPositionArgs),
+    ('FWX_PERP_CORE_ABI','ClosePosition',FWXPerpCoreClosePositionEventData,FWXPerpCoreClosePositionArgs),
+    ('FWX_PERP_CORE_ABI','CollectFees',FWXPerpCoreCollectFeesEventData,FWXPerpCoreCollectFeesArgs),
+    ('FWX_PERP_CORE_ABI','LiquidatePosition',FWXPerpCoreLiquidatePositionEventData,FWXPerpCoreLiquidatePositionArgs),
+    ('FWX_PERP_CORE_ABI','TriggerTPSL',FWXPerpCoreTriggerTPSLEventData,FWXPerpCoreTriggerTPSLArgs),
+    ('FWX_PERP_CORE_ABI','SetTPSL',FWXPerpCoreSetTPSLEventData,FWXPerpCoreSetTPSLArgs),
+    ('FWX_PERP_CORE_ABI','Deposit',FWXPerpCoreDepositEventData,FWXPerpCoreDepositArgs),
+    ('FWX_PERP_CORE_ABI','Withdraw',FWXPerpCoreWithdrawEventData,FWXPerpCoreWithdrawArgs),
+    ('FWX_PERP_CORE_ABI','DepositCollateral',FWXPerpCoreDepositCollateralEventData,FWXPerpCoreDepositCollateralArgs),
+    ('FWX_PERP_CORE_ABI','WithdrawCollateral',FWXPerpCoreWithdrawCollateralEventData,FWXPerpCoreWithdrawCollateralArgs),
+    ('FWX_PERP_CORE_ABI','UpdateGlobalStat',FWXPerpCoreUpdateGlobalStatEventData,FWXPerpCoreUpdateGlobalStatArgs),
+    ('FWX_PERP_CORE_ABI','UpdateWallet',FWXPerpCoreUpdateWalletEventData,FWXPerpCoreUpdateWalletArgs),
+    ('ERC20_ABI','Transfer',ERC20TransferEventData,ERC20TransferArgs),
+]
+
+CORE_EVENT_NAMES:Tuple[str,...] = tuple(event_name for abi_name,event_name,_,_ in DECODED_EVENTS if abi_name == 'FWX_PERP_CORE_ABI')
+
+@lru_cache(maxsize=None)
+def get_log_decoders() -> Dict[bytes,LogDecoder]:
+    decoders:Dict[bytes,LogDecoder] = {}
+    for abi_name,event_name,event_type,args_type in DECODED_EVENTS:
+        decoder = LogDecoder(_find_event_abi(load_abi(abi_name),event_name),event_type,args_type)
+        decoders[decoder.topic] = decoder
+    return decoders
+
+def get_log_decoder(event_name:str) -> LogDecoder:
+    for decoder in get_log_decoders().values():
+        if decoder.name == event_name:
+            return decoder
+    raise ValueError(f"No fast decoder for event {event_name}")
+
+def select_log_decoders(*event_names:str) -> Dict[bytes,LogDecoder]:
+    decoders = {topic:decoder for topic,decoder in get_log_decoders().items() if decoder.name in event_names}
+    missing = set(event_names) - {decoder.name for decoder in decoders.values()}
+    if missing:
+        raise ValueError(f"No fast decoder for events {sorted(missing)}")
+    return decoders
+
+def decode_log(log:Any,
+               decoders:Optional[Dict[bytes,LogDecoder]]=None) -> Optional[BaseEventData]:
+    topics = log['topics']
+    if len(topics) == 0:
+        return None
+    decoder = (decoders if decoders is not None else get_log_decoders()).get(_as_bytes(topics[0]))
+    if decoder is None:
+        return None
+    return decoder.decode(log)
+
+def decode_logs(logs:Iterable[Any],
+                address:Optional[str]=None,
+                decoders:Optional[Dict[bytes,LogDecoder]]=None) -> List[BaseEventData]:
+    # one pass over the logs; logs from other contracts or without a decoder are skipped
+    if decoders is None:
+        decoders = get_log_decoders()
+    if address is not None:
+        address = address.lower()
+    events:List[BaseEventData] = []
+    for log in logs:
+        if address is not None and str(log['address']).lower() != address:
+            continue
+        event = decode_log(log,decoders)
+        if event is not None:
+            events.append(event)
+    return events
+
+def decode_receipt(receipt:Any,
+                   address:Optional[str]=None,
+                   decoders:Optional[Dict[bytes,LogDecoder]]=None) -> List[BaseEventData]:
+    return decode_logs(receipt['logs'],address,decoders)
@@ -0,0 +1,344 @@
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED
+)
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.contract.contract import (
+    ContractEvent,
+)
+from web3.exceptions import (
+    BlockNotFound,
+)
+from web3.types import (
+    EventData,
+    FilterParams,
+    LogReceipt,
+)
+
+from fwx.types import (
+    BaseEventData,
+)
+from fwx.decoder import (
+    CORE_EVENT_NAMES,
+    LogDecoder,
+    decode_log,
+    select_log_decoders,
+)
+
+# provider messages meaning the range was too wide, as opposed to the endpoint being down
+RANGE_ERROR_MESSAGES = ('more than','too many','limit exceeded','block range','range is too','range too','response size','too large','timed out','timeout')
+
+LogFetcher = Callable[[int,int],Sequence[Any]]
+
+def is_range_error(error:Exception) -> bool:
+    message = str(error).lower()
+    if 'rate limit' in message:
+        return False
+    return any(m in message for m in RANGE_ERROR_MESSAGES)
+
+def log_sort_key(log:Any) -> Tuple[int,int]:
+    return int(log['blockNumber']),int(log['logIndex'])
+
+class LogBackfiller:
+
+    # splits [from_block, to_block] into chunks fetched by up to max_workers threads; a chunk that fails
+    # with a range error is halved and retried, and chunk_size follows the observed log density so a
+    # chunk returns about target_logs. Other failures, rate limits included, are retried after an
+    # exponential backoff with jitter. chunk_size is kept between calls
+    def __init__(self,
+                 w3:Web3,
+                 max_workers:int=4,
+                 chunk_size:int=2000,
+                 min_chunk_size:int=1,
+                 max_chunk_size:int=100_000,
+                 target_logs:int=1000,
+                 retries:int=3,
+                 backoff_factor:float=0.5,
+                 max_backoff:float=10) -> None:
+        self.w3 = w3
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_logs = target_logs
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def backoff_delay(self,attempt:int) -> float:
+        # jittered so workers throttled together do not come back together
+        return min(self.backoff_factor*2**attempt,self.max_backoff)*random.uniform(0.5,1)
+
+    def _adapt(self,size:int,count:int) -> None:
+        if count > self.target_logs:
+            self.chunk_size = max(self.min_chunk_size,min(self.chunk_size,size*self.target_logs//count))
+        elif count < self.target_logs//2 and size >= self.chunk_size:
+            ideal = size*self.target_logs//count if count > 0 else self.max_chunk_size
+            self.chunk_size = min(self.max_chunk_size,ideal,self.chunk_size*2)
+
+    def backfill(self,
+                 fetch:LogFetcher,
+                 from_block:int,
+                 to_block:int) -> List[Any]:
+        chunks:Dict[int,Sequence[Any]] = {}
+        # (start, end, attempt, monotonic time the chunk may be sent again)
+        retry:Deque[Tuple[int,int,int,float]] = deque()
+        running:Dict['Future[Sequence[Any]]',Tuple[int,int,int]] = {}
+        cursor = from_block
+        with ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix='fwx-logs') as executor:
+            while cursor <= to_block or retry or running:
+                now = time.monotonic()
+                while len(running) < self.max_workers:
+                    ready = next((item for item in retry if item[3] <= now),None)
+                    if ready is not None:
+                        retry.remove(ready)
+                        start,end,attempt,_ = ready
+                    elif cursor <= to_block:
+                        start,end,attempt = cursor,min(cursor + self.chunk_size - 1,to_block),0
+                        cursor = end + 1
+                    else:
+                        break
+                    running[executor.submit(fetch,start,end)] = (start,end,attempt)
+
+                # with a worker free, wake up when the next backed-off chunk is due
+                backing_off = [item[3] - now for item in retry if item[3] > now]
+                timeout = min(backing_off) if backing_off and len(running) < self.max_workers else None
+                if not running:
+                    time.sleep(timeout) # type: ignore
+                    continue
+                done,_ = wait(running,timeout=timeout,return_when=FIRST_COMPLETED)
+                for future in done:
+                    start,end,attempt = running.pop(future)
+                    size = end - start + 1
+                    error = future.exception()
+                    if error is None:
+                        logs = future.result()
+                        chunks[start] = logs
+                        self._adapt(size,len(logs))
+                        logging.debug(f"get_logs {start}-{end}: {len(logs)} logs, chunk size {self.chunk_size}")
+                        continue
+                    if is_range_error(error) and size > self.min_chunk_size:
+                        middle = start + size//2
+                        retry.appendleft((middle,end,0,0))
+                        retry.appendleft((start,middle - 1,0,0))
+                        self.chunk_size = max(self.min_chunk_size,min(self.chunk_size,size//2))
+                        logging.info(f"get_logs {start}-{end} too wide, splitting; chunk size {self.chunk_size}: {error}")
+                    elif attempt < self.retries:
+                        delay = self.backoff_delay(attempt)
+                        logging.warning(f"get_logs {start}-{end} failed, retrying in {delay:.2f}s: {error}")
+                        retry.append((start,end,attempt + 1,time.monotonic() + delay))
+                    else:
+                        for pending in running:
+                            pending.cancel()
+                        raise ValueError(f"get_logs for blocks {start}-{end} failed after {attempt + 1} attempts: {error}") from error
+
+        # chunks are disjoint, so concatenating by start block is already nearly sorted
+        logs = [log for start in sorted(chunks) for log in chunks[start]]
+        logs.sort(key=log_sort_key)
+        return logs
+
+    def _resolve_to_block(self,to_block:Optional[int]) -> int:
+        return self.w3.eth.block_number if to_block is None else to_block
+
+    def get_logs(self,
+                 filter_params:FilterParams,
+                 from_block:int,
+                 to_block:Optional[int]=None) -> List[LogReceipt]:
+        def fetch(start:int,end:int) -> Sequence[LogReceipt]:
+            return self.w3.eth.get_logs({**filter_params,'fromBlock':start,'toBlock':end})
+        return self.backfill(fetch,from_block,self._resolve_to_block(to_block))
+
+    def get_event_logs(self,
+                       event:ContractEvent,
+                       from_block:int,
+                       to_block:Optional[int]=None,
+                       argument_filters:Optional[Dict[str,Any]]=None) -> List[EventData]:
+        def fetch(start:int,end:int) -> Sequence[EventData]:
+            return event.get_logs(argument_filters=argument_filters,from_block=start,to_block=end) # type: ignore
+        return self.backfill(fetch,from_block,self._resolve_to_block(to_block))
+
+EventCallback = Callable[[BaseEventData],None]
+
+class EventFollower:
+
+    # follows the chain from from_block. Logs are fetched as soon as their block appears and handed to
+    # on_event once the block has `confirmations` blocks on top. The hashes of recently seen blocks are
+    # kept for reorg_window blocks; when the chain under them changes, events already delivered from
+    # orphaned blocks go to on_retract, newest first, and the range is fetched again
+    def __init__(self,
+                 w3:Web3,
+                 address:Union[str,Sequence[str]],
+                 from_block:int,
+                 on_event:EventCallback,
+                 on_retract:Optional[EventCallback]=None,
+                 confirmations:int=2,
+                 reorg_window:int=64,
+                 decoders:Optional[Dict[bytes,LogDecoder]]=None,
+                 backfiller:Optional[LogBackfiller]=None) -> None:
+        self.w3 = w3
+        self.on_event = on_event
+        self.on_retract = on_retract
+        self.confirmations = confirmations
+        self.reorg_window = reorg_window
+        self.decoders = decoders if decoders is not None else select_log_decoders(*CORE_EVENT_NAMES)
+        self.backfiller = backfiller if backfiller is not None else LogBackfiller(w3)
+        self.filter_params:Any = {'address':address if isinstance(address,str) else list(address),
+                                  'topics':[['0x' + topic.hex() for topic in self.decoders]]}
+        self.from_block = from_block
+        self.next_block = from_block
+        self.delivered_block = from_block - 1
+        self.head_block:Optional[int] = None
+        self._hashes:Dict[int,HexBytes] = {}
+        self._pruned = False
+        self._pending:Dict[int,List[BaseEventData]] = {}
+        self._delivered:Dict[int,List[BaseEventData]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread:Optional[threading.Thread] = None
+
+    def _get_block_hash(self,block_number:int) -> Optional[HexBytes]:
+        try:
+            return HexBytes(self.w3.eth.get_block(block_number)['hash'])
+        except BlockNotFound:
+            return None
+
+    def _find_fork(self,head:Any) -> Optional[int]:
+        # a matching hash vouches for every block below it, so the usual case costs no extra request:
+        # the new head is a block already seen or a child of the newest one
+        if not self._hashes:
+            return None
+        newest_block = max(self._hashes)
+        head_number = int(head['number'])
+        if self._hashes.get(head_number) == HexBytes(head['hash']) and head_number == newest_block:
+            return None
+        if head_number == newest_block + 1 and HexBytes(head['parentHash']) == self._hashes[newest_block]:
+            return None
+        for block_number in sorted(self._hashes,reverse=True):
+            if self._get_block_hash(block_number) == self._hashes[block_number]:
+                return None if block_number == newest_block else block_number + 1
+        # until the window first fills, every block since from_block is still covered
+        if not self._pruned:
+            return self.from_block
+        raise ValueError(f"Reorg deeper than the {self.reorg_window} block window, nothing to rewind to")
+
+    def _rewind(self,fork_block:int) -> List[BaseEventData]:
+        retracted:List[BaseEventData] = []
+        for block_number in sorted(self._delivered,reverse=True):
+            if block_number >= fork_block:
+                retracted.extend(reversed(self._delivered.pop(block_number)))
+        for blocks in (self._pending,self._hashes):
+            for block_number in [b for b in blocks if b >= fork_block]:
+                del blocks[block_number]
+        self.next_block = min(self.next_block,fork_block)
+        self.delivered_block = min(self.delivered_block,fork_block - 1)
+        logging.warning(f"Reorg from block {fork_block}, retracting {len(retracted)} events")
+        return retracted
+
+    def _fetch(self,
+               head_number:int,
+               head_hash:HexBytes) -> bool:
+        logs = self.backfiller.get_logs(self.filter_params,self.next_block,head_number)
+        hashes:Dict[int,HexBytes] = {head_number:head_hash}
+        pending:Dict[int,List[BaseEventData]] = {}
+        for log in logs:
+            block_number = int(log['blockNumber'])
+            block_hash = HexBytes(log['blockHash'])
+            # the head moved between the two requests; drop this round and fetch it again on the next poll
+            if hashes.setdefault(block_number,block_hash) != block_hash:
+                return False
+            event = decode_log(log,self.decoders)
+            if event is not None:
+                pending.setdefault(block_number,[]).append(event)
+        self._hashes.update(hashes)
+        for block_number,events in pending.items():
+            self._pending.setdefault(block_number,[]).extend(events)
+        self.next_block = head_number + 1
+        return True
+
+    def poll(self) -> int:
+        with self._lock:
+            head = self.w3.eth.get_block('latest')
+            head_number = int(head['number'])
+            fork_block = self._find_fork(head)
+            retracted = self._rewind(fork_block) if fork_block is not None else []
+            if head_number >= self.next_block:
+                self._fetch(head_number,HexBytes(head['hash']))
+            self.head_block = head_number
+
+            delivered:List[BaseEventData] = []
+            confirmed_block = head_number - self.confirmations
+            for block_number in sorted(b for b in self._pending if b <= confirmed_block):
+                events = self._pending.pop(block_number)
+                self._delivered[block_number] = events
+                delivered.extend(events)
+            self.delivered_block = max(self.delivered_block,min(confirmed_block,self.next_block - 1))
+
+            oldest_block = head_number - self.reorg_window
+            for blocks in (self._hashes,self._delivered):
+                for block_number in [b for b in blocks if b < oldest_block]:
+                    del blocks[block_number]
+            self._pruned = self._pruned or self.from_block < oldest_block
+
+        for event in retracted:
+            self._call(self.on_retract,event)
+        for event in delivered:
+            self._call(self.on_event,event)
+        return len(delivered)
+
+    def _call(self,
+              callback:Optional[EventCallback],
+              event:BaseEventData) -> None:
+        if callback is None:
+            return
+        try:
+            callback(event)
+        except Exception as e:
+            logging.warning(f"Event callback failed for {event.event} at block {event.block_number}: {e}")
+
+    def on_new_head(self,block:Dict[str,Any]) -> None:
+        # feed from a newHeads subscription to poll as soon as a block arrives
+        self._wakeup.set()
+
+    def start(self,poll_interval:float=2) -> 'EventFollower':
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,args=(poll_interval,),name='event-follower',daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self,poll_interval:float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logging.warning(f"Event follower poll failed: {e}")
+            self._wakeup.wait(poll_interval)
+            self._wakeup.clear()
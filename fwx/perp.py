@@ -1,12 +1,16 @@
 from web3 import Web3
 from web3.types import (
+    BlockIdentifier,
     Wei,
+    TxReceipt,
 )
 from eth_typing import (
     ChecksumAddress,
 )
 from fwx.types import (
     RPCDetail,
+    FWXPerpCoreGetPositionRespond,
+    FWXPerpCoreTPSLRespond,
     FWXPerpHelperGetBalanceRespond,
     FWXPerpHelperGetAllPositionRespond
 )
@@ -14,10 +18,14 @@ from web3.contract.contract import (
     ContractFunction,
 )
 from fwx.contract import (
+    BatchCall,
+    ContractCallBatch,
+    format_all_active_positions,
     ERC20Contract,
     FWXMembershipContract,
     FWXPerpCoreContract,
-    FWXPerpHelperContract
+    FWXPerpHelperContract,
+    Multicall3Contract
 )
 
 from typing import (
@@ -25,82 +33,86 @@ from typing import (
     Dict,
     List,
     Tuple,
-    Optional
+    Optional,
+    Union
 )
 from fwx.constant import (
-    PYTH_ID,
-    MAX_UINT
+    MAX_UINT,
+    MULTICALL3_ADDRESS
+)
+from fwx.provider import (
+    TransactionBroadcaster,
+    get_shared_web3
 )
 from fwx.w3 import (
-    Web3HTTPWallet
+    Web3HTTPWallet,
+    FeeOracle,
+    GasEstimateCache,
+    TransactionHandle
 )
 from fwx.types import (
     TxParamsInput
 )
+from fwx.pyth import (
+    HermesClient,
+    PythPriceCache,
+    HermesPriceStream,
+    get_default_hermes_client,
+    RawPythData,
+    to_price_snapshot,
+    create_pyth_data,
+    create_pyth_update_data
+)
 from hexbytes import HexBytes
-import requests
 import logging
 logging.basicConfig(level=logging.INFO)
 
-def get_raw_pyth_fwx_data()->Dict[str,Any]:
-        url = 'https://hermes-pyth.fwx.finance/?pyth=perp&encoding=hex'
-        data = requests.get(url).json()
-        return data
+def get_raw_pyth_fwx_data(hermes_client:Optional[HermesClient]=None)->Dict[str,Any]:
+    if hermes_client is None:
+        hermes_client = get_default_hermes_client()
+    return hermes_client.get_raw_pyth_fwx_data()
     
-def get_raw_pyth_data(list_of_pyth_id: List[str])->Dict[str,Any]:
-    base_url = 'https://hermes.pyth.network/v2/updates/price/latest'
-    endpoint = ''
-    for i in range(len(list_of_pyth_id)):
-        if i == 0:
-            endpoint += f'?ids%5B%5D={list_of_pyth_id[i]}'
-        else:
-            endpoint += f'&ids%5B%5D={list_of_pyth_id[i]}'
-    url = base_url + endpoint
-    data = requests.get(url).json()
-    return data
-
-def create_pyth_data(raw_pyth_data:Dict[str,Any])->List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
-    pyth_data:List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]] = []
-    for i in raw_pyth_data['parsed']:
-        
-        id:bytes = bytes.fromhex(i['id'])
-        price:Tuple[int, ...] = tuple([int(j) for j in i['price'].values()])
-        ema_price:Tuple[int, ...] = tuple([int(j) for j in i['ema_price'].values()])
-        d:Tuple[bytes, Tuple[int, ...], Tuple[int, ...]] = (id, price, ema_price)
-        pyth_data.append(d)
-        
-    return pyth_data
-
-def create_pyth_update_data(raw_pyth_data:Dict[str,Any])->List[bytes]:
-
-    return [bytes.fromhex(raw_pyth_data['binary']['data'][0])]
-
+def get_raw_pyth_data(list_of_pyth_id: List[str],
+                      hermes_client:Optional[HermesClient]=None)->Dict[str,Any]:
+    if hermes_client is None:
+        hermes_client = get_default_hermes_client()
+    return hermes_client.get_raw_pyth_data(list_of_pyth_id)
 
 class Perp:
     
     def __init__(self,
-                 w3:Web3,
+                 w3:Optional[Web3],
                  rpc_detail:RPCDetail,
                  membership_address: str,
                  perp_core_address: str,
                  helper_address: str,
-                 usdc_address: str
+                 usdc_address: str,
+                 hermes_client: Optional[HermesClient]=None,
+                 price_cache: Optional[Union[PythPriceCache,HermesPriceStream]]=None,
+                 multicall_address: str=MULTICALL3_ADDRESS
                  ) -> None:
+        if hermes_client is None:
+            hermes_client = get_default_hermes_client()
+        if price_cache is None:
+            price_cache = PythPriceCache(hermes_client,max_age=0)
+        if w3 is None:
+            w3 = get_shared_web3(rpc_detail.rpcs or rpc_detail.rpc)
+        self.hermes_client = hermes_client
+        self.price_cache = price_cache
         self.membership = FWXMembershipContract(w3, rpc_detail, Web3.to_checksum_address(membership_address))
         self.core = FWXPerpCoreContract(w3, rpc_detail, Web3.to_checksum_address(perp_core_address))
         self.helper = FWXPerpHelperContract(w3, rpc_detail, Web3.to_checksum_address(helper_address))
         self.usdc = ERC20Contract(w3, rpc_detail, Web3.to_checksum_address(usdc_address))
+        self.multicall = Multicall3Contract(w3, rpc_detail, Web3.to_checksum_address(multicall_address))
         
     def get_perp_balance(self,
                                nft_id:int)->FWXPerpHelperGetBalanceRespond:
-        raw_pyth_data = get_raw_pyth_fwx_data()
-        pyth_data = create_pyth_data(raw_pyth_data)
+        pyth_data = self.price_cache.get_pyth_data()
         
         return self.helper.get_balance(self.core.address,nft_id,pyth_data)
 
     def get_all_positions(self,nft_id:int) -> Optional[List[FWXPerpHelperGetAllPositionRespond]]:
-        raw_pyth_data = get_raw_pyth_fwx_data()
-        pyth_data = create_pyth_data(raw_pyth_data)
+        pyth_data = self.price_cache.get_pyth_data()
 
         return  self.helper.get_all_active_positions(self.core.address,
                                                                 nft_id,
@@ -116,7 +128,7 @@ class Perp:
     def get_max_contract_size(self,
                               nft_id:int,
                               underlying_address:ChecksumAddress,
-                              raw_pyth_data:Dict[str,Any],
+                              raw_pyth_data:RawPythData,
                               is_new_long:bool,
                               leverage:int,
                               safety_factor:int=980000)->Wei:
@@ -138,7 +150,7 @@ class Perp:
                                                        contract_size:int,
                                                        leverage:int,
                                                        underlying_address:ChecksumAddress,
-                                                       raw_pyth_data:Dict[str,Any])->ContractFunction:
+                                                       raw_pyth_data:RawPythData)->ContractFunction:
         max_contract_size = self.get_max_contract_size(nft_id,
                                                        underlying_address,
                                                        raw_pyth_data,
@@ -163,22 +175,20 @@ class Perp:
     def get_contract_size_given_volumn(self,
                                        volume:float,
                                        underlying_symbol:str,
-                                       raw_pyth_data:Dict[str,Any],
+                                       raw_pyth_data:RawPythData,
                                        )->float:
-        contract_size = 0
-        for i in raw_pyth_data['parsed']:
-            if i['id'] == PYTH_ID[underlying_symbol]:
-                price = int(i['price']['price'])*10**i['price']['expo']
-                contract_size = volume/price
-                break
-            
-        if contract_size == 0:
+        try:
+            price = to_price_snapshot(raw_pyth_data).get_price(underlying_symbol)
+        except ValueError:
             raise ValueError("Invalid underlying symbol")
             
-        return contract_size
+        return volume/price
+    
+    def decode_core_events(self,receipt:TxReceipt) -> List[Any]:
+        return self.core.decode_receipt(receipt)
     
     def close_position_with_pos_id(self,
-                                         raw_pyth_data:Dict[str,Any],
+                                         raw_pyth_data:RawPythData,
                                          nft_id:int,
                                          pos_id:int,
                                          closing_size:int,
@@ -191,30 +201,139 @@ class Perp:
                                         pyth_update_data)
         return func
     
+class FWXPerpBatch(ContractCallBatch):
+    
+    def __init__(self,
+                 perp:Perp,
+                 wallet_address:ChecksumAddress,
+                 nft_id:int=0,
+                 block_identifier:BlockIdentifier='latest',
+                 multicall:bool=False) -> None:
+        super().__init__(perp.core.w3, block_identifier, perp.multicall if multicall else None)
+        self.perp = perp
+        self.wallet_address = wallet_address
+        self.nft_id = nft_id
+        self._pyth_data:Optional[List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]] = None
+        
+    def _get_nft_id(self,nft_id:int) -> int:
+        if nft_id == 0:
+            if self.nft_id == 0:
+                raise ValueError("NFT ID is not set. Please call get_nft_id() first.")
+            nft_id = self.nft_id
+        return nft_id
+    
+    def _get_pyth_data(self) -> List[Tuple[bytes,Tuple[int,...],Tuple[int,...]]]:
+        # every helper view in one batch prices against the same snapshot
+        if self._pyth_data is None:
+            self._pyth_data = self.perp.price_cache.get_pyth_data()
+        return self._pyth_data
+        
+    def get_position(self,
+                     underlying_address:str,
+                     nft_id:int=0) -> BatchCall:
+        func = self.perp.core.getPosition(self._get_nft_id(nft_id),Web3.to_checksum_address(underlying_address))
+        return self.add(func,lambda res: FWXPerpCoreGetPositionRespond(*res))
+    
+    def get_tpsl(self,
+                 pos_id:int,
+                 nft_id:int=0) -> BatchCall:
+        func = self.perp.core.tpsls(self._get_nft_id(nft_id),pos_id)
+        return self.add(func,lambda res: FWXPerpCoreTPSLRespond(*res))
+    
+    def is_liquidable(self,
+                      pos_id:int,
+                      nft_id:int=0) -> BatchCall:
+        return self.add(self.perp.core.isLiquidable(self._get_nft_id(nft_id),pos_id))
+    
+    def get_trading_fee_rate(self,underlying_address:str) -> BatchCall:
+        return self.add(self.perp.core.tradingFeeRates(Web3.to_checksum_address(underlying_address)))
+    
+    def get_maintenance_margin_ratio(self,underlying_address:str) -> BatchCall:
+        return self.add(self.perp.core.maintenanceMarginRatio(Web3.to_checksum_address(underlying_address)))
+    
+    def get_perp_balance(self,nft_id:int=0) -> BatchCall:
+        func = self.perp.helper.getBalance(self.perp.core.address,self._get_nft_id(nft_id),self._get_pyth_data())
+        return self.add(func,lambda res: FWXPerpHelperGetBalanceRespond(*res))
+    
+    def get_all_positions(self,nft_id:int=0) -> BatchCall:
+        func = self.perp.helper.getAllActivePositions(self.perp.core.address,self._get_nft_id(nft_id),self._get_pyth_data())
+        return self.add(func,format_all_active_positions)
+    
+    def get_default_membership(self,wallet_address:Optional[str]=None) -> BatchCall:
+        wallet_address = self.wallet_address if wallet_address is None else Web3.to_checksum_address(wallet_address)
+        return self.add(self.perp.membership.getDefaultMembership(wallet_address))
+    
+    def get_usdc_balance(self,address:Optional[str]=None) -> BatchCall:
+        address = self.wallet_address if address is None else Web3.to_checksum_address(address)
+        return self.add(self.perp.usdc.balanceOf(address))
+    
+    def get_allowance(self,
+                      owner:Optional[str]=None,
+                      spender:Optional[str]=None) -> BatchCall:
+        owner = self.wallet_address if owner is None else Web3.to_checksum_address(owner)
+        spender = self.perp.core.address if spender is None else Web3.to_checksum_address(spender)
+        return self.add(self.perp.usdc.allowance(owner,spender))
+    
+    def __enter__(self) -> 'FWXPerpBatch':
+        return self
+
 class FWXPerpSDK(Web3HTTPWallet):
     def __init__(self,
-                 w3:Web3,
+                 w3:Optional[Web3],
                  rpc_detail:RPCDetail,
                  private_key:str,
                  membership_address:str,
                  perp_core_address:str,
                  helper_address:str,
                  usdc_address:str,
-                 nft_id:int=0) -> None:
-        super().__init__(w3, rpc_detail, private_key)
-        self.perp = Perp(self.w3, rpc_detail, membership_address, perp_core_address, helper_address, usdc_address)
+                 nft_id:int=0,
+                 hermes_client:Optional[HermesClient]=None,
+                 price_cache:Optional[Union[PythPriceCache,HermesPriceStream]]=None,
+                 fee_oracle:Optional[FeeOracle]=None,
+                 gas_cache:Optional[GasEstimateCache]=None,
+                 broadcaster:Optional[TransactionBroadcaster]=None,
+                 multicall_address:str=MULTICALL3_ADDRESS) -> None:
+        super().__init__(w3, rpc_detail, private_key, fee_oracle, gas_cache, broadcaster)
+        self.perp = Perp(self.w3, rpc_detail, membership_address, perp_core_address, helper_address, usdc_address, hermes_client, price_cache, multicall_address)
+        self.hermes_client = self.perp.hermes_client
+        self.price_cache = self.perp.price_cache
         self.nft_id = nft_id
+        
+    def get_raw_pyth_data(self,list_of_pyth_id:List[str])->Dict[str,Any]:
+        return self.hermes_client.get_raw_pyth_data(list_of_pyth_id)
 
-    def get_nft_id(self,referal_id:int)->None:
+    def _finish_transaction(self,
+                            txn:HexBytes,
+                            wait:bool) -> Union[HexBytes,TransactionHandle]:
+        if not wait:
+            return self.track_transaction(txn,self.perp.decode_core_events)
+        self.wait_for_transaction_receipt(txn)
+        return txn
+
+    def get_nft_id(self,referal_id:int,wait:bool=True)->Optional[TransactionHandle]:
         self.nft_id =  self.perp.membership.get_default_membership(self.wallet_address)
         if self.nft_id == 0:
             logging.info("Minting NFT ID")
             txn_params = self.create_txn_params(TxParamsInput())
-            txn_params =  self.perp.membership.mint(referal_id).build_transaction(txn_params)
+            txn_params =  self.prepare_function_transaction(self.perp.membership.mint(referal_id),txn_params)
             txn =  self.send_transaction(txn_params)
-            self.w3.eth.wait_for_transaction_receipt(txn)
+            if not wait:
+                handle = self.track_transaction(txn)
+                handle.add_done_callback(self._on_nft_minted)
+                return handle
+            self.wait_for_transaction_receipt(txn)
             self.nft_id =  self.perp.membership.get_default_membership(self.wallet_address)
+        return None
+    
+    def _on_nft_minted(self,handle:TransactionHandle) -> None:
+        if handle.future.exception() is None:
+            self.nft_id = self.perp.membership.get_default_membership(self.wallet_address)
             
+    def batch(self,
+              block_identifier:BlockIdentifier='latest',
+              multicall:bool=False) -> FWXPerpBatch:
+        return FWXPerpBatch(self.perp,self.wallet_address,self.nft_id,block_identifier,multicall)
+    
     def get_perp_balance(self,
                          nft_id:int=0)->FWXPerpHelperGetBalanceRespond:
         if nft_id == 0:
@@ -237,7 +356,8 @@ class FWXPerpSDK(Web3HTTPWallet):
                                   amount:int,
                                   underlying_address:str,
                                   tx_params_input:TxParamsInput=TxParamsInput(),
-                                  nft_id:int=0)->HexBytes:
+                                  nft_id:int=0,
+                                  wait:bool=True)->Union[HexBytes,TransactionHandle]:
         if nft_id == 0:
             if self.nft_id == 0:
                 raise ValueError("NFT ID is not set. Please call get_nft_id() first.")
@@ -250,16 +370,15 @@ class FWXPerpSDK(Web3HTTPWallet):
         if allowance < amount:
             func = self.perp.usdc.approve(spender,MAX_UINT)
             txn_params = self.create_txn_params(TxParamsInput())
-            txn_params = func.build_transaction(txn_params)
+            txn_params = self.prepare_function_transaction(func,txn_params)
             txn = self.send_transaction(txn_params)
-            self.w3.eth.wait_for_transaction_receipt(txn)
+            self.wait_for_transaction_receipt(txn)
             
         deposit_func = self.perp.deposit_collateral_in_wei(nft_id, amount, underlying_address)
         txn_params = self.create_txn_params(tx_params_input)
-        txn_params = deposit_func.build_transaction(txn_params)
-        txn = self.send_transaction(txn_params)
-        self.w3.eth.wait_for_transaction_receipt(txn)
-        return txn
+        txn_params = self.prepare_function_transaction(deposit_func,txn_params)
+        txn = self.send_transaction(txn_params,gas_key=(Web3.to_checksum_address(underlying_address),))
+        return self._finish_transaction(txn,wait)
         
 
 
@@ -267,18 +386,20 @@ class FWXPerpSDK(Web3HTTPWallet):
                                  amount:int,
                                  underlying_address:str,
                                  tx_params_input:TxParamsInput=TxParamsInput(),
-                                 nft_id:int=0)->HexBytes:
+                                 nft_id:int=0,
+                                 wait:bool=True)->Union[HexBytes,TransactionHandle]:
         
         amount_in_wei = Web3.to_wei(amount,'mwei')
         
         return self.deposit_collateral_in_wei(amount_in_wei,
                                               underlying_address,   
                                                 tx_params_input,
-                                                nft_id)
+                                                nft_id,
+                                                wait)
     
     def get_max_contract_size(self,
                               underlying_address:ChecksumAddress,
-                              raw_pyth_data:Dict[str,Any],
+                              raw_pyth_data:RawPythData,
                               is_new_long:bool,
                               leverage:int,
                               safety_factor:int=980000,
@@ -302,10 +423,11 @@ class FWXPerpSDK(Web3HTTPWallet):
                                                  contract_size:int,
                                                  leverage:int,
                                                  underlying_address:ChecksumAddress,
-                                                 raw_pyth_data:Dict[str,Any],
+                                                 raw_pyth_data:RawPythData,
                                                  nft_id:int=0,
                                                  tx_params_input:TxParamsInput=TxParamsInput(),
-                                                 )->HexBytes:
+                                                 wait:bool=True,
+                                                 )->Union[HexBytes,TransactionHandle]:
         if nft_id == 0:
             if self.nft_id == 0:
                 raise ValueError("NFT ID is not set. Please call get_nft_id() first.")
@@ -321,39 +443,29 @@ class FWXPerpSDK(Web3HTTPWallet):
         value = len(raw_pyth_data['parsed']) + len(raw_pyth_data['binary'])
         tx_params_input = tx_params_input._replace(value=Wei(value))
         tx_params = self.create_txn_params(tx_params_input)
-        tx_params = func.build_transaction(tx_params)
-        txn = self.send_transaction(tx_params)
-        self.w3.eth.wait_for_transaction_receipt(txn)
-        return txn
+        tx_params = self.prepare_function_transaction(func,tx_params)
+        txn = self.send_transaction(tx_params,gas_key=(Web3.to_checksum_address(underlying_address),is_long,is_new_long))
+        return self._finish_transaction(txn,wait)
         
     def get_contract_size_given_volumn(self,
                                        volume:float,
                                        underlying_symbol:str,
-                                       raw_pyth_data:Dict[str,Any],
+                                       raw_pyth_data:RawPythData,
                                        )->float:
-        contract_size = 0
-        for i in raw_pyth_data['parsed']:
-            if i['id'] == PYTH_ID[underlying_symbol]:
-                price = int(i['price']['price'])*10**i['price']['expo']
-                contract_size = volume/price
-                break
-            
-        if contract_size == 0:
-            raise ValueError("Invalid underlying symbol")
-            
-        return contract_size
+        
+        return self.perp.get_contract_size_given_volumn(volume,underlying_symbol,raw_pyth_data)
     
     def open_position_given_contract_size(self,
                                           is_long:bool,
                                           contract_size:float,
                                           leverage:int,
                                           underlying_address:ChecksumAddress,
-                                          raw_pyth_data:Dict[str,Any],
+                                          raw_pyth_data:RawPythData,
                                           is_new_long:bool,
                                           tx_params_input:TxParamsInput=TxParamsInput(),
-                                          nft_id:int=0)->HexBytes:
-        underlying_symbol = self.address_map[underlying_address]
-        underlying = self.token_details[underlying_symbol]
+                                          nft_id:int=0,
+                                          wait:bool=True)->Union[HexBytes,TransactionHandle]:
+        underlying = self.registry.get_token(underlying_address)
         contract_size_in_wei = Web3.to_wei(contract_size,underlying.unit_type)
         
         return self.open_position_given_contract_size_in_wei(is_long,
@@ -363,18 +475,20 @@ class FWXPerpSDK(Web3HTTPWallet):
                                                             underlying_address,
                                                             raw_pyth_data,
                                                             nft_id,
-                                                            tx_params_input)
+                                                            tx_params_input,
+                                                            wait)
         
     def open_position_given_volumn(self,
                                             is_long:bool,
                                             volume:float,
                                             leverage:int,
                                             underlying_address:ChecksumAddress,
-                                            raw_pyth_data:Dict[str,Any],
+                                            raw_pyth_data:RawPythData,
                                             is_new_long:bool,
                                             tx_params_input:TxParamsInput=TxParamsInput(),
-                                            nft_id:int=0)->HexBytes:
-            contract_size = self.get_contract_size_given_volumn(volume,self.address_map[underlying_address],raw_pyth_data)
+                                            nft_id:int=0,
+                                            wait:bool=True)->Union[HexBytes,TransactionHandle]:
+            contract_size = self.get_contract_size_given_volumn(volume,self.registry.get_symbol(underlying_address),raw_pyth_data)
             
             return self.open_position_given_contract_size(is_long,
                                                           contract_size,
@@ -383,15 +497,17 @@ class FWXPerpSDK(Web3HTTPWallet):
                                                           raw_pyth_data,
                                                           is_new_long,
                                                           tx_params_input,
-                                                          nft_id)
+                                                          nft_id,
+                                                          wait)
         
     def close_position_with_pos_id(self,
-                                   raw_pyth_data:Dict[str,Any],
+                                   raw_pyth_data:RawPythData,
                                    pos_id:int,
                                    closing_size:int,
                                    nft_id:int=0,
-                                   tx_params_input:TxParamsInput=TxParamsInput()
-                                   )->HexBytes:
+                                   tx_params_input:TxParamsInput=TxParamsInput(),
+                                   wait:bool=True
+                                   )->Union[HexBytes,TransactionHandle]:
         if nft_id == 0:
             if self.nft_id == 0:
                 raise ValueError("NFT ID is not set. Please call get_nft_id() first.")
@@ -404,7 +520,7 @@ class FWXPerpSDK(Web3HTTPWallet):
         value = len(raw_pyth_data['parsed']) + len(raw_pyth_data['binary'])
         tx_params_input = tx_params_input._replace(value=Wei(value))
         tx_params = self.create_txn_params(tx_params_input)
-        tx_params = funce.build_transaction(tx_params)
-        txn = self.send_transaction(tx_params)
-        self.w3.eth.wait_for_transaction_receipt(txn)
-        return txn
\ No newline at end of file
+        tx_params = self.prepare_function_transaction(funce,tx_params)
+        # closing one position costs differently from closeAllPositions over several
+        txn = self.send_transaction(tx_params,gas_key=('closePosition',nft_id,1))
+        return self._finish_transaction(txn,wait)
\ No newline at end of file
@@ -0,0 +1,404 @@
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+import logging
+import threading
+import time
+import requests
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED
+)
+from hexbytes import HexBytes
+from eth_utils import keccak
+from web3 import Web3
+from web3.providers import (
+    HTTPProvider,
+    JSONBaseProvider
+)
+from web3.types import (
+    RPCEndpoint,
+    RPCResponse
+)
+
+from fwx.types import (
+    EndpointStats,
+    HedgeStats
+)
+
+# JSON-RPC error codes that mean the endpoint, not the request, is the problem; -32603 is left out
+# because nodes also use it for execution reverts
+ENDPOINT_ERROR_CODES = (-32005,429)
+
+# a write may have reached the node before the error, so it is never repeated on another endpoint
+WRITE_METHODS = ('eth_sendRawTransaction','eth_sendTransaction')
+
+def is_endpoint_error(response:Any) -> bool:
+    if not isinstance(response,dict) or 'error' not in response:
+        return False
+    error = response['error']
+    if not isinstance(error,dict):
+        return False
+    message = str(error.get('message','')).lower()
+    return error.get('code') in ENDPOINT_ERROR_CODES or 'rate limit' in message or 'too many requests' in message
+
+def is_transport_error(error:Exception) -> bool:
+    return isinstance(error,requests.exceptions.RequestException)
+
+class _Endpoint:
+    def __init__(self,
+                 endpoint_uri:str,
+                 request_kwargs:Optional[Dict[str,Any]]=None) -> None:
+        self.endpoint_uri = endpoint_uri
+        self.provider = HTTPProvider(endpoint_uri,request_kwargs,exception_retry_configuration=None)
+        self.latency:Optional[float] = None
+        self.error_rate:float = 0
+        self.requests = 0
+        self.errors = 0
+        self.cooldown_until:float = 0
+
+class RPCPoolProvider(JSONBaseProvider):
+
+    # latency and error rate are exponentially weighted; an endpoint whose error rate
+    # passes max_error_rate is skipped for cooldown seconds unless nothing else is left
+    def __init__(self,
+                 endpoint_uris:Sequence[str],
+                 request_kwargs:Optional[Dict[str,Any]]=None,
+                 alpha:float=0.2,
+                 max_error_rate:float=0.5,
+                 cooldown:float=10,
+                 hedge_quantile:float=0.95,
+                 hedge_min_delay:float=0.02,
+                 hedge_default_delay:float=0.25,
+                 hedge_window:int=200,
+                 **kwargs:Any) -> None:
+        if len(endpoint_uris) == 0:
+            raise ValueError("At least one RPC endpoint is required")
+        super().__init__(**kwargs)
+        self.endpoints = [_Endpoint(endpoint_uri,request_kwargs) for endpoint_uri in endpoint_uris]
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_window = hedge_window
+        self._lock = threading.Lock()
+        self._hedge_local = threading.local()
+        self._hedge_executor:Optional[ThreadPoolExecutor] = None
+        self._call_latencies:Dict[str,Deque[float]] = {}
+        self._hedge_requests = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._hedge_failovers = 0
+        self._chain_id_response:Optional[RPCResponse] = None
+
+    def __str__(self) -> str:
+        return f"RPC pool connection {[endpoint.endpoint_uri for endpoint in self.endpoints]}"
+
+    @property
+    def endpoint_uris(self) -> List[str]:
+        return [endpoint.endpoint_uri for endpoint in self.endpoints]
+
+    def ranked_endpoints(self) -> List[_Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until <= now]
+            cooling = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until > now]
+        # unmeasured endpoints sort first so every endpoint gets a latency sample
+        healthy.sort(key=lambda endpoint: -1 if endpoint.latency is None else endpoint.latency)
+        cooling.sort(key=lambda endpoint: endpoint.cooldown_until)
+        return healthy + cooling
+
+    def record_success(self,endpoint:_Endpoint,latency:float) -> None:
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.latency = latency if endpoint.latency is None else (1-self.alpha)*endpoint.latency + self.alpha*latency
+            endpoint.error_rate = (1-self.alpha)*endpoint.error_rate
+
+    def record_error(self,endpoint:_Endpoint) -> None:
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.errors += 1
+            endpoint.error_rate = (1-self.alpha)*endpoint.error_rate + self.alpha
+            if endpoint.error_rate >= self.max_error_rate:
+                endpoint.cooldown_until = time.monotonic() + self.cooldown
+                endpoint.error_rate = self.max_error_rate/2
+
+    def get_endpoint_stats(self) -> List[EndpointStats]:
+        now = time.monotonic()
+        with self._lock:
+            return [EndpointStats(endpoint.endpoint_uri,
+                                  endpoint.latency,
+                                  endpoint.error_rate,
+                                  endpoint.requests,
+                                  endpoint.errors,
+                                  endpoint.cooldown_until > now) for endpoint in self.endpoints]
+
+    def request_endpoint(self,
+                         endpoint:_Endpoint,
+                         method:RPCEndpoint,
+                         params:Any) -> RPCResponse:
+        start = time.perf_counter()
+        try:
+            response = endpoint.provider.make_request(method,params)
+        except Exception as e:
+            if is_transport_error(e):
+                self.record_error(endpoint)
+            raise
+        if is_endpoint_error(response):
+            self.record_error(endpoint)
+        else:
+            self.record_success(endpoint,time.perf_counter() - start)
+        return response
+
+    @contextmanager
+    def hedging(self) -> Iterator[None]:
+        previous = getattr(self._hedge_local,'enabled',False)
+        self._hedge_local.enabled = True
+        try:
+            yield
+        finally:
+            self._hedge_local.enabled = previous
+
+    @staticmethod
+    def _hedge_key(params:Any) -> str:
+        # latency is tracked per function selector since views differ a lot in cost
+        try:
+            return str(params[0].get('data','') or params[0].get('input',''))[:10]
+        except (AttributeError,IndexError,KeyError,TypeError):
+            return ''
+
+    def hedge_delay(self,key:str='') -> float:
+        with self._lock:
+            latencies = sorted(self._call_latencies.get(key,()))
+        if len(latencies) < 20:
+            return self.hedge_default_delay
+        return max(latencies[min(int(len(latencies)*self.hedge_quantile),len(latencies)-1)],self.hedge_min_delay)
+
+    def _record_call_latency(self,key:str,latency:float) -> None:
+        with self._lock:
+            if key not in self._call_latencies:
+                self._call_latencies[key] = deque(maxlen=self.hedge_window)
+            self._call_latencies[key].append(latency)
+
+    def get_hedge_stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(self._hedge_requests,self._hedged,self._hedge_wins,self._hedge_failovers)
+
+    def _timed_request(self,
+                       endpoint:_Endpoint,
+                       method:RPCEndpoint,
+                       params:Any,
+                       key:str) -> RPCResponse:
+        start = time.perf_counter()
+        response = self.request_endpoint(endpoint,method,params)
+        if not is_endpoint_error(response):
+            self._record_call_latency(key,time.perf_counter() - start)
+        return response
+
+    def make_hedged_request(self,method:RPCEndpoint,params:Any) -> RPCResponse:
+        endpoints = self.ranked_endpoints()
+        # nothing to race against; make_request would route the call straight back here
+        if len(endpoints) < 2:
+            return self.request_endpoint(endpoints[0],method,params)
+        with self._lock:
+            self._hedge_requests += 1
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(thread_name_prefix='fwx-hedge')
+        executor = self._hedge_executor
+        key = self._hedge_key(params)
+        primary = executor.submit(self._timed_request,endpoints[0],method,params,key)
+        done,_ = wait([primary],timeout=self.hedge_delay(key))
+        if done and primary.exception() is None and not is_endpoint_error(primary.result()):
+            return primary.result()
+
+        # the primary is slow or failed: race the same call on the next endpoint, first good answer wins
+        with self._lock:
+            if done:
+                self._hedge_failovers += 1
+            else:
+                self._hedged += 1
+        secondary = executor.submit(self._timed_request,endpoints[1],method,params,key)
+        pending = {primary,secondary} - done
+        last_error:Optional[BaseException] = primary.exception() if done else None
+        response:Optional[RPCResponse] = primary.result() if done and last_error is None else None
+        while pending:
+            finished,pending = wait(pending,return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                response = future.result()
+                if is_endpoint_error(response):
+                    continue
+                if future is secondary:
+                    with self._lock:
+                        self._hedge_wins += 1
+                return response
+        if response is not None:
+            return response
+        raise last_error # type: ignore
+
+    def make_request(self,method:RPCEndpoint,params:Any) -> RPCResponse:
+        # web3 validates the chain id before every call; it cannot change across a pool
+        if method == 'eth_chainId' and self._chain_id_response is not None:
+            return self._chain_id_response
+        if method == 'eth_call' and getattr(self._hedge_local,'enabled',False):
+            return self.make_hedged_request(method,params)
+        endpoints = self.ranked_endpoints()
+        if method in WRITE_METHODS:
+            return self.request_endpoint(endpoints[0],method,params)
+        last_error:Optional[Exception] = None
+        response:Optional[RPCResponse] = None
+        for endpoint in endpoints:
+            try:
+                response = self.request_endpoint(endpoint,method,params)
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                logging.warning(f"RPC {endpoint.endpoint_uri} failed on {method}, failing over: {e}")
+                last_error = e
+                continue
+            if not is_endpoint_error(response):
+                if method == 'eth_chainId' and 'result' in response:
+                    self._chain_id_response = response
+                return response
+            logging.warning(f"RPC {endpoint.endpoint_uri} rejected {method}, failing over: {response['error']}")
+        if response is not None:
+            return response
+        raise last_error # type: ignore
+
+    def make_batch_request(self,
+                           batch_requests:List[Tuple[RPCEndpoint,Any]]) -> Union[List[RPCResponse],RPCResponse]:
+        endpoints = self.ranked_endpoints()
+        if any(method in WRITE_METHODS for method,_ in batch_requests):
+            endpoints = endpoints[:1]
+        last_error:Optional[Exception] = None
+        for endpoint in endpoints:
+            start = time.perf_counter()
+            try:
+                response = endpoint.provider.make_batch_request(batch_requests)
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                self.record_error(endpoint)
+                logging.warning(f"RPC {endpoint.endpoint_uri} failed on batch request, failing over: {e}")
+                last_error = e
+                continue
+            if is_endpoint_error(response):
+                self.record_error(endpoint)
+                continue
+            self.record_success(endpoint,time.perf_counter() - start)
+            return response
+        if last_error is None:
+            raise ValueError("Every RPC endpoint rejected the batch request")
+        raise last_error
+
+    def is_connected(self,show_traceback:bool=False) -> bool:
+        return any(endpoint.provider.is_connected(show_traceback) for endpoint in self.endpoints)
+
+# a second gateway reporting one of these means the transaction already reached the mempool
+ALREADY_KNOWN_MESSAGES = ('already known','known transaction','already imported','already in mempool')
+
+def is_already_known(message:str) -> bool:
+    message = message.lower()
+    return any(m in message for m in ALREADY_KNOWN_MESSAGES)
+
+class TransactionBroadcaster:
+
+    # pushes one signed transaction to every endpoint at once and returns on the first acceptance;
+    # the slower endpoints keep going in the background so their latency still gets logged
+    def __init__(self,
+                 endpoint_uris:Sequence[str],
+                 request_kwargs:Optional[Dict[str,Any]]=None,
+                 timeout:float=10) -> None:
+        if len(endpoint_uris) == 0:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [_Endpoint(endpoint_uri,request_kwargs) for endpoint_uri in endpoint_uris]
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=len(self.endpoints),thread_name_prefix='fwx-broadcast')
+
+    def _send(self,
+              endpoint:_Endpoint,
+              raw_transaction:bytes,
+              start:float) -> Tuple[_Endpoint,RPCResponse,float]:
+        response = endpoint.provider.make_request(RPCEndpoint('eth_sendRawTransaction'),[HexBytes(raw_transaction).to_0x_hex()])
+        return endpoint,response,time.perf_counter() - start
+
+    def _log_result(self,future:'Future[Tuple[_Endpoint,RPCResponse,float]]') -> None:
+        if future.exception() is not None:
+            logging.warning(f"Broadcast failed: {future.exception()}")
+            return
+        endpoint,response,latency = future.result()
+        if 'error' in response and not is_already_known(str(response['error'])):
+            logging.warning(f"Broadcast rejected by {endpoint.endpoint_uri} after {latency*1000:.1f}ms: {response['error']}")
+        else:
+            logging.info(f"Broadcast accepted by {endpoint.endpoint_uri} after {latency*1000:.1f}ms")
+
+    def broadcast(self,raw_transaction:bytes) -> HexBytes:
+        start = time.perf_counter()
+        pending = set()
+        for endpoint in self.endpoints:
+            future = self._executor.submit(self._send,endpoint,raw_transaction,start)
+            future.add_done_callback(self._log_result)
+            pending.add(future)
+
+        errors:List[str] = []
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            done,pending = wait(pending,timeout=max(deadline - time.monotonic(),0),return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(str(future.exception()))
+                    continue
+                endpoint,response,latency = future.result()
+                if 'error' not in response:
+                    return HexBytes(response['result'])
+                error = response['error']
+                message = error.get('message','') if isinstance(error,dict) else str(error)
+                if is_already_known(message):
+                    return HexBytes(keccak(raw_transaction))
+                errors.append(message)
+        if len(errors) == 0:
+            raise TimeoutError(f"No RPC endpoint answered the broadcast within {self.timeout}s")
+        raise ValueError(f"Broadcast rejected by every RPC endpoint: {'; '.join(errors)}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+def get_web3(rpc:Union[str,Sequence[str]],
+             request_kwargs:Optional[Dict[str,Any]]=None) -> Web3:
+    if isinstance(rpc,str):
+        return Web3(Web3.HTTPProvider(rpc,request_kwargs))
+    if len(rpc) == 1:
+        return Web3(Web3.HTTPProvider(rpc[0],request_kwargs))
+    return Web3(RPCPoolProvider(rpc,request_kwargs))
+
+_shared_web3:Dict[Tuple[str,...],Web3] = {}
+_shared_web3_lock = threading.Lock()
+
+def get_shared_web3(rpc:Union[str,Sequence[str]]) -> Web3:
+    # one client per endpoint list, so SDK instances for different wallets share
+    # connections, endpoint statistics and the contract cache
+    key = (rpc,) if isinstance(rpc,str) else tuple(rpc)
+    with _shared_web3_lock:
+        w3 = _shared_web3.get(key)
+        if w3 is None:
+            w3 = get_web3(key[0] if len(key) == 1 else key)
+            _shared_web3[key] = w3
+        return w3
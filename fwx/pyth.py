@@ -0,0 +1,454 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union
+)
+import asyncio
+import json
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+
+from fwx.types import (
+    PythPrice,
+    PythPriceFeed
+)
+from fwx.constant import (
+    PYTH_ID
+)
+from fwx.registry import (
+    normalize_pyth_id
+)
+
+HERMES_URL = 'https://hermes.pyth.network'
+HERMES_FWX_URL = 'https://hermes-pyth.fwx.finance'
+
+class HermesClient:
+
+    def __init__(self,
+                 base_url:str=HERMES_URL,
+                 fwx_url:str=HERMES_FWX_URL,
+                 timeout:Union[float,Tuple[float,float]]=(3.05,5),
+                 retries:int=2,
+                 backoff_factor:float=0.1,
+                 pool_maxsize:int=10,
+                 session:Optional[requests.Session]=None) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.fwx_url = fwx_url.rstrip('/')
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            retry = Retry(total=retries,
+                          backoff_factor=backoff_factor,
+                          status_forcelist=(429,500,502,503,504),
+                          allowed_methods=frozenset(['GET']))
+            adapter = HTTPAdapter(pool_connections=2,
+                                  pool_maxsize=pool_maxsize,
+                                  max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'Accept':'application/json',
+                                    'Connection':'keep-alive'})
+        self.session = session
+
+    def get_json(self,
+                 url:str,
+                 params:Optional[Union[Dict[str,Any],List[Tuple[str,Any]]]]=None) -> Dict[str,Any]:
+        res = self.session.get(url,params=params,timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    def get_raw_pyth_data(self,
+                          list_of_pyth_id:List[str]) -> Dict[str,Any]:
+        params = [('ids[]',pyth_id) for pyth_id in list_of_pyth_id]
+        return self.get_json(f'{self.base_url}/v2/updates/price/latest',params)
+
+    def get_raw_pyth_fwx_data(self) -> Dict[str,Any]:
+        return self.get_json(f'{self.fwx_url}/',{'pyth':'perp','encoding':'hex'})
+    
+    def get_price_snapshot(self,
+                           list_of_pyth_id:Optional[List[str]]=None) -> 'PriceSnapshot':
+        if list_of_pyth_id is None:
+            return PriceSnapshot(self.get_raw_pyth_fwx_data())
+        return PriceSnapshot(self.get_raw_pyth_data(list_of_pyth_id))
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> 'HermesClient':
+        return self
+
+    def __exit__(self,*args:Any) -> None:
+        self.close()
+
+_default_hermes_client:Optional[HermesClient] = None
+
+def get_default_hermes_client() -> HermesClient:
+    global _default_hermes_client
+    if _default_hermes_client is None:
+        _default_hermes_client = HermesClient()
+    return _default_hermes_client
+
+PYTH_SYMBOL:Dict[str,str] = {normalize_pyth_id(pyth_id):symbol for symbol,pyth_id in PYTH_ID.items()}
+
+def _parse_pyth_price(price:Dict[str,Any]) -> PythPrice:
+    return PythPrice(int(price['price']),int(price['conf']),int(price['expo']),int(price['publish_time']))
+
+class PriceSnapshot:
+    
+    __slots__ = ('raw','feeds','by_symbol','pyth_data','update_data')
+    
+    def __init__(self,raw_pyth_data:Dict[str,Any]) -> None:
+        self.raw = raw_pyth_data
+        self.feeds:Dict[str,PythPriceFeed] = {}
+        self.by_symbol:Dict[str,PythPriceFeed] = {}
+        self.pyth_data:List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]] = []
+        for i in raw_pyth_data['parsed']:
+            pyth_id = normalize_pyth_id(i['id'])
+            symbol = PYTH_SYMBOL.get(pyth_id)
+            feed = PythPriceFeed(pyth_id,symbol,_parse_pyth_price(i['price']),_parse_pyth_price(i['ema_price']))
+            self.feeds[pyth_id] = feed
+            if symbol is not None:
+                self.by_symbol[symbol] = feed
+            self.pyth_data.append((bytes.fromhex(pyth_id),tuple(feed.price),tuple(feed.ema_price)))
+        self.update_data:List[bytes] = [bytes.fromhex(data) for data in raw_pyth_data['binary']['data']]
+        
+    # keeps code that indexes the raw Hermes payload working on a snapshot
+    def __getitem__(self,key:str) -> Any:
+        return self.raw[key]
+    
+    @property
+    def update_fee(self) -> int:
+        return len(self.raw['parsed']) + len(self.raw['binary'])
+        
+    def get_feed(self,symbol_or_id:str) -> PythPriceFeed:
+        feed = self.by_symbol.get(symbol_or_id)
+        if feed is None:
+            feed = self.feeds.get(normalize_pyth_id(symbol_or_id))
+        if feed is None:
+            raise ValueError(f"Price for {symbol_or_id} not found in snapshot")
+        return feed
+    
+    def get_price(self,symbol_or_id:str) -> float:
+        price = self.get_feed(symbol_or_id).price
+        return price.price*10**price.expo
+
+RawPythData = Union[Dict[str,Any],PriceSnapshot]
+
+def to_price_snapshot(raw_pyth_data:RawPythData) -> PriceSnapshot:
+    if isinstance(raw_pyth_data,PriceSnapshot):
+        return raw_pyth_data
+    return PriceSnapshot(raw_pyth_data)
+
+def create_pyth_data(raw_pyth_data:RawPythData)->List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
+    
+    return to_price_snapshot(raw_pyth_data).pyth_data
+
+def create_pyth_update_data(raw_pyth_data:RawPythData)->List[bytes]:
+    if isinstance(raw_pyth_data,PriceSnapshot):
+        return raw_pyth_data.update_data
+    return [bytes.fromhex(data) for data in raw_pyth_data['binary']['data']]
+
+class PythPriceCache:
+    
+    # max_age is in seconds; 0 disables reuse and fetches on every call
+    def __init__(self,
+                 hermes_client:Optional[HermesClient]=None,
+                 max_age:float=0.5) -> None:
+        if hermes_client is None:
+            hermes_client = get_default_hermes_client()
+        self.hermes_client = hermes_client
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fetched_at:float = 0
+        self._snapshot:Optional[PriceSnapshot] = None
+        
+    def _is_fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._fetched_at < self.max_age
+    
+    def _refresh(self) -> None:
+        self._snapshot = PriceSnapshot(self.hermes_client.get_raw_pyth_fwx_data())
+        self._fetched_at = time.monotonic()
+        
+    def get_price_snapshot(self) -> PriceSnapshot:
+        # callers arriving while a fetch is in flight wait for it and share its result
+        with self._lock:
+            if not self._is_fresh():
+                self._refresh()
+            return self._snapshot # type: ignore
+    
+    def get_raw_pyth_fwx_data(self) -> Dict[str,Any]:
+        return self.get_price_snapshot().raw
+    
+    def get_pyth_data(self) -> List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
+        return self.get_price_snapshot().pyth_data
+    
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+class HermesPriceStream:
+    
+    def __init__(self,
+                 list_of_pyth_id:List[str],
+                 base_url:str=HERMES_URL,
+                 connect_timeout:float=3.05,
+                 read_timeout:float=30,
+                 reconnect_delay:float=0.5,
+                 max_reconnect_delay:float=10,
+                 session:Optional[requests.Session]=None) -> None:
+        self.pyth_ids = [normalize_pyth_id(pyth_id) for pyth_id in list_of_pyth_id]
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout,read_timeout)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.session = session if session is not None else requests.Session()
+        # pyth id -> (parsed price entry, hex update blob that carried it)
+        self.price_book:Dict[str,Tuple[Dict[str,Any],str]] = {}
+        self.last_update:float = 0
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._response:Optional[requests.Response] = None
+        self._thread:Optional[threading.Thread] = None
+        
+    @property
+    def url(self) -> str:
+        return f'{self.base_url}/v2/updates/price/stream'
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+        
+    def start(self) -> 'HermesPriceStream':
+        if self.is_running:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,name='hermes-price-stream',daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self,timeout:Optional[float]=None) -> None:
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            response.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            
+    def __enter__(self) -> 'HermesPriceStream':
+        return self.start()
+    
+    def __exit__(self,*args:Any) -> None:
+        self.stop()
+    
+    def wait_ready(self,timeout:Optional[float]=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._updated:
+            while not all(pyth_id in self.price_book for pyth_id in self.pyth_ids):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._updated.wait(remaining)
+        return True
+        
+    def _run(self) -> None:
+        delay = self.reconnect_delay
+        params = [('ids[]',pyth_id) for pyth_id in self.pyth_ids]
+        params += [('encoding','hex'),('parsed','true')]
+        while not self._stop.is_set():
+            try:
+                with self.session.get(self.url,
+                                      params=params,
+                                      stream=True,
+                                      timeout=self.timeout,
+                                      headers={'Accept':'text/event-stream'}) as response:
+                    response.raise_for_status()
+                    self._response = response
+                    delay = self.reconnect_delay
+                    self._consume(response)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logging.warning(f"Hermes price stream disconnected: {e}")
+            finally:
+                self._response = None
+            if self._stop.wait(delay):
+                break
+            delay = min(delay*2,self.max_reconnect_delay)
+            
+    def _consume(self,response:requests.Response) -> None:
+        data_lines:List[str] = []
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if not line:
+                if data_lines:
+                    self.on_message('\n'.join(data_lines))
+                    data_lines = []
+                continue
+            if line.startswith(':'):
+                continue
+            if line.startswith('data:'):
+                data_lines.append(line[5:].lstrip())
+                
+    def on_message(self,message:str) -> None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logging.warning("Hermes price stream sent an invalid payload")
+            return
+        self.update(payload)
+        
+    def update(self,raw_pyth_data:Dict[str,Any]) -> None:
+        blobs = raw_pyth_data.get('binary',{}).get('data',[])
+        if not blobs:
+            return
+        # hermes puts every parsed feed of one message into a single update blob
+        blob = blobs[0]
+        with self._updated:
+            for entry in raw_pyth_data.get('parsed',[]):
+                pyth_id = normalize_pyth_id(entry['id'])
+                current = self.price_book.get(pyth_id)
+                if current is not None and current[0]['price']['publish_time'] > entry['price']['publish_time']:
+                    continue
+                self.price_book[pyth_id] = (entry,blob)
+            self.last_update = time.monotonic()
+            self._updated.notify_all()
+            
+    def get_raw_pyth_data(self,list_of_pyth_id:Optional[List[str]]=None) -> Dict[str,Any]:
+        if list_of_pyth_id is None:
+            pyth_ids = self.pyth_ids
+        else:
+            pyth_ids = [normalize_pyth_id(pyth_id) for pyth_id in list_of_pyth_id]
+        parsed:List[Dict[str,Any]] = []
+        blobs:List[str] = []
+        with self._lock:
+            for pyth_id in pyth_ids:
+                try:
+                    entry,blob = self.price_book[pyth_id]
+                except KeyError:
+                    raise ValueError(f"No streamed price for pyth id {pyth_id} yet")
+                parsed.append(entry)
+                if blob not in blobs:
+                    blobs.append(blob)
+        return {'binary':{'encoding':'hex','data':blobs},'parsed':parsed}
+    
+    def get_raw_pyth_fwx_data(self) -> Dict[str,Any]:
+        return self.get_raw_pyth_data()
+    
+    def get_price_snapshot(self,list_of_pyth_id:Optional[List[str]]=None) -> PriceSnapshot:
+        return PriceSnapshot(self.get_raw_pyth_data(list_of_pyth_id))
+    
+    def get_pyth_data(self) -> List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
+        return self.get_price_snapshot().pyth_data
+
+class AsyncHermesClient:
+    
+    def __init__(self,
+                 base_url:str=HERMES_URL,
+                 fwx_url:str=HERMES_FWX_URL,
+                 timeout:float=5,
+                 connect_timeout:float=3.05,
+                 retries:int=2,
+                 backoff_factor:float=0.1,
+                 pool_maxsize:int=100,
+                 session:Optional[aiohttp.ClientSession]=None) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.fwx_url = fwx_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout,connect=connect_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self._session = session
+        
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # created lazily so the client can be built outside a running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize,keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=self.timeout,
+                                                  headers={'Accept':'application/json'})
+        return self._session
+        
+    async def get_json(self,
+                       url:str,
+                       params:Optional[Union[Dict[str,Any],List[Tuple[str,Any]]]]=None) -> Dict[str,Any]:
+        attempt = 0
+        while True:
+            try:
+                async with self.session.get(url,params=params) as res:
+                    if res.status in (429,500,502,503,504) and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(res.request_info,res.history,status=res.status)
+                    res.raise_for_status()
+                    return await res.json()
+            except (aiohttp.ClientConnectionError,aiohttp.ClientResponseError,asyncio.TimeoutError) as e:
+                if attempt >= self.retries or (isinstance(e,aiohttp.ClientResponseError) and e.status not in (429,500,502,503,504)):
+                    raise
+                await asyncio.sleep(self.backoff_factor * 2**attempt)
+                attempt += 1
+                
+    async def get_raw_pyth_data(self,
+                                list_of_pyth_id:List[str]) -> Dict[str,Any]:
+        params = [('ids[]',pyth_id) for pyth_id in list_of_pyth_id]
+        return await self.get_json(f'{self.base_url}/v2/updates/price/latest',params)
+    
+    async def get_raw_pyth_fwx_data(self) -> Dict[str,Any]:
+        return await self.get_json(f'{self.fwx_url}/',{'pyth':'perp','encoding':'hex'})
+    
+    async def get_price_snapshot(self,
+                                 list_of_pyth_id:Optional[List[str]]=None) -> PriceSnapshot:
+        if list_of_pyth_id is None:
+            return PriceSnapshot(await self.get_raw_pyth_fwx_data())
+        return PriceSnapshot(await self.get_raw_pyth_data(list_of_pyth_id))
+    
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            
+    async def __aenter__(self) -> 'AsyncHermesClient':
+        return self
+    
+    async def __aexit__(self,*args:Any) -> None:
+        await self.close()
+        
+class AsyncPythPriceCache:
+    
+    def __init__(self,
+                 hermes_client:AsyncHermesClient,
+                 max_age:float=0.5) -> None:
+        self.hermes_client = hermes_client
+        self.max_age = max_age
+        self._lock:Optional[asyncio.Lock] = None
+        self._fetched_at:float = 0
+        self._snapshot:Optional[PriceSnapshot] = None
+        
+    def _is_fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._fetched_at < self.max_age
+        
+    async def get_price_snapshot(self) -> PriceSnapshot:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._is_fresh():
+                self._snapshot = PriceSnapshot(await self.hermes_client.get_raw_pyth_fwx_data())
+                self._fetched_at = time.monotonic()
+            return self._snapshot # type: ignore
+        
+    async def get_raw_pyth_fwx_data(self) -> Dict[str,Any]:
+        return (await self.get_price_snapshot()).raw
+    
+    async def get_pyth_data(self) -> List[Tuple[bytes,Tuple[int, ...],Tuple[int, ...]]]:
+        return (await self.get_price_snapshot()).pyth_data
+    
+    def invalidate(self) -> None:
+        self._snapshot = None
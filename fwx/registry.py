@@ -0,0 +1,123 @@
+from typing import (
+    Any,
+    Dict,
+    Mapping,
+    Optional,
+    Union
+)
+from functools import lru_cache
+from types import MappingProxyType
+from eth_typing import (
+    ChecksumAddress,
+)
+from eth_utils import (
+    to_checksum_address,
+)
+
+from fwx.types import (
+    TokenDetail,
+    ChainDetail
+)
+from fwx.constant import (
+    CHAIN_DETAILS,
+    PYTH_ID
+)
+
+def normalize_pyth_id(pyth_id:str) -> str:
+    pyth_id = pyth_id.lower()
+    if pyth_id.startswith('0x'):
+        pyth_id = pyth_id[2:]
+    return pyth_id
+
+class ChainRegistry:
+
+    # built once per chain by get_chain_registry; every map is read-only and keyed
+    # so that lookups never need to checksum or scan
+    __slots__ = ('chain_id','chain_detail','by_symbol','by_address','by_lower_address','by_pyth_id')
+
+    def __init__(self,
+                 chain_id:int,
+                 chain_detail:Dict[str,Any]) -> None:
+        by_symbol:Dict[str,TokenDetail] = {}
+        address_map:Dict[ChecksumAddress,str] = {}
+        by_address:Dict[ChecksumAddress,TokenDetail] = {}
+        by_lower_address:Dict[str,TokenDetail] = {}
+        by_pyth_id:Dict[str,TokenDetail] = {}
+        for token_symbol,token_detail in chain_detail['token_details'].items():
+            address = to_checksum_address(token_detail['address'])
+            token = TokenDetail(
+                symbol = token_detail['symbol'],
+                address = address,
+                decimal = token_detail['decimal'],
+                unit_type = token_detail['unit_type'],
+                created_block = token_detail['created_block']
+            )
+            by_symbol[token_symbol] = token
+            address_map[address] = token_detail['symbol']
+            by_address[address] = token
+            by_lower_address[address.lower()] = token
+            if token_symbol in PYTH_ID:
+                by_pyth_id[normalize_pyth_id(PYTH_ID[token_symbol])] = token
+
+        self.chain_id = chain_id
+        self.chain_detail = ChainDetail(
+            native = chain_detail['native'],
+            wrap_native = chain_detail['wrapNative'],
+            wrap_native_address = to_checksum_address(chain_detail['wrapNativeAddress']),
+            token_details = MappingProxyType(by_symbol), # type: ignore
+            address_map = MappingProxyType(address_map) # type: ignore
+        )
+        self.by_symbol:Mapping[str,TokenDetail] = MappingProxyType(by_symbol)
+        self.by_address:Mapping[ChecksumAddress,TokenDetail] = MappingProxyType(by_address)
+        self.by_lower_address:Mapping[str,TokenDetail] = MappingProxyType(by_lower_address)
+        self.by_pyth_id:Mapping[str,TokenDetail] = MappingProxyType(by_pyth_id)
+
+    def __setattr__(self,name:str,value:Any) -> None:
+        if hasattr(self,name):
+            raise AttributeError(f"ChainRegistry is immutable, cannot set {name}")
+        super().__setattr__(name,value)
+
+    def __delattr__(self,name:str) -> None:
+        raise AttributeError(f"ChainRegistry is immutable, cannot delete {name}")
+
+    def find_token(self,key:str) -> Optional[TokenDetail]:
+        # key may be a symbol, an address in any case or a Pyth feed id
+        token = self.by_symbol.get(key)
+        if token is not None:
+            return token
+        token = self.by_address.get(key) # type: ignore
+        if token is not None:
+            return token
+        if len(key) == 42:
+            return self.by_lower_address.get(key.lower())
+        if len(key) in (64,66):
+            return self.by_pyth_id.get(normalize_pyth_id(key))
+        return None
+
+    def get_token(self,key:str) -> TokenDetail:
+        token = self.find_token(key)
+        if token is None:
+            raise ValueError(f"Token {key} not found in chain {self.chain_id} or not supported")
+        return token
+
+    def get_symbol(self,address:str) -> str:
+        token = self.by_address.get(address) # type: ignore
+        if token is None:
+            token = self.by_lower_address.get(address.lower())
+        if token is None:
+            raise ValueError(f"Token {address} not found in chain {self.chain_id} or not supported")
+        return token.symbol
+
+    def __repr__(self) -> str:
+        return f"ChainRegistry({self.chain_id}, {list(self.by_symbol)})"
+
+@lru_cache(maxsize=None)
+def _get_chain_registry(chain_id:str) -> ChainRegistry:
+    try:
+        chain_detail = CHAIN_DETAILS[chain_id]
+    except KeyError:
+        raise ValueError(f"Chain {chain_id} not found or not supported")
+    return ChainRegistry(int(chain_id),chain_detail)
+
+def get_chain_registry(chain_id:Union[int,str]) -> ChainRegistry:
+    return _get_chain_registry(str(chain_id))
@@ -0,0 +1,289 @@
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type
+)
+import json
+import logging
+import sqlite3
+import threading
+from hexbytes import HexBytes
+from web3.exceptions import (
+    BlockNotFound,
+)
+from eth_typing import (
+    ChecksumAddress,
+)
+
+from fwx.types import (
+    BaseEventData,
+)
+from fwx.contract import (
+    FWXPerpCoreContract,
+)
+from fwx.decoder import (
+    CORE_EVENT_NAMES,
+    DECODED_EVENTS,
+    LogDecoder,
+    decode_logs,
+    select_log_decoders,
+)
+
+# event name -> (event data type, args type) for every event the store can hold
+EVENT_TYPES:Dict[str,Tuple[Type[BaseEventData],Type[Any]]] = {
+    event_name:(event_type,args_type) for abi_name,event_name,event_type,args_type in DECODED_EVENTS if event_name in CORE_EVENT_NAMES
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    address TEXT PRIMARY KEY,
+    last_block INTEGER NOT NULL,
+    last_block_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    transaction_index INTEGER NOT NULL,
+    transaction_hash BLOB NOT NULL,
+    block_hash BLOB NOT NULL,
+    address TEXT NOT NULL,
+    event TEXT NOT NULL,
+    owner TEXT,
+    nft_id INTEGER,
+    pos_id INTEGER,
+    pair_byte BLOB,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_position ON events (nft_id, pos_id, block_number);
+CREATE INDEX IF NOT EXISTS events_pair ON events (pair_byte, block_number);
+CREATE INDEX IF NOT EXISTS events_owner ON events (owner, block_number);
+CREATE INDEX IF NOT EXISTS events_event ON events (event, block_number);
+"""
+
+def _encode_arg(value:Any) -> Any:
+    if isinstance(value,bytes):
+        return '0x' + value.hex()
+    return value
+
+class EventStore:
+
+    # SQLite copy of FWX core events; sync() resumes from the last synced block of each contract and
+    # commits every sync_window blocks, so an interrupted backfill loses at most one window. The hash of
+    # the last synced block is stored with it; if the chain no longer has that block when sync resumes,
+    # events from the orphaned blocks are rolled back and fetched again
+    def __init__(self,
+                 path:str=':memory:',
+                 chain_id:Optional[int]=None,
+                 sync_window:int=100_000,
+                 reorg_window:int=128) -> None:
+        self.path = path
+        self.sync_window = sync_window
+        self.reorg_window = reorg_window
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path,check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        # stores created before block hashes were kept
+        if 'last_block_hash' not in [row[1] for row in self._conn.execute('PRAGMA table_info(sync_state)')]:
+            self._conn.execute('ALTER TABLE sync_state ADD COLUMN last_block_hash BLOB')
+        self.chain_id:Optional[int] = None
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'chain_id'").fetchone()
+        if row is not None:
+            self.chain_id = int(row[0])
+        if chain_id is not None:
+            self._check_chain_id(chain_id)
+        # bytes fields of each args type, which are stored as hex in the args json
+        self._bytes_fields = {name:[i for i,t in enumerate(args_type.__annotations__.values()) if t is bytes] for name,(_,args_type) in EVENT_TYPES.items()}
+
+    def _check_chain_id(self,chain_id:int) -> None:
+        if self.chain_id is None:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('chain_id', ?)",(str(chain_id),))
+            self.chain_id = chain_id
+        elif self.chain_id != chain_id:
+            raise ValueError(f"Event store {self.path} holds chain {self.chain_id}, not chain {chain_id}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> 'EventStore':
+        return self
+
+    def __exit__(self,*exc:Any) -> None:
+        self.close()
+
+    def get_last_synced_block(self,address:ChecksumAddress) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute('SELECT last_block FROM sync_state WHERE address = ?',(address,)).fetchone()
+        return None if row is None else row[0]
+
+    def get_last_synced_hash(self,address:ChecksumAddress) -> Optional[HexBytes]:
+        with self._lock:
+            row = self._conn.execute('SELECT last_block_hash FROM sync_state WHERE address = ?',(address,)).fetchone()
+        return None if row is None or row[0] is None else HexBytes(row[0])
+
+    def _to_row(self,event_data:Any) -> Tuple[Any,...]:
+        args = event_data.args
+        return (event_data.block_number,
+                event_data.log_index,
+                event_data.transaction_index,
+                bytes(event_data.transaction_hash),
+                bytes(event_data.block_hash),
+                event_data.address,
+                event_data.event,
+                getattr(args,'owner',None),
+                getattr(args,'nft_id',None),
+                getattr(args,'pos_id',None),
+                getattr(args,'pair_bytes32',None),
+                json.dumps([_encode_arg(v) for v in args]))
+
+    def add_events(self,
+                   events:Sequence[Any],
+                   address:Optional[ChecksumAddress]=None,
+                   last_block:Optional[int]=None,
+                   last_block_hash:Optional[bytes]=None) -> int:
+        # events and the new sync position are written in one transaction
+        with self._lock, self._conn:
+            cursor = self._conn.executemany('INSERT OR IGNORE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?)',[self._to_row(e) for e in events])
+            if address is not None and last_block is not None:
+                self._conn.execute('INSERT OR REPLACE INTO sync_state (address, last_block, last_block_hash) VALUES (?, ?, ?)',
+                                   (address,last_block,None if last_block_hash is None else bytes(last_block_hash)))
+        return cursor.rowcount
+
+    def rollback(self,
+                 from_block:int,
+                 address:Optional[ChecksumAddress]=None) -> int:
+        # drops every event at or above from_block and rewinds the sync position to before it
+        with self._lock, self._conn:
+            if address is None:
+                cursor = self._conn.execute('DELETE FROM events WHERE block_number >= ?',(from_block,))
+                self._conn.execute('UPDATE sync_state SET last_block = ?, last_block_hash = NULL WHERE last_block >= ?',(from_block - 1,from_block))
+            else:
+                cursor = self._conn.execute('DELETE FROM events WHERE block_number >= ? AND address = ?',(from_block,address))
+                self._conn.execute('UPDATE sync_state SET last_block = ?, last_block_hash = NULL WHERE last_block >= ? AND address = ?',(from_block - 1,from_block,address))
+        return cursor.rowcount
+
+    def get_decoders(self) -> Dict[bytes,LogDecoder]:
+        return select_log_decoders(*EVENT_TYPES)
+
+    def _get_block_hash(self,
+                        core:FWXPerpCoreContract,
+                        block_number:int) -> Optional[HexBytes]:
+        try:
+            return HexBytes(core.w3.eth.get_block(block_number)['hash'])
+        except BlockNotFound:
+            return None
+
+    def _find_fork(self,
+                   core:FWXPerpCoreContract,
+                   last_block:int) -> Optional[int]:
+        # first block to sync again, or None while the last synced block is still on the chain. Stored
+        # events carry their block hash, so the newest one still on the chain bounds the fork; blocks
+        # more than reorg_window behind the last synced block are taken as final
+        last_block_hash = self.get_last_synced_hash(core.address)
+        if last_block_hash is None or self._get_block_hash(core,last_block) == last_block_hash:
+            return None
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT block_number, block_hash FROM events WHERE address = ? AND block_number BETWEEN ? AND ? ORDER BY block_number DESC',
+                                      (core.address,last_block - self.reorg_window + 1,last_block)).fetchall()
+        for block_number,block_hash in rows:
+            if self._get_block_hash(core,block_number) == HexBytes(block_hash):
+                return block_number + 1
+        return max(last_block - self.reorg_window + 1,0)
+
+    def sync(self,
+             core:FWXPerpCoreContract,
+             from_block:Optional[int]=None,
+             to_block:Optional[int]=None,
+             confirmations:int=12) -> int:
+        # blocks within `confirmations` of the head are left for a later sync, so a reorg rarely reaches
+        # what is stored; if one does, the next sync rolls it back
+        self._check_chain_id(core.chain_id)
+        last_block = self.get_last_synced_block(core.address)
+        if last_block is not None:
+            fork_block = self._find_fork(core,last_block)
+            if fork_block is not None:
+                removed = self.rollback(fork_block,core.address)
+                logging.warning(f"Block {last_block} of {core.address} was reorged out, rolled back {removed} events from block {fork_block}")
+                last_block = fork_block - 1
+            from_block = last_block + 1
+        elif from_block is None:
+            raise ValueError(f"from_block is required for the first sync of {core.address}")
+        if to_block is None:
+            to_block = core.w3.eth.block_number - confirmations
+
+        decoders = self.get_decoders()
+        filter_params:Any = {'address':core.address,'topics':[['0x' + topic.hex() for topic in decoders]]}
+        added = 0
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.sync_window - 1,to_block)
+            # read before the logs: if the block changes in between, the next sync sees the mismatch
+            end_hash = self._get_block_hash(core,end)
+            events = decode_logs(core.log_backfiller.get_logs(filter_params,start,end),decoders=decoders)
+            added += self.add_events(events,core.address,end,end_hash)
+            logging.info(f"Synced {core.address} blocks {start}-{end}: {len(events)} events")
+            start = end + 1
+        return added
+
+    def _from_row(self,row:Tuple[Any,...]) -> BaseEventData:
+        block_number,log_index,transaction_index,transaction_hash,block_hash,address,event,args = row
+        event_type,args_type = EVENT_TYPES[event]
+        values = json.loads(args)
+        for i in self._bytes_fields[event]:
+            values[i] = bytes.fromhex(values[i][2:])
+        return event_type(address,HexBytes(block_hash),block_number,log_index,HexBytes(transaction_hash),transaction_index,args_type(*values)) # type: ignore
+
+    def get_events(self,
+                   event:Optional[str]=None,
+                   nft_id:Optional[int]=None,
+                   pos_id:Optional[int]=None,
+                   pair_byte:Optional[bytes]=None,
+                   owner:Optional[ChecksumAddress]=None,
+                   from_block:Optional[int]=None,
+                   to_block:Optional[int]=None,
+                   limit:Optional[int]=None) -> List[BaseEventData]:
+        clauses:List[str] = []
+        params:List[Any] = []
+        for column,value in (('event',event),('nft_id',nft_id),('pos_id',pos_id),('pair_byte',pair_byte),('owner',owner)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(bytes(value) if column == 'pair_byte' else value)
+        if from_block is not None:
+            clauses.append('block_number >= ?')
+            params.append(from_block)
+        if to_block is not None:
+            clauses.append('block_number <= ?')
+            params.append(to_block)
+        query = 'SELECT block_number, log_index, transaction_index, transaction_hash, block_hash, address, event, args FROM events'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY block_number, log_index'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query,params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def get_position_history(self,
+                             nft_id:int,
+                             pos_id:int) -> List[BaseEventData]:
+        return self.get_events(nft_id=nft_id,pos_id=pos_id)
+
+    def count_events(self,event:Optional[str]=None) -> int:
+        with self._lock:
+            if event is None:
+                return self._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+            return self._conn.execute('SELECT COUNT(*) FROM events WHERE event = ?',(event,)).fetchone()[0]
@@ -1,10 +1,16 @@
 from typing import (
+    Any,
+    Iterable,
+    List,
+    Mapping,
     NamedTuple, 
     Union,
     Sequence,
     NewType,
     Dict,
-    Optional
+    Optional,
+    Tuple,
+    Type
 )
 from hexbytes import HexBytes
 from eth_typing import (
@@ -37,13 +43,46 @@ class ChainDetail(NamedTuple):
     native:str
     wrap_native:str
     wrap_native_address:ChecksumAddress
-    token_details:Dict[str,TokenDetail]
-    address_map:Dict[ChecksumAddress,str] = {}
+    token_details:Mapping[str,TokenDetail]
+    address_map:Mapping[ChecksumAddress,str] = {}
     
 class RPCDetail(NamedTuple):
     rpc: str
     chain_id: int
     chain_detail: ChainDetail
+    rpcs: Tuple[str, ...] = ()
+    chain_id_verified: bool = True
+    
+class EndpointStats(NamedTuple):
+    endpoint_uri: str
+    latency: Optional[float]
+    error_rate: float
+    requests: int
+    errors: int
+    cooling_down: bool
+
+class HedgeStats(NamedTuple):
+    requests: int
+    hedged: int
+    hedge_wins: int
+    failovers: int
+
+class PythPrice(NamedTuple):
+    price: int
+    conf: int
+    expo: int
+    publish_time: int
+    
+class PythPriceFeed(NamedTuple):
+    id: str
+    symbol: Optional[str]
+    price: PythPrice
+    ema_price: PythPrice
+
+class FeeEstimate(NamedTuple):
+    base_fee: int
+    max_priority_fee: int
+    block_number: int
 
 class TxParamsInput(NamedTuple):
     accessList: Optional[AccessList] = None
@@ -70,17 +109,44 @@ class BaseEventData(NamedTuple):
     transaction_hash: HexBytes
     transaction_index: int
     
+def _restore_event_data(cls:Type['TypedEventData'],values:Tuple[Any,...]) -> 'TypedEventData':
+    return tuple.__new__(cls,values)
+
+class TypedEventData(BaseEventData):
+    # the decoded args ride in the tuple after the base fields, so a record has no instance __dict__;
+    # the namedtuple helpers, which only know the base fields, are widened to carry them along
+    __slots__ = ()
+    
+    @property
+    def args(self) -> Any:
+        return self[7]
+    
+    @classmethod
+    def _make(cls,iterable:Iterable[Any]) -> Any:
+        return tuple.__new__(cls,iterable)
+    
+    def _replace(self,**kwargs:Any) -> Any:
+        return self._make([kwargs.pop(name,value) for name,value in zip(BaseEventData._fields + ('args',),self)])
+    
+    def _asdict(self) -> Dict[str,Any]:
+        return {**super()._asdict(),'args':self.args}
+    
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({', '.join(f'{name}={value!r}' for name,value in self._asdict().items())})"
+    
+    def __reduce__(self) -> Any:
+        return _restore_event_data,(self.__class__,tuple(self))
+    
 class ERC20TransferArgs(NamedTuple):
     from_address: ChecksumAddress
     to_address: ChecksumAddress
     value: int
     
-class ERC20TransferEventData(BaseEventData):
-    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: ERC20TransferArgs) -> 'ERC20TransferEventData':
-        return super().__new__(cls, address, block_hash, block_number, "Transfer", log_index, transaction_hash, transaction_index)
+class ERC20TransferEventData(TypedEventData):
+    __slots__ = ()
     
-    def __init__(self, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args:ERC20TransferArgs) -> None:
-        self.args = args
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: ERC20TransferArgs) -> 'ERC20TransferEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "Transfer", log_index, transaction_hash, transaction_index, args))
         
 class FWXPerpCoreGetPositionRespond(NamedTuple):
     pos_id:int
@@ -92,6 +158,14 @@ class FWXPerpCoreGetPositionRespond(NamedTuple):
     collateral_locked:int
     leverage:int
     
+class FWXPerpCoreTPSLRespond(NamedTuple):
+    tp_price:int
+    sl_price:int
+    
+class MulticallRespond(NamedTuple):
+    block_number:int
+    results:List[Any]
+    
 class FWXPerpCoreOpenPositionArgs(NamedTuple):
     owner:ChecksumAddress
     nft_id:int
@@ -104,12 +178,11 @@ class FWXPerpCoreOpenPositionArgs(NamedTuple):
     collateral_swap_amount_locked:int
     router_address:ChecksumAddress
     
-class FWXPerpCoreOpenPositionEventData(BaseEventData):
-    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreOpenPositionArgs) -> 'FWXPerpCoreOpenPositionEventData':
-        return super().__new__(cls, address, block_hash, block_number, "OpenPosition", log_index, transaction_hash, transaction_index)
+class FWXPerpCoreOpenPositionEventData(TypedEventData):
+    __slots__ = ()
     
-    def __init__(self, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args:FWXPerpCoreOpenPositionArgs) -> None:
-        self.args = args
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreOpenPositionArgs) -> 'FWXPerpCoreOpenPositionEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "OpenPosition", log_index, transaction_hash, transaction_index, args))
     
 class FWXPerpCoreClosePositionArgs(NamedTuple):
     owner:ChecksumAddress
@@ -124,12 +197,163 @@ class FWXPerpCoreClosePositionArgs(NamedTuple):
     collateral_swap_amount_unlocked:int
     router_address:ChecksumAddress
     
-class FWXPerpCoreClosePositionEventData(BaseEventData):
+class FWXPerpCoreClosePositionEventData(TypedEventData):
+    __slots__ = ()
+    
     def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreClosePositionArgs) -> 'FWXPerpCoreClosePositionEventData':
-        return super().__new__(cls, address, block_hash, block_number, "ClosePosition", log_index, transaction_hash, transaction_index)
+        return tuple.__new__(cls, (address, block_hash, block_number, "ClosePosition", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreCollectFeesArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    pos_id:int
+    pair_bytes32:bytes
+    trading_fee:int
+    swap_fee:int
+    interest_paid:int
+    liquidation_fee:int
+    bounty_fee_to_protocol:int
+    bounty_fee_to_liquidator:int
+    
+class FWXPerpCoreCollectFeesEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreCollectFeesArgs) -> 'FWXPerpCoreCollectFeesEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "CollectFees", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreLiquidatePositionArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    pos_id:int
+    is_long:bool
+    liquidator:ChecksumAddress
+    liquidated_size:int
+    swap_price:int
+    pair_bytes32:bytes
+    router_address:ChecksumAddress
+    
+class FWXPerpCoreLiquidatePositionEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreLiquidatePositionArgs) -> 'FWXPerpCoreLiquidatePositionEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "LiquidatePosition", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreTriggerTPSLArgs(NamedTuple):
+    sender:ChecksumAddress
+    nft_id:int
+    pos_id:int
+    trig_price:int
+    close_price:int
+    
+class FWXPerpCoreTriggerTPSLEventData(TypedEventData):
+    __slots__ = ()
     
-    def __init__(self, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args:FWXPerpCoreClosePositionArgs) -> None:
-        self.args = args
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreTriggerTPSLArgs) -> 'FWXPerpCoreTriggerTPSLEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "TriggerTPSL", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreSetTPSLArgs(NamedTuple):
+    sender:ChecksumAddress
+    nft_id:int
+    pos_id:int
+    tp_price:int
+    sl_price:int
+    current_price:int
+    
+class FWXPerpCoreSetTPSLEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreSetTPSLArgs) -> 'FWXPerpCoreSetTPSLEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "SetTPSL", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreDepositArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    deposit_amount:int
+    minted_p:int
+    minted_atp:int
+    minted_itp:int
+    minted_ifp:int
+    
+class FWXPerpCoreDepositEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreDepositArgs) -> 'FWXPerpCoreDepositEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "Deposit", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreWithdrawArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    withdraw_amount:int
+    burned_p:int
+    burned_atp:int
+    burned_loss:int
+    burned_itp:int
+    burned_ifp:int
+    
+class FWXPerpCoreWithdrawEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreWithdrawArgs) -> 'FWXPerpCoreWithdrawEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "Withdraw", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreDepositCollateralArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    collateral_address:ChecksumAddress
+    underlying_address:ChecksumAddress
+    pair_bytes32:bytes
+    amount:int
+    
+class FWXPerpCoreDepositCollateralEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreDepositCollateralArgs) -> 'FWXPerpCoreDepositCollateralEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "DepositCollateral", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreWithdrawCollateralArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    collateral_address:ChecksumAddress
+    underlying_address:ChecksumAddress
+    pair_bytes32:bytes
+    amount:int
+    
+class FWXPerpCoreWithdrawCollateralEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreWithdrawCollateralArgs) -> 'FWXPerpCoreWithdrawCollateralEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "WithdrawCollateral", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreUpdateGlobalStatArgs(NamedTuple):
+    sender:ChecksumAddress
+    underlying_address:ChecksumAddress
+    total_contract_size_long:int
+    total_contract_size_short:int
+    average_price_long:int
+    average_price_short:int
+    realized_long_pnl:int
+    realized_short_pnl:int
+    unsettle_long_pnl:int
+    unsettle_short_pnl:int
+    
+class FWXPerpCoreUpdateGlobalStatEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreUpdateGlobalStatArgs) -> 'FWXPerpCoreUpdateGlobalStatEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "UpdateGlobalStat", log_index, transaction_hash, transaction_index, args))
+        
+class FWXPerpCoreUpdateWalletArgs(NamedTuple):
+    owner:ChecksumAddress
+    nft_id:int
+    pair_bytes32:bytes
+    old_value:int
+    new_value:int
+    
+class FWXPerpCoreUpdateWalletEventData(TypedEventData):
+    __slots__ = ()
+    
+    def __new__(cls, address: ChecksumAddress, block_hash: HexBytes, block_number: int, log_index: int, transaction_hash: HexBytes, transaction_index: int, args: FWXPerpCoreUpdateWalletArgs) -> 'FWXPerpCoreUpdateWalletEventData':
+        return tuple.__new__(cls, (address, block_hash, block_number, "UpdateWallet", log_index, transaction_hash, transaction_index, args))
         
 class FWXPerpHelperGetBalanceRespond(NamedTuple):
     net_balance:int
@@ -150,4 +374,29 @@ class FWXPerpHelperGetAllPositionRespond(NamedTuple):
     margin:int
     leverage:int
     tp_price:int
-    sl_price:int
\ No newline at end of file
+    sl_price:int
+    
+class BookPosition(NamedTuple):
+    nft_id:int
+    pos_id:int
+    is_long:bool
+    underlying_address:Optional[ChecksumAddress]
+    pair_bytes32:Optional[bytes]
+    entry_price:int
+    contract_size:int
+    collateral_swapped_amount:int
+    leverage:int
+    tp_price:int
+    sl_price:int
+    block_number:int
+    
+class PositionMark(NamedTuple):
+    pos_id:int
+    is_long:bool
+    underlying_address:ChecksumAddress
+    entry_price:int
+    mark_price:int
+    contract_size:int
+    pnl:int
+    tp_price:int
+    sl_price:int
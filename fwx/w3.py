@@ -1,11 +1,28 @@
+import threading
+import logging
+import json
+import os
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
 from hexbytes import HexBytes
 from web3 import Web3
 from web3.middleware import ExtraDataToPOAMiddleware
+from web3.middleware.base import (
+    Web3MiddlewareBuilder,
+)
+from eth_utils.toolz import (
+    curry,
+)
 from typing import (
     Any,
+    Callable,
     Optional,  
     List,
+    Sequence,
     Tuple,
+    Union,
     Dict)
 from eth_typing import (
     ChecksumAddress,
@@ -13,7 +30,14 @@ from eth_typing import (
 )
 from web3.contract.contract import (
     Contract,
-    ContractEvent
+    ContractEvent,
+    ContractFunction
+)
+from web3._utils.contracts import (
+    prepare_transaction,
+)
+from eth_utils.abi import (
+    abi_to_signature,
 )
 from web3.types import (
     EventData,
@@ -25,6 +49,16 @@ from web3.types import (
 from web3._utils.events import (
     EventLogErrorFlags,
 )
+from web3.exceptions import (
+    TimeExhausted,
+    TransactionNotFound,
+)
+from web3.datastructures import (
+    AttributeDict,
+)
+from web3._utils.method_formatters import (
+    receipt_formatter,
+)
 from eth_account.datastructures import (
     SignedTransaction,
 )
@@ -37,76 +71,234 @@ from fwx.types import (
     ChainDetail,
     RPCDetail,
     TxParamsInput,
-    BaseEventData
+    BaseEventData,
+    FeeEstimate
 )
-from fwx.constant import (
-    CHAIN_DETAILS
+from fwx.registry import (
+    get_chain_registry
 )
+from fwx.provider import (
+    TransactionBroadcaster,
+    get_shared_web3
+)
+from fwx.events import (
+    LogBackfiller
+)
+
+# contract factories and instances are expensive to build from the large FWX ABIs, so they are
+# shared process-wide, keyed by client, ABI identity and address. web3 binds a contract to its
+# client, so the cache only holds weak references: an entry lives as long as some wrapper uses it,
+# and dropping the last wrapper of a Web3 lets the client and its contracts be collected
+_contract_cache:'weakref.WeakValueDictionary[Tuple[int,int,Optional[ChecksumAddress]],Any]' = weakref.WeakValueDictionary()
+_contract_cache_lock = threading.Lock()
+
+def _get_cached(w3:Web3,
+                abi:List[Dict[str,Any]],
+                address:Optional[ChecksumAddress],
+                build:Callable[[],Any]) -> Any:
+    key = (id(w3),id(abi),address)
+    with _contract_cache_lock:
+        cached = _contract_cache.get(key)
+    # a live entry keeps its client and ABI alive, so a match on both cannot be a recycled id
+    if cached is not None and cached.w3 is w3 and cached.abi is abi:
+        return cached
+    value = build()
+    with _contract_cache_lock:
+        _contract_cache[key] = value
+    return value
+
+def get_contract(w3:Web3,
+                 abi:List[Dict[str,Any]],
+                 address:ChecksumAddress) -> Contract:
+    factory = _get_cached(w3,abi,None,lambda: w3.eth.contract(abi=abi))
+    return _get_cached(w3,abi,address,lambda: factory(address=address))
+
+def clear_contract_cache() -> None:
+    with _contract_cache_lock:
+        _contract_cache.clear()
 
 
 def get_token_detail(token_symbol:str,
                      chain_id:str)->TokenDetail:
-    chain_detail = CHAIN_DETAILS[chain_id]
-    try:
-        token_detail:dict[str,Any] = chain_detail['token_details'][token_symbol]
-    except KeyError:
+    token_detail = get_chain_registry(chain_id).by_symbol.get(token_symbol)
+    if token_detail is None:
         raise ValueError(f"Token {token_symbol} not found in chain {chain_id} or not supported")
     
-    return TokenDetail(
-        symbol = token_detail['symbol'],
-        address = Web3.to_checksum_address(token_detail['address']),
-        decimal = token_detail['decimal'],
-        unit_type = token_detail['unit_type'],
-        created_block = token_detail['created_block']
-    )
+    return token_detail
     
 def get_chain_detail(chain_id:str)->ChainDetail:
     
+    return get_chain_registry(chain_id).chain_detail
+    
+CHAIN_ID_CACHE_PATH = os.environ.get('FWX_CHAIN_ID_CACHE',
+                                     os.path.join(os.path.expanduser('~'),'.cache','fwx','chain_ids.json'))
+_chain_id_cache_lock = threading.Lock()
+
+def load_chain_id_cache() -> Dict[str,int]:
     try:
-        chain_detail:dict[str,Any] = CHAIN_DETAILS[chain_id]
-    except KeyError:
-        raise ValueError(f"Chain {chain_id} not found or not supported")
-    
-    token_details:dict[str,TokenDetail] = {}
-    address_map:dict[ChecksumAddress,str] = {}
-    for token_symbol,token_detail in chain_detail['token_details'].items():
-        token_details[token_symbol] = TokenDetail(
-            symbol = token_detail['symbol'],
-            address = Web3.to_checksum_address(token_detail['address']),
-            decimal = token_detail['decimal'],
-            unit_type = token_detail['unit_type'],
-            created_block = token_detail['created_block']
-        )
-        address_map[Web3.to_checksum_address(Web3.to_checksum_address(token_detail['address']))] = token_detail['symbol']
-    
-    return ChainDetail(
-        native = chain_detail['native'],
-        wrap_native = chain_detail['wrapNative'],
-        wrap_native_address = Web3.to_checksum_address(chain_detail['wrapNativeAddress']),
-        token_details = token_details,
-        address_map = address_map
+        with open(CHAIN_ID_CACHE_PATH) as f:
+            return {str(rpc):int(chain_id) for rpc,chain_id in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError,ValueError,AttributeError) as e:
+        logging.warning(f"Ignoring unreadable chain id cache {CHAIN_ID_CACHE_PATH}: {e}")
+        return {}
+
+def _write_chain_id_cache(cache:Dict[str,int]) -> None:
+    try:
+        os.makedirs(os.path.dirname(CHAIN_ID_CACHE_PATH),exist_ok=True)
+        tmp_path = f"{CHAIN_ID_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path,'w') as f:
+            json.dump(cache,f)
+        os.replace(tmp_path,CHAIN_ID_CACHE_PATH)
+    except OSError as e:
+        logging.warning(f"Could not write chain id cache {CHAIN_ID_CACHE_PATH}: {e}")
+
+def get_cached_chain_id(rpc:Union[str,Sequence[str]]) -> Optional[int]:
+    cache = load_chain_id_cache()
+    for url in ((rpc,) if isinstance(rpc,str) else rpc):
+        if url in cache:
+            return cache[url]
+    return None
+
+def remember_chain_id(rpc:Union[str,Sequence[str]],chain_id:int) -> None:
+    urls = (rpc,) if isinstance(rpc,str) else tuple(rpc)
+    with _chain_id_cache_lock:
+        cache = load_chain_id_cache()
+        if all(cache.get(url) == chain_id for url in urls):
+            return
+        cache.update({url:chain_id for url in urls})
+        _write_chain_id_cache(cache)
+
+def forget_chain_id(rpc:Union[str,Sequence[str]]) -> None:
+    urls = (rpc,) if isinstance(rpc,str) else tuple(rpc)
+    with _chain_id_cache_lock:
+        cache = load_chain_id_cache()
+        if any(url in cache for url in urls):
+            _write_chain_id_cache({url:chain_id for url,chain_id in cache.items() if url not in urls})
+
+class ChainIdCheck:
+    # shared by every middleware instance web3 builds for one client, since it builds a fresh one
+    # for single requests, for batches and whenever the middleware onion changes
+    def __init__(self,
+                 expected_chain_id:int,
+                 rpcs:Tuple[str,...]) -> None:
+        self.expected_chain_id = expected_chain_id
+        self.rpcs = rpcs
+        self.verified = False
+    
+    def check(self,response:Any) -> None:
+        if 'result' not in response:
+            raise ValueError(f"Could not verify chain id of {self.rpcs[0]}: {response.get('error')}")
+        result = response['result']
+        chain_id = int(result,16) if isinstance(result,str) else int(result)
+        if chain_id != self.expected_chain_id:
+            forget_chain_id(self.rpcs)
+            raise ValueError(f"RPC {self.rpcs[0]} serves chain {chain_id}, expected {self.expected_chain_id}")
+        remember_chain_id(self.rpcs,chain_id)
+        self.verified = True
+    
+    def check_batch(self,response:Any) -> None:
+        # a node without batch support answers with one error object; the batch itself will fail
+        # the same way, and the single requests a caller falls back to are checked instead
+        if isinstance(response,list):
+            self.check(response[0])
+
+class ChainIdCheckMiddleware(Web3MiddlewareBuilder):
+    # verifies an offline chain id against the node right before the first real request
+    chain_id_check:ChainIdCheck
+    
+    @staticmethod
+    @curry
+    def build(chain_id_check:ChainIdCheck,
+              w3:Web3) -> 'ChainIdCheckMiddleware':
+        middleware = ChainIdCheckMiddleware(w3)
+        middleware.chain_id_check = chain_id_check
+        return middleware
+    
+    def wrap_make_request(self,make_request:Callable[...,Any]) -> Callable[...,Any]:
+        def middleware(method:Any,params:Any) -> Any:
+            if not self.chain_id_check.verified:
+                self.chain_id_check.check(make_request('eth_chainId',[]))
+            return make_request(method,params)
+        return middleware
+    
+    def wrap_make_batch_request(self,make_batch_request:Callable[...,Any]) -> Callable[...,Any]:
+        def middleware(requests_info:Any) -> Any:
+            if not self.chain_id_check.verified:
+                self.chain_id_check.check_batch(make_batch_request([('eth_chainId',[])]))
+            return make_batch_request(requests_info)
+        return middleware
+    
+    async def async_wrap_make_request(self,make_request:Callable[...,Any]) -> Callable[...,Any]:
+        async def middleware(method:Any,params:Any) -> Any:
+            if not self.chain_id_check.verified:
+                self.chain_id_check.check(await make_request('eth_chainId',[]))
+            return await make_request(method,params)
+        return middleware
+    
+    async def async_wrap_make_batch_request(self,make_batch_request:Callable[...,Any]) -> Callable[...,Any]:
+        async def middleware(requests_info:Any) -> Any:
+            if not self.chain_id_check.verified:
+                self.chain_id_check.check_batch(await make_batch_request([('eth_chainId',[])]))
+            return await make_batch_request(requests_info)
+        return middleware
+
+def get_offline_rpc_detail(rpc:Union[str,Sequence[str]],
+                           chain_id:int)->RPCDetail:
+    rpcs = (rpc,) if isinstance(rpc,str) else tuple(rpc)
+    
+    return RPCDetail(
+        rpc = rpcs[0],
+        chain_id = chain_id,
+        chain_detail = get_chain_detail(str(chain_id)),
+        rpcs = rpcs,
+        chain_id_verified = False
     )
+
+# with a known or cached chain id no request is made here; the id is checked on first use instead
+def get_rpc_detail(rpc:Union[str,Sequence[str]],
+                   chain_id:Optional[int]=None,
+                   use_cache:bool=True)->RPCDetail:
+    if chain_id is None and use_cache:
+        chain_id = get_cached_chain_id(rpc)
+    if chain_id is not None:
+        return get_offline_rpc_detail(rpc,chain_id)
     
-def get_rpc_detail(rpc:str)->RPCDetail:
-    w3 = Web3(Web3.HTTPProvider(rpc))
+    w3 = get_shared_web3(rpc)
     chain_id = w3.eth.chain_id
     chain_detail = get_chain_detail(str(chain_id))
+    rpcs = (rpc,) if isinstance(rpc,str) else tuple(rpc)
+    if use_cache:
+        remember_chain_id(rpcs,chain_id)
     
     return RPCDetail(
-        rpc = rpc,
+        rpc = rpcs[0],
         chain_id = chain_id,
-        chain_detail = chain_detail
+        chain_detail = chain_detail,
+        rpcs = rpcs
     )
     
 class Web3HTTP:
+    # pass w3=None to use the shared client for rpc_detail, pooling every endpoint in rpc_detail.rpcs
     def __init__(self,
-                 w3:Web3,
+                 w3:Optional[Web3],
                  rpc_detail:RPCDetail) -> None:
+        if w3 is None:
+            w3 = get_shared_web3(rpc_detail.rpcs or rpc_detail.rpc)
         self.w3 = w3
-        if rpc_detail.chain_id == 43114:
+        self.bind_chain(rpc_detail)
+        self.log_backfiller = LogBackfiller(self.w3)
+        
+    def bind_chain(self,rpc_detail:RPCDetail) -> None:
+        # client middleware and chain details; none of it makes a request, so it is shared with AsyncWeb3HTTP
+        if rpc_detail.chain_id == 43114 and ExtraDataToPOAMiddleware not in self.w3.middleware_onion:
             self.w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0) # type: ignore
+        if not rpc_detail.chain_id_verified and 'chain_id_check' not in self.w3.middleware_onion:
+            self.w3.middleware_onion.inject(ChainIdCheckMiddleware.build(ChainIdCheck(rpc_detail.chain_id,rpc_detail.rpcs or (rpc_detail.rpc,))),name='chain_id_check',layer=0) # type: ignore
             
         self.chain_id = rpc_detail.chain_id
+        self.registry = get_chain_registry(rpc_detail.chain_id)
         self.native = rpc_detail.chain_detail.native
         self.wrap_native = rpc_detail.chain_detail.wrap_native
         self.wrap_native_address = rpc_detail.chain_detail.wrap_native_address
@@ -116,7 +308,7 @@ class Web3HTTP:
     def load_contract(self,
                       abi:List[Dict[str, Any]],
                       address:ChecksumAddress) -> Contract:
-        return self.w3.eth.contract(abi=abi,address=address)
+        return get_contract(self.w3,abi,address)
     
     def process_receipt(self,
                         receipt:TxReceipt,
@@ -145,10 +337,32 @@ class Web3HTTP:
             to_block=to_block
         )
         
+    def backfill_event_data(self,
+                            event:ContractEvent,
+                            from_block:int,
+                            to_block:Optional[int]=None,
+                            argument_filters:Optional[Dict[str, Any]]=None) -> List[EventData]:
+        # chunked and parallel version of get_event_data_with_block for ranges wider than the provider allows
+        return self.log_backfiller.get_event_logs(event,from_block,to_block,argument_filters)
+        
     def get_base_fee(self,
                      block_identifier:BlockIdentifier='pending') -> Wei:
         block_data = self.w3.eth.get_block(block_identifier)
         return block_data.get('baseFeePerGas', Wei(0))
+    
+    def prepare_function_transaction(self,
+                                     func:ContractFunction,
+                                     txn_params:TxParams) -> TxParams:
+        # unlike ContractFunction.build_transaction this makes no RPC calls;
+        # fees and gas are filled later by checking_txn_params
+        return prepare_transaction(func.address,
+                                   self.w3,
+                                   abi_to_signature(func.abi),
+                                   func.contract_abi,
+                                   func.abi,
+                                   txn_params,
+                                   func.args,
+                                   func.kwargs)
         
     def process_event_data(self, event_data:EventData) -> Tuple[BaseEventData, Dict[str, Any]]:
         address: ChecksumAddress = Web3.to_checksum_address(event_data['address'])
@@ -161,28 +375,400 @@ class Web3HTTP:
         args = event_data['args']
         return BaseEventData(address,blockHash,blockNumber,event_name,logIndex,transactionHash,transactionIndex),args 
     
-class Web3HTTPWallet(Web3HTTP):
+NONCE_ERROR_MESSAGES = ('nonce too low','nonce too high','invalid nonce','nonce has already been used','replacement transaction underpriced')
+
+def is_nonce_error(error:Exception) -> bool:
+    message = str(error).lower()
+    return any(m in message for m in NONCE_ERROR_MESSAGES)
+
+class NonceManager:
+    def __init__(self,
+                 w3:Web3,
+                 address:ChecksumAddress) -> None:
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce:Optional[int] = None
+        
+    def sync(self) -> Nonce:
+        with self._lock:
+            self._next_nonce = self.w3.eth.get_transaction_count(self.address,'pending')
+            return Nonce(self._next_nonce)
+        
+    def next_nonce(self) -> Nonce:
+        with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = self.w3.eth.get_transaction_count(self.address,'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return Nonce(nonce)
+        
+    def release(self,nonce:Nonce) -> None:
+        # hands back a nonce that never reached the node; anything else forces a resync
+        with self._lock:
+            if self._next_nonce is not None and nonce == self._next_nonce - 1:
+                self._next_nonce = nonce
+            else:
+                self._next_nonce = None
+                
+    def reset(self) -> None:
+        with self._lock:
+            self._next_nonce = None
+    
+class FeeOracle:
+    
+    # an estimate belongs to the head block it was read from and is reused until a newer head shows up.
+    # A head fed by on_new_head or the start() thread is trusted as is; otherwise the estimate is reused
+    # for max_age seconds, about one block time by default, after which the head is read again and the
+    # tip is only looked up if it moved
     def __init__(self,
                  w3:Web3,
+                 max_age:float=2,
+                 use_fee_history:bool=False,
+                 reward_percentile:float=50) -> None:
+        self.w3 = w3
+        self.max_age = max_age
+        self.use_fee_history = use_fee_history
+        self.reward_percentile = reward_percentile
+        self._lock = threading.Lock()
+        self._fee_estimate:Optional[FeeEstimate] = None
+        self._fetched_at:float = 0
+        self._subscribed = False
+        self._stop = threading.Event()
+        self._thread:Optional[threading.Thread] = None
+        
+    @property
+    def head_fed(self) -> bool:
+        return self._subscribed or (self._thread is not None and self._thread.is_alive())
+        
+    def _is_fresh(self) -> bool:
+        return self._fee_estimate is not None and (self.head_fed or time.monotonic() - self._fetched_at < self.max_age)
+    
+    def _lookup(self) -> FeeEstimate:
+        if self.use_fee_history:
+            # one call returns the head, the next block's base fee and a tip percentile
+            fee_history = self.w3.eth.fee_history(1,'latest',[self.reward_percentile])
+            return FeeEstimate(int(fee_history['baseFeePerGas'][-1]),int(fee_history['reward'][0][0]),int(fee_history['oldestBlock']))
+        block_data = self.w3.eth.get_block('latest')
+        block_number = int(block_data['number'])
+        if self._fee_estimate is not None and block_number <= self._fee_estimate.block_number:
+            return self._fee_estimate
+        return FeeEstimate(int(block_data.get('baseFeePerGas', 0)),int(self.w3.eth.max_priority_fee),block_number)
+    
+    def refresh(self) -> FeeEstimate:
+        fee_estimate = self._lookup()
+        with self._lock:
+            # on_new_head may have moved past this lookup in the meantime
+            if self._fee_estimate is None or fee_estimate.block_number >= self._fee_estimate.block_number:
+                self._fee_estimate = fee_estimate
+            self._fetched_at = time.monotonic()
+            return self._fee_estimate
+        
+    def get_fee_estimate(self) -> FeeEstimate:
+        # held across the lookup so a burst of senders shares one round trip
+        with self._lock:
+            if not self._is_fresh():
+                self._fee_estimate = self._lookup()
+                self._fetched_at = time.monotonic()
+            return self._fee_estimate # type: ignore
+        
+    def on_new_head(self,block:Dict[str,Any]) -> None:
+        # feed from a newHeads subscription; keeps the last tip and swaps in the new base fee
+        with self._lock:
+            self._subscribed = True
+            block_number = int(block['number'])
+            if self._fee_estimate is not None and block_number <= self._fee_estimate.block_number:
+                return
+            max_priority_fee = self._fee_estimate.max_priority_fee if self._fee_estimate is not None else int(self.w3.eth.max_priority_fee)
+            self._fee_estimate = FeeEstimate(int(block.get('baseFeePerGas',0)),max_priority_fee,block_number)
+            self._fetched_at = time.monotonic()
+    
+    def invalidate(self) -> None:
+        with self._lock:
+            self._fee_estimate = None
+            
+    def start(self,poll_interval:float=1) -> 'FeeOracle':
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,args=(poll_interval,),name='fee-oracle',daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            
+    def _run(self,poll_interval:float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Fee oracle refresh failed: {e}")
+            self._stop.wait(poll_interval)
+
+GAS_ERROR_MESSAGES = ('intrinsic gas too low','out of gas','gas required exceeds')
+
+def is_gas_error(error:Exception) -> bool:
+    message = str(error).lower()
+    return any(m in message for m in GAS_ERROR_MESSAGES)
+
+GasKey = Tuple[Any,...]
+
+# gas keys of sent transactions waiting for their receipt; ones whose receipt never comes are dropped oldest first
+PENDING_GAS_KEYS_LIMIT = 1024
+
+class GasEstimateCache:
+    
+    # an entry is re-estimated after max_age seconds or max_uses hits, whichever comes first
+    def __init__(self,
+                 max_age:float=300,
+                 max_uses:int=100,
+                 out_of_gas_ratio:float=0.98) -> None:
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.out_of_gas_ratio = out_of_gas_ratio
+        self._lock = threading.Lock()
+        self._entries:Dict[GasKey,List[Any]] = {}
+        
+    @staticmethod
+    def make_key(txn_params:TxParams,
+                 gas_key:GasKey) -> GasKey:
+        data = txn_params.get('data',b'')
+        selector = HexBytes(data)[:4].hex()
+        return (txn_params.get('to'),selector) + tuple(gas_key)
+        
+    def get(self,key:GasKey) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            gas,created_at,uses = entry
+            if time.monotonic() - created_at >= self.max_age or uses >= self.max_uses:
+                del self._entries[key]
+                return None
+            entry[2] += 1
+            return gas
+        
+    def put(self,key:GasKey,gas:int) -> None:
+        with self._lock:
+            self._entries[key] = [int(gas),time.monotonic(),0]
+            
+    def invalidate(self,key:Optional[GasKey]=None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key,None)
+                
+    def observe_receipt(self,
+                        key:GasKey,
+                        gas_limit:int,
+                        receipt:TxReceipt) -> None:
+        gas_used = int(receipt['gasUsed'])
+        if receipt['status'] == 0 and gas_used >= gas_limit * self.out_of_gas_ratio:
+            logging.warning(f"Transaction {HexBytes(receipt['transactionHash']).to_0x_hex()} ran out of gas, dropping cached estimate")
+            self.invalidate(key)
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and gas_used > entry[0]:
+                entry[0] = gas_used
+
+# errors meaning the endpoint cannot take a batch at all, as opposed to a timeout or rate limit on this one
+BATCH_UNSUPPORTED_MESSAGES = ('batch','not supported','unsupported','method not found','invalid request')
+
+def is_batch_unsupported(error:Exception) -> bool:
+    message = str(error).lower()
+    return any(m in message for m in BATCH_UNSUPPORTED_MESSAGES)
+
+class TransactionReverted(ValueError):
+    def __init__(self,receipt:TxReceipt) -> None:
+        super().__init__(f"Transaction {HexBytes(receipt['transactionHash']).to_0x_hex()} reverted in block {receipt['blockNumber']}")
+        self.receipt = receipt
+
+class TransactionHandle:
+    def __init__(self,txn_hash:HexBytes) -> None:
+        self.txn_hash = HexBytes(txn_hash)
+        self.future:Future = Future()
+        self.receipt:Optional[TxReceipt] = None
+        self.events:List[Any] = []
+        
+    def done(self) -> bool:
+        return self.future.done()
+    
+    def result(self,timeout:Optional[float]=None) -> TxReceipt:
+        return self.future.result(timeout)
+    
+    def add_done_callback(self,fn:Callable[['TransactionHandle'],None]) -> None:
+        self.future.add_done_callback(lambda _: fn(self))
+        
+    def __repr__(self) -> str:
+        state = 'done' if self.done() else 'pending'
+        return f"TransactionHandle({self.txn_hash.to_0x_hex()}, {state})"
+
+ReceiptDecoder = Callable[[TxReceipt],List[Any]]
+
+class ReceiptTracker:
+    
+    # polls every outstanding hash in one JSON-RPC batch; the interval starts at
+    # min_poll_interval after new work and backs off towards max_poll_interval
+    def __init__(self,
+                 w3:Web3,
+                 min_poll_interval:float=0.1,
+                 max_poll_interval:float=2,
+                 backoff:float=1.5,
+                 timeout:float=120,
+                 on_receipt:Optional[Callable[[TxReceipt],None]]=None,
+                 batch_retry_interval:float=300) -> None:
+        self.w3 = w3
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.on_receipt = on_receipt
+        self.use_batch = True
+        self.batch_retry_interval = batch_retry_interval
+        self._batch_retry_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending:Dict[HexBytes,Tuple[TransactionHandle,Optional[ReceiptDecoder],float]] = {}
+        self._thread:Optional[threading.Thread] = None
+        
+    def track(self,
+              txn_hash:HexBytes,
+              decoder:Optional[ReceiptDecoder]=None) -> TransactionHandle:
+        handle = TransactionHandle(txn_hash)
+        with self._lock:
+            self._pending[handle.txn_hash] = (handle,decoder,time.monotonic() + self.timeout)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,name='receipt-tracker',daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return handle
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+    
+    def fetch_receipts(self,txn_hashes:List[HexBytes]) -> Dict[HexBytes,Optional[TxReceipt]]:
+        if self.use_batch and len(txn_hashes) > 1 and time.monotonic() >= self._batch_retry_at:
+            try:
+                return self._fetch_receipts_batch(txn_hashes)
+            except Exception as e:
+                # a transient failure is left to the poll backoff; a provider without batch support is
+                # polled one request per hash and batching is tried again after batch_retry_interval
+                if not is_batch_unsupported(e):
+                    raise
+                logging.warning(f"Batch receipt request rejected, polling individually for {self.batch_retry_interval}s: {e}")
+                self._batch_retry_at = time.monotonic() + self.batch_retry_interval
+        receipts:Dict[HexBytes,Optional[TxReceipt]] = {}
+        for txn_hash in txn_hashes:
+            try:
+                receipts[txn_hash] = self.w3.eth.get_transaction_receipt(txn_hash)
+            except TransactionNotFound:
+                receipts[txn_hash] = None
+        return receipts
+    
+    def _fetch_receipts_batch(self,txn_hashes:List[HexBytes]) -> Dict[HexBytes,Optional[TxReceipt]]:
+        responses = self.w3.provider.make_batch_request([('eth_getTransactionReceipt',[txn_hash.to_0x_hex()]) for txn_hash in txn_hashes]) # type: ignore
+        if not isinstance(responses,list):
+            raise ValueError(responses.get('error',responses))
+        receipts:Dict[HexBytes,Optional[TxReceipt]] = {}
+        for txn_hash,response in zip(txn_hashes,responses):
+            if 'error' in response:
+                logging.warning(f"Receipt poll for {txn_hash.to_0x_hex()} failed: {response['error']}")
+                continue
+            result = response.get('result')
+            receipts[txn_hash] = None if result is None else AttributeDict.recursive(receipt_formatter(result))
+        return receipts
+    
+    def _run(self) -> None:
+        interval = self.min_poll_interval
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                pending = dict(self._pending)
+            try:
+                receipts = self.fetch_receipts(list(pending))
+            except Exception as e:
+                logging.warning(f"Receipt poll failed: {e}")
+                receipts = {}
+            found = False
+            now = time.monotonic()
+            for txn_hash,(handle,decoder,deadline) in pending.items():
+                receipt = receipts.get(txn_hash)
+                if receipt is None:
+                    if now > deadline:
+                        self._finish(txn_hash)
+                        handle.future.set_exception(TimeExhausted(f"Transaction {txn_hash.to_0x_hex()} is not in the chain after {self.timeout} seconds"))
+                    continue
+                found = True
+                self._finish(txn_hash)
+                self.resolve(handle,receipt,decoder)
+            interval = self.min_poll_interval if found else min(interval*self.backoff,self.max_poll_interval)
+            if self._wakeup.wait(interval):
+                interval = self.min_poll_interval
+            self._wakeup.clear()
+            
+    def _finish(self,txn_hash:HexBytes) -> None:
+        with self._lock:
+            self._pending.pop(txn_hash,None)
+            
+    def resolve(self,
+                handle:TransactionHandle,
+                receipt:TxReceipt,
+                decoder:Optional[ReceiptDecoder]=None) -> None:
+        handle.receipt = receipt
+        if receipt['status'] == 0:
+            handle.future.set_exception(TransactionReverted(receipt))
+        else:
+            if decoder is not None:
+                try:
+                    handle.events = decoder(receipt)
+                except Exception as e:
+                    logging.warning(f"Decoding receipt {handle.txn_hash.to_0x_hex()} failed: {e}")
+            handle.future.set_result(receipt)
+        # the handle is settled first so a failing callback cannot hide a revert
+        if self.on_receipt is not None:
+            try:
+                self.on_receipt(receipt)
+            except Exception as e:
+                logging.warning(f"Receipt callback for {handle.txn_hash.to_0x_hex()} failed: {e}")
+
+class Web3HTTPWallet(Web3HTTP):
+    def __init__(self,
+                 w3:Optional[Web3],
                  rpc_detail:RPCDetail,
-                 private_key:str) -> None:
+                 private_key:str,
+                 fee_oracle:Optional[FeeOracle]=None,
+                 gas_cache:Optional[GasEstimateCache]=None,
+                 broadcaster:Optional[TransactionBroadcaster]=None) -> None:
         super().__init__(w3, rpc_detail)
+        if fee_oracle is None:
+            fee_oracle = FeeOracle(self.w3)
+        self.fee_oracle = fee_oracle
+        self.gas_cache = gas_cache
+        self.broadcaster = broadcaster
+        self._pending_gas_keys:'OrderedDict[HexBytes,Tuple[GasKey,int]]' = OrderedDict()
+        self._gas_keys_lock = threading.Lock()
+        self.receipt_tracker = ReceiptTracker(self.w3,on_receipt=self.observe_receipt)
         self.__private_key = private_key
         account:LocalAccount = self.w3.eth.account.from_key(private_key)
         self.wallet_address:ChecksumAddress = account.address
         self.last_nonce:Optional[Nonce] = None
+        self.nonce_manager = NonceManager(self.w3,self.wallet_address)
         
     def create_txn_params(self,
                           tx_params_input:TxParamsInput)->TxParams:
         
+        # the nonce is assigned by send_transaction so a failed build does not burn one
         txn_params:TxParams = {'from':self.wallet_address,
                                'chainId':self.chain_id}
-        
-        if 'nonce' not in txn_params:
-            if self.last_nonce is None:
-                self.last_nonce = Nonce(0)
-            nonce:Nonce = max(self.last_nonce,self.w3.eth.get_transaction_count(self.wallet_address))
-            txn_params['nonce'] = nonce
             
         for key,value in tx_params_input._asdict().items():
             if value is not None:
@@ -193,38 +779,40 @@ class Web3HTTPWallet(Web3HTTP):
     def checking_txn_params(self,
                                   txn_params:TxParams,
                                   trick:float=1.5,
-                                  priority_multipier:float=1) -> TxParams:
+                                  priority_multipier:float=1,
+                                  gas_key:Optional[GasKey]=None) -> TxParams:
         
         if 'to' not in txn_params:
             raise ValueError("Destination address is required")
         
-        priority = None
+        fee_estimate = None
         max_priority_fee = 0
         if 'maxPriorityFeePerGas' not in txn_params:
-            priority = self.w3.eth.max_priority_fee
-            max_priority_fee = int(priority * priority_multipier)
+            fee_estimate = self.fee_oracle.get_fee_estimate()
+            max_priority_fee = int(fee_estimate.max_priority_fee * priority_multipier)
             txn_params['maxPriorityFeePerGas'] = Wei(max_priority_fee)
         else:
             max_priority_fee = int(txn_params['maxPriorityFeePerGas'])
             
-        base_fee = None
         if 'maxFeePerGas' not in txn_params:
-            base_fee = self.get_base_fee()
+            if fee_estimate is None:
+                fee_estimate = self.fee_oracle.get_fee_estimate()
+            base_fee = fee_estimate.base_fee
             max_fee_per_gas = int(base_fee * 2 + max_priority_fee)
             txn_params['maxFeePerGas'] = Wei(max_fee_per_gas)
             
         gas = None
         if 'gas' not in txn_params:
-            gas = self.w3.eth.estimate_gas(txn_params)
+            cache_key = None
+            if self.gas_cache is not None and gas_key is not None:
+                cache_key = self.gas_cache.make_key(txn_params,gas_key)
+                gas = self.gas_cache.get(cache_key)
+            if gas is None:
+                gas = self.w3.eth.estimate_gas(txn_params)
+                if cache_key is not None:
+                    self.gas_cache.put(cache_key,gas) # type: ignore
             txn_params['gas'] = Wei(int(gas * trick))
             
-        nonce = None
-        if 'nonce' not in txn_params:
-            if self.last_nonce is None:
-                self.last_nonce = Nonce(0)
-            nonce = self.w3.eth.get_transaction_count(self.wallet_address)
-            txn_params['nonce'] = max(self.last_nonce,nonce)
-            
         if 'from' not in txn_params:
             txn_params['from'] = self.wallet_address
             
@@ -239,10 +827,85 @@ class Web3HTTPWallet(Web3HTTP):
     def send_transaction(self,
                          txn_params:TxParams,
                          trick:float=1.5,
-                         priority_multipier:float=1) -> HexBytes:
-        txn_params = self.checking_txn_params(txn_params, trick, priority_multipier)
+                         priority_multipier:float=1,
+                         gas_key:Optional[GasKey]=None) -> HexBytes:
+        has_gas = 'gas' in txn_params
+        unsigned_txn_params = dict(txn_params)
+        txn_params = self.checking_txn_params(txn_params, trick, priority_multipier, gas_key)
+        try:
+            txn_hash = self._send_with_nonce(txn_params)
+        except Exception as e:
+            if has_gas or gas_key is None or self.gas_cache is None or not is_gas_error(e):
+                raise
+            # the cached limit was too tight; fall back to a live estimate
+            logging.warning(f"Cached gas limit rejected, re-estimating: {e}")
+            self.gas_cache.invalidate(self.gas_cache.make_key(txn_params,gas_key))
+            txn_params = self.checking_txn_params(unsigned_txn_params, trick, priority_multipier, gas_key) # type: ignore
+            txn_hash = self._send_with_nonce(txn_params)
+            
+        if gas_key is not None and self.gas_cache is not None and not has_gas:
+            with self._gas_keys_lock:
+                self._pending_gas_keys[HexBytes(txn_hash)] = (self.gas_cache.make_key(txn_params,gas_key),int(txn_params['gas']))
+                while len(self._pending_gas_keys) > PENDING_GAS_KEYS_LIMIT:
+                    self._pending_gas_keys.popitem(last=False)
+        
+        return txn_hash
+    
+    def _send_with_nonce(self,
+                         txn_params:TxParams) -> HexBytes:
+        if 'nonce' in txn_params:
+            return self._sign_and_send(txn_params)
+        
+        txn_params['nonce'] = self.nonce_manager.next_nonce()
+        try:
+            txn_hash = self._sign_and_send(txn_params)
+        except Exception as e:
+            if not is_nonce_error(e):
+                self.nonce_manager.release(txn_params['nonce'])
+                del txn_params['nonce']
+                raise
+            logging.warning(f"Nonce {txn_params['nonce']} rejected, resyncing with chain: {e}")
+            self.nonce_manager.sync()
+            txn_params['nonce'] = self.nonce_manager.next_nonce()
+            try:
+                txn_hash = self._sign_and_send(txn_params)
+            except Exception as retry_error:
+                # hand the nonce back so the next send does not leave a gap behind it
+                if is_nonce_error(retry_error):
+                    self.nonce_manager.reset()
+                else:
+                    self.nonce_manager.release(txn_params['nonce'])
+                del txn_params['nonce']
+                raise
+        self.last_nonce = txn_params['nonce']
+        
+        return txn_hash
+    
+    def wait_for_transaction_receipt(self,
+                                     txn_hash:HexBytes,
+                                     timeout:float=120,
+                                     poll_latency:float=0.1) -> TxReceipt:
+        receipt = self.w3.eth.wait_for_transaction_receipt(txn_hash,timeout,poll_latency)
+        self.observe_receipt(receipt)
+        return receipt
+    
+    def track_transaction(self,
+                          txn_hash:HexBytes,
+                          decoder:Optional[ReceiptDecoder]=None) -> TransactionHandle:
+        return self.receipt_tracker.track(txn_hash,decoder)
+    
+    def observe_receipt(self,receipt:TxReceipt) -> None:
+        with self._gas_keys_lock:
+            pending = self._pending_gas_keys.pop(HexBytes(receipt['transactionHash']),None)
+        if pending is not None and self.gas_cache is not None:
+            self.gas_cache.observe_receipt(pending[0],pending[1],receipt)
+    
+    def _sign_and_send(self,
+                       txn_params:TxParams) -> HexBytes:
         signed_txn:SignedTransaction = self.w3.eth.account.sign_transaction(txn_params,
                                                                             private_key=self.__private_key)
+        if self.broadcaster is not None:
+            return self.broadcaster.broadcast(signed_txn.raw_transaction)
         txn_hash:HexBytes = self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
         
         return txn_hash
\ No newline at end of file
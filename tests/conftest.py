@@ -0,0 +1,43 @@
+from typing import Iterator
+import pathlib
+import pytest
+
+import fwx.w3
+
+from stand_ins import (
+    ChainNode,
+    FakeNode,
+    HermesStreamServer,
+    MulticallNode,
+)
+
+@pytest.fixture(autouse=True)
+def chain_id_cache(tmp_path:pathlib.Path,monkeypatch:pytest.MonkeyPatch) -> str:
+    # offline chain ids are remembered on first use; keep that out of the home directory
+    path = str(tmp_path/'chain_ids.json')
+    monkeypatch.setattr(fwx.w3,'CHAIN_ID_CACHE_PATH',path)
+    return path
+
+@pytest.fixture
+def node() -> Iterator[FakeNode]:
+    node = FakeNode()
+    yield node
+    node.close()
+
+@pytest.fixture
+def chain() -> Iterator[ChainNode]:
+    chain = ChainNode()
+    yield chain
+    chain.close()
+
+@pytest.fixture
+def multicall_node() -> Iterator[MulticallNode]:
+    node = MulticallNode()
+    yield node
+    node.close()
+
+@pytest.fixture
+def hermes() -> Iterator[HermesStreamServer]:
+    hermes = HermesStreamServer()
+    yield hermes
+    hermes.close()
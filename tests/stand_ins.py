@@ -0,0 +1,358 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence
+)
+import collections
+import json
+import threading
+import time
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer
+)
+from urllib.parse import (
+    parse_qsl,
+    urlsplit
+)
+from eth_abi import (
+    decode,
+    encode
+)
+from eth_utils import keccak
+from eth_utils.abi import get_abi_output_types
+from hexbytes import HexBytes
+from web3.contract.contract import ContractFunction
+
+from fwx.constant import (
+    MULTICALL3_ADDRESS,
+    load_abi
+)
+
+# local stand-ins for a JSON-RPC node, so the SDK is exercised over real HTTP without a chain
+
+def ok(req:Dict[str,Any],result:Any) -> Dict[str,Any]:
+    return {'jsonrpc':'2.0','id':req['id'],'result':result}
+
+def error(req:Dict[str,Any],message:str,code:int=-32000) -> Dict[str,Any]:
+    return {'jsonrpc':'2.0','id':req['id'],'error':{'code':code,'message':message}}
+
+def block_hash(number:int,salt:int=0) -> str:
+    return '0x' + keccak(f'{number}-{salt}'.encode()).hex()
+
+class FakeNode:
+
+    # answers the handful of methods the SDK uses; handle() can be wrapped per test, and `script`
+    # maps a method to a list of responses (dicts, or callables taking the request) used up in order
+    def __init__(self,
+                 chain_id:int=8453,
+                 delay:float=0,
+                 batch:bool=True) -> None:
+        self.chain_id = chain_id
+        self.delay = delay
+        self.batch = batch
+        self.calls:collections.Counter = collections.Counter()
+        self.batches = 0
+        self.rate_limited_batches = 0
+        self.block = 100
+        self.nonce = 0
+        self.sent:List[str] = []
+        self.receipts:Dict[str,Dict[str,Any]] = {}
+        self.call_result = '0x' + '00'*32
+        self.script:Dict[str,List[Any]] = {}
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if node.delay:
+                    time.sleep(node.delay)
+                status = 200
+                if isinstance(body,list) and node.rate_limited_batches > 0:
+                    node.rate_limited_batches -= 1
+                    status = 429
+                    out:Any = {'jsonrpc':'2.0','id':None,'error':{'code':-32005,'message':'rate limited'}}
+                elif isinstance(body,list):
+                    node.batches += 1
+                    out = [node.handle(req) for req in body] if node.batch else {'jsonrpc':'2.0','id':None,'error':{'code':-32600,'message':'batch requests are not supported'}}
+                else:
+                    out = node.handle(body)
+                    if out.get('status') is not None:
+                        status = out.pop('status')
+                data = json.dumps(out).encode()
+                self.send_response(status)
+                self.send_header('Content-Type','application/json')
+                self.send_header('Content-Length',str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self,*args:Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1',0),Handler)
+        threading.Thread(target=self.server.serve_forever,daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self,req:Dict[str,Any]) -> Dict[str,Any]:
+        method = req['method']
+        params = req.get('params',[])
+        self.calls[method] += 1
+        scripted = self.script.get(method)
+        if scripted:
+            response = scripted.pop(0)
+            return response(req) if callable(response) else {**response,'id':req['id']}
+        if method == 'eth_chainId':
+            return ok(req,hex(self.chain_id))
+        if method == 'eth_blockNumber':
+            return ok(req,hex(self.block))
+        if method == 'eth_getTransactionCount':
+            return ok(req,hex(self.nonce))
+        if method == 'eth_maxPriorityFeePerGas':
+            return ok(req,hex(10**6))
+        if method == 'eth_gasPrice':
+            return ok(req,hex(10**7))
+        if method == 'eth_getBlockByNumber':
+            return ok(req,self.block_obj(self.block if params[0] in ('latest','pending') else int(params[0],16)))
+        if method == 'eth_estimateGas':
+            return ok(req,hex(100_000))
+        if method == 'eth_call':
+            return ok(req,self.call_result)
+        if method == 'eth_sendRawTransaction':
+            tx_hash = '0x' + keccak(bytes.fromhex(params[0][2:])).hex()
+            self.sent.append(tx_hash)
+            self.nonce += 1
+            return ok(req,tx_hash)
+        if method == 'eth_getTransactionReceipt':
+            return ok(req,self.receipts.get(params[0]))
+        return error(req,f'unsupported method {method}')
+
+    def block_obj(self,
+                  number:int,
+                  hash:Optional[str]=None,
+                  parent_hash:Optional[str]=None) -> Dict[str,Any]:
+        zero32 = '0x' + '00'*32
+        return {'number':hex(number),'hash':hash or block_hash(number),'parentHash':parent_hash or block_hash(number - 1),
+                'baseFeePerGas':hex(10**7),'timestamp':hex(1_700_000_000 + number),'transactions':[],'gasLimit':hex(30_000_000),
+                'gasUsed':'0x0','miner':'0x' + '00'*20,'difficulty':'0x0','extraData':'0x','logsBloom':'0x' + '00'*256,
+                'nonce':'0x' + '00'*8,'receiptsRoot':zero32,'sha3Uncles':zero32,'stateRoot':zero32,'transactionsRoot':zero32,
+                'size':'0x1','totalDifficulty':'0x0','uncles':[],'mixHash':zero32}
+
+    def receipt(self,
+                tx_hash:str,
+                status:int=1,
+                logs:Optional[List[Dict[str,Any]]]=None,
+                gas_used:int=90_000) -> Dict[str,Any]:
+        return {'transactionHash':tx_hash,'transactionIndex':'0x0','blockHash':block_hash(self.block),'blockNumber':hex(self.block),
+                'from':'0x' + '00'*20,'to':'0x' + '00'*20,'cumulativeGasUsed':hex(gas_used),'gasUsed':hex(gas_used),
+                'contractAddress':None,'logs':logs or [],'logsBloom':'0x' + '00'*256,'status':hex(status),
+                'effectiveGasPrice':hex(10**7),'type':'0x2'}
+
+class ChainNode(FakeNode):
+
+    # a toy chain with real block hashes and logs per block; reorg() replaces blocks from a height
+    # and before_logs runs inside eth_getLogs, to move the head between two requests
+    def __init__(self) -> None:
+        super().__init__()
+        self.salt = 0
+        self.hashes:Dict[int,str] = {}
+        self.block_logs:Dict[int,List[Dict[str,Any]]] = {}
+        self.height = -1
+        self.before_logs:Optional[Callable[[],None]] = None
+
+    def mine(self,logs:Sequence[Dict[str,Any]]=()) -> int:
+        number = self.height + 1
+        self.hashes[number] = block_hash(number,self.salt)
+        self.block_logs[number] = list(logs)
+        self.height = number
+        return number
+
+    def reorg(self,
+              from_block:int,
+              new_blocks:Sequence[Sequence[Dict[str,Any]]]) -> None:
+        self.salt += 1
+        for number in [n for n in self.hashes if n >= from_block]:
+            del self.hashes[number]
+            del self.block_logs[number]
+        self.height = from_block - 1
+        for logs in new_blocks:
+            self.mine(logs)
+
+    def handle(self,req:Dict[str,Any]) -> Dict[str,Any]:
+        method = req['method']
+        params = req.get('params',[])
+        if method == 'eth_getBlockByNumber':
+            self.calls[method] += 1
+            number = self.height if params[0] == 'latest' else int(params[0],16)
+            if number not in self.hashes:
+                return ok(req,None)
+            return ok(req,self.block_obj(number,self.hashes[number],self.hashes.get(number - 1,'0x' + '00'*32)))
+        if method == 'eth_blockNumber':
+            self.calls[method] += 1
+            return ok(req,hex(self.height))
+        if method == 'eth_getLogs':
+            self.calls[method] += 1
+            if self.before_logs is not None:
+                before_logs,self.before_logs = self.before_logs,None
+                before_logs()
+            start = int(params[0]['fromBlock'],16)
+            end = int(params[0]['toBlock'],16)
+            logs = []
+            for number in range(start,min(end,self.height) + 1):
+                for index,log in enumerate(self.block_logs[number]):
+                    logs.append({**log,'blockNumber':hex(number),'blockHash':self.hashes[number],'logIndex':hex(index)})
+            return ok(req,logs)
+        return super().handle(req)
+
+AGGREGATE3_SELECTOR = keccak(text='aggregate3((address,bool,bytes)[])')[:4]
+GET_BLOCK_NUMBER_SELECTOR = keccak(text='getBlockNumber()')[:4]
+
+class MulticallNode(FakeNode):
+
+    # runs aggregate3 the way Multicall3 does: `views` maps (target, calldata) to the return data of
+    # a view, None meaning it reverts, and every inner call is answered at the block of the outer one;
+    # a plain eth_call to one of those views is answered from `views` too
+    def __init__(self) -> None:
+        super().__init__()
+        self.views:Dict[Any,Optional[bytes]] = {}
+        self.call_blocks:List[Any] = []
+
+    def handle(self,req:Dict[str,Any]) -> Dict[str,Any]:
+        params = req.get('params',[])
+        if req['method'] != 'eth_call':
+            return super().handle(req)
+        data = bytes.fromhex(params[0].get('data',params[0].get('input'))[2:])
+        if params[0]['to'].lower() != MULTICALL3_ADDRESS.lower():
+            key = (params[0]['to'].lower(),data)
+            if key not in self.views:
+                return super().handle(req)
+            self.calls['eth_call'] += 1
+            self.call_blocks.append(params[1])
+            if self.views[key] is None:
+                return {'jsonrpc':'2.0','id':req['id'],'error':{'code':3,'message':'execution reverted','data':'0x'}}
+            return ok(req,'0x' + self.views[key].hex()) # type: ignore
+        self.calls['eth_call'] += 1
+        self.call_blocks.append(params[1])
+        if data[:4] != AGGREGATE3_SELECTOR:
+            return error(req,'execution reverted',3)
+        block = self.block if params[1] in ('latest','pending') else int(params[1],16)
+        results:List[Any] = []
+        for target,allow_failure,calldata in decode(['(address,bool,bytes)[]'],data[4:])[0]:
+            if target.lower() == MULTICALL3_ADDRESS.lower() and calldata == GET_BLOCK_NUMBER_SELECTOR:
+                results.append((True,encode(['uint256'],[block])))
+                continue
+            return_data = self.views.get((target.lower(),calldata))
+            if return_data is None and not allow_failure:
+                return {'jsonrpc':'2.0','id':req['id'],'error':{'code':3,'message':'execution reverted: Multicall3: call failed','data':'0x'}}
+            results.append((return_data is not None,return_data or b''))
+        return ok(req,'0x' + encode(['(bool,bytes)[]'],[results]).hex())
+
+def answer(node:MulticallNode,
+           func:ContractFunction,
+           *values:Any) -> None:
+    # no values makes the view revert
+    key = (func.address.lower(),bytes(HexBytes(func._encode_transaction_data())))
+    node.views[key] = encode(get_abi_output_types(func.abi),list(values)) if values else None
+
+class HermesStreamServer:
+
+    # a server-sent events stand-in for the Hermes price stream; every connection takes the next list
+    # of messages from `connections`, writes them and hangs up, so the client has to reconnect
+    def __init__(self) -> None:
+        self.connections:List[List[Dict[str,Any]]] = []
+        self.requests:List[Any] = []
+        self.status = 200
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                server.requests.append((url.path,parse_qsl(url.query),self.headers.get('Accept')))
+                if server.status != 200:
+                    self.send_response(server.status)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type','text/event-stream')
+                self.end_headers()
+                self.wfile.write(b': keep-alive\n\n')
+                messages = server.connections.pop(0) if server.connections else []
+                for message in messages:
+                    self.wfile.write(f'data:{json.dumps(message)}\n\n'.encode())
+                    self.wfile.flush()
+
+            def log_message(self,*args:Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1',0),Handler)
+        threading.Thread(target=self.server.serve_forever,daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def price_entry(pyth_id:str,
+                price:int,
+                publish_time:int,
+                expo:int=-8) -> Dict[str,Any]:
+    feed = {'price':str(price),'conf':'1','expo':expo,'publish_time':publish_time}
+    return {'id':pyth_id,'price':feed,'ema_price':feed}
+
+def price_message(blob:str,*entries:Dict[str,Any]) -> Dict[str,Any]:
+    return {'binary':{'encoding':'hex','data':[blob]},'parsed':list(entries)}
+
+CORE_ADDRESS = '0x' + '11'*20
+OWNER = '0x' + 'ab'*20
+ROUTER = '0x' + 'cd'*20
+PAIR = b'\x01'*32
+
+CORE_EVENTS = {e['name']:e for e in load_abi('FWX_PERP_CORE_ABI') if e['type'] == 'event'}
+
+def make_log(name:str,
+             values:Sequence[Any],
+             block:int=0,
+             index:int=0,
+             address:str=CORE_ADDRESS) -> Dict[str,Any]:
+    return encode_log(CORE_EVENTS[name],values,block,index,address)
+
+def encode_log(event_abi:Dict[str,Any],
+               values:Sequence[Any],
+               block:int=0,
+               index:int=0,
+               address:str=CORE_ADDRESS) -> Dict[str,Any]:
+    name = event_abi['name']
+    topics = ['0x' + keccak(text=f"{name}({','.join(i['type'] for i in event_abi['inputs'])})").hex()]
+    types:List[str] = []
+    data:List[Any] = []
+    for arg,value in zip(event_abi['inputs'],values):
+        if arg['indexed']:
+            topics.append('0x' + encode([arg['type']],[value]).hex())
+        else:
+            types.append(arg['type'])
+            data.append(value)
+    return {'address':address,'topics':topics,'data':'0x' + encode(types,data).hex(),'blockNumber':hex(block),'logIndex':hex(index),
+            'transactionIndex':'0x0','transactionHash':'0x' + keccak(block.to_bytes(8,'big') + index.to_bytes(4,'big')).hex(),
+            'blockHash':block_hash(block),'removed':False}
+
+def open_log(nft_id:int,
+             pos_id:int,
+             entry_price:int=65_000*10**18,
+             contract_size:int=10**18,
+             pair:bytes=PAIR) -> Dict[str,Any]:
+    return make_log('OpenPosition',[OWNER,nft_id,pos_id,entry_price,5*10**18,contract_size,True,pair,10**9,ROUTER])
+
+def close_log(nft_id:int,
+              pos_id:int,
+              closing_size:int=10**18,
+              pair:bytes=PAIR) -> Dict[str,Any]:
+    return make_log('ClosePosition',[OWNER,nft_id,pos_id,closing_size,66_000*10**18,-12_345*10**18,True,True,pair,10**9,ROUTER])
@@ -0,0 +1,123 @@
+import asyncio
+from typing import (
+    Any,
+    List
+)
+import pytest
+from eth_abi import encode
+from eth_account.typed_transactions import TypedTransaction
+from hexbytes import HexBytes
+from web3 import (
+    AsyncHTTPProvider,
+    AsyncWeb3
+)
+
+from fwx.async_perp import AsyncFWXPerpSDK
+from fwx.constant import MAX_UINT
+from fwx.registry import get_chain_registry
+from fwx.types import TxParamsInput
+from fwx.w3 import (
+    get_cached_chain_id,
+    get_rpc_detail,
+)
+
+from stand_ins import (
+    CORE_ADDRESS,
+    FakeNode,
+    ok,
+)
+
+PRIVATE_KEY = '0x' + '22'*32
+USDC = get_chain_registry(8453).get_token('USDC')
+
+def make_sdk(url:str) -> AsyncFWXPerpSDK:
+    return AsyncFWXPerpSDK(AsyncWeb3(AsyncHTTPProvider(url)),get_rpc_detail(url,chain_id=8453),PRIVATE_KEY,
+                           '0x' + '33'*20,CORE_ADDRESS,'0x' + '44'*20,USDC.address,nft_id=7)
+
+def sent_transactions(node:FakeNode) -> List[Any]:
+    # decodes every raw transaction the node receives, and gives each a receipt
+    sent:List[Any] = []
+    handle = node.handle
+    def record(req:Any) -> Any:
+        response = handle(req)
+        if req['method'] == 'eth_sendRawTransaction':
+            sent.append(TypedTransaction.from_bytes(HexBytes(req['params'][0])).as_dict())
+            node.receipts[response['result']] = node.receipt(response['result'])
+        return response
+    node.handle = record # type: ignore
+    return sent
+
+def test_wrappers_build_nothing_blocking() -> None:
+    sdk = make_sdk('http://127.0.0.1:9')
+    assert not hasattr(sdk.perp.core,'log_backfiller')
+    with pytest.raises(ValueError):
+        sdk.perp.core.backfill_event_data(sdk.perp.core.eventOpenPosition(),0)
+
+def test_offline_chain_id_is_checked_on_first_use(node:FakeNode) -> None:
+    methods:List[str] = []
+    handle = node.handle
+    def record(req:Any) -> Any:
+        methods.append(req['method'])
+        return handle(req)
+    node.handle = record # type: ignore
+    async def main() -> None:
+        sdk = make_sdk(node.url)
+        try:
+            assert await sdk.perp.core.get_trading_fee_rate(USDC.address) == 0
+        finally:
+            await sdk.w3.provider.disconnect()
+    assert get_cached_chain_id(node.url) is None
+    asyncio.run(main())
+    assert methods[0] == 'eth_chainId'
+    assert get_cached_chain_id(node.url) == 8453
+
+def test_chain_id_mismatch_raises(node:FakeNode) -> None:
+    node.chain_id = 43114
+    async def main() -> None:
+        sdk = make_sdk(node.url)
+        try:
+            with pytest.raises(ValueError,match='serves chain 43114'):
+                await sdk.perp.core.get_trading_fee_rate(USDC.address)
+            assert node.calls['eth_call'] == 0
+        finally:
+            await sdk.w3.provider.disconnect()
+    asyncio.run(main())
+
+def test_view_helpers_are_awaited(node:FakeNode) -> None:
+    node.call_result = '0x' + encode(['uint256','uint256'],[80_000,50_000]).hex()
+    async def main() -> Any:
+        sdk = make_sdk(node.url)
+        try:
+            return await asyncio.gather(sdk.perp.core.get_tpsl(7,1),sdk.perp.core.get_maintenance_margin_ratio(USDC.address))
+        finally:
+            await sdk.w3.provider.disconnect()
+    tpsl,margin_ratio = asyncio.run(main())
+    assert (tpsl.tp_price,tpsl.sl_price,margin_ratio) == (80_000,50_000,80_000)
+
+def test_concurrent_sends_get_distinct_nonces(node:FakeNode) -> None:
+    node.nonce = 3
+    sent = sent_transactions(node)
+    async def main() -> None:
+        sdk = make_sdk(node.url)
+        try:
+            await asyncio.gather(*[sdk.send_transaction({'to':'0x' + '33'*20,'gas':21_000}) for _ in range(5)]) # type: ignore
+        finally:
+            await sdk.w3.provider.disconnect()
+    asyncio.run(main())
+    assert sorted(tx['nonce'] for tx in sent) == [3,4,5,6,7]
+    assert node.calls['eth_getTransactionCount'] == 1
+
+def test_contract_writes_are_built_without_extra_requests(node:FakeNode) -> None:
+    sent = sent_transactions(node)
+    async def main() -> None:
+        sdk = make_sdk(node.url)
+        try:
+            await sdk._send_function(sdk.perp.usdc.approve(CORE_ADDRESS,MAX_UINT),TxParamsInput()) # type: ignore
+        finally:
+            await sdk.w3.provider.disconnect()
+    asyncio.run(main())
+    assert len(sent) == 1
+    assert HexBytes(sent[0]['to']) == HexBytes(USDC.address)
+    assert HexBytes(sent[0]['data'])[:4] == HexBytes('0x095ea7b3')
+    assert sent[0]['gas'] == 150_000
+    assert node.calls['eth_estimateGas'] == 1
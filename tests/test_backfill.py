@@ -0,0 +1,75 @@
+import time
+from typing import (
+    Any,
+    List,
+    Sequence
+)
+import pytest
+from web3 import Web3
+
+from fwx.events import LogBackfiller
+
+from stand_ins import (
+    CORE_ADDRESS,
+    ChainNode,
+    error,
+    open_log,
+)
+
+def dense(start:int,end:int) -> Sequence[Any]:
+    # one log per block
+    return [{'blockNumber':number,'logIndex':0} for number in range(start,end + 1)]
+
+def test_wide_ranges_are_halved(chain:ChainNode) -> None:
+    for number in range(300):
+        chain.mine([open_log(1,number)] if number % 3 == 0 else [])
+    handle = chain.handle
+    def limited(req:Any) -> Any:
+        if req['method'] == 'eth_getLogs':
+            params = req['params'][0]
+            if int(params['toBlock'],16) - int(params['fromBlock'],16) >= 64:
+                chain.calls['too wide'] += 1
+                return error(req,'query returned more than 10000 results')
+        return handle(req)
+    chain.handle = limited # type: ignore
+
+    backfiller = LogBackfiller(Web3(Web3.HTTPProvider(chain.url)),chunk_size=300)
+    logs = backfiller.get_logs({'address':CORE_ADDRESS},0,299) # type: ignore
+    assert [int(log['blockNumber']) for log in logs] == list(range(0,300,3))
+    assert chain.calls['too wide'] > 0
+
+def test_chunk_size_follows_log_density() -> None:
+    backfiller = LogBackfiller(None,max_workers=1,chunk_size=100,target_logs=10,max_chunk_size=1000) # type: ignore
+    logs = backfiller.backfill(dense,0,499)
+    assert len(logs) == 500
+    assert backfiller.chunk_size == 10
+
+    # empty chunks double the size up to max_chunk_size
+    backfiller.backfill(lambda start,end: [],0,9999)
+    assert backfiller.chunk_size == 1000
+
+def test_failures_back_off_then_give_up() -> None:
+    attempts:List[float] = []
+    def throttled(start:int,end:int) -> Sequence[Any]:
+        attempts.append(time.monotonic())
+        raise ValueError("429 Too Many Requests: rate limit exceeded")
+
+    backfiller = LogBackfiller(None,retries=3,backoff_factor=0.02) # type: ignore
+    with pytest.raises(ValueError,match='after 4 attempts'):
+        backfiller.backfill(throttled,0,10)
+    assert len(attempts) == 4
+    # each wait is at least half of backoff_factor*2**attempt
+    gaps = [later - earlier for earlier,later in zip(attempts,attempts[1:])]
+    assert all(gap >= 0.01*2**attempt for attempt,gap in enumerate(gaps))
+
+def test_rate_limited_chunks_recover_after_backoff() -> None:
+    failures = {0:2}
+    def flaky(start:int,end:int) -> Sequence[Any]:
+        if failures.get(start,0) > 0:
+            failures[start] -= 1
+            raise ValueError("rate limit exceeded")
+        return dense(start,end)
+
+    backfiller = LogBackfiller(None,chunk_size=10,backoff_factor=0.01) # type: ignore
+    logs = backfiller.backfill(flaky,0,49)
+    assert [log['blockNumber'] for log in logs] == list(range(50))
@@ -0,0 +1,85 @@
+import pytest
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from fwx.perp import FWXPerpSDK
+from fwx.registry import get_chain_registry
+from fwx.types import (
+    FWXPerpCoreGetPositionRespond,
+    FWXPerpCoreTPSLRespond,
+)
+from fwx.w3 import get_rpc_detail
+
+from stand_ins import (
+    CORE_ADDRESS,
+    MulticallNode,
+    answer,
+)
+
+REGISTRY = get_chain_registry(8453)
+BTC = REGISTRY.get_token('BTC')
+ETH = REGISTRY.get_token('ETH')
+USDC = REGISTRY.get_token('USDC')
+NFT_ID = 7
+POSITION = (3,1_700_000_000,USDC.address,BTC.address,65_000*10**18,10**18,5*10**18,10**19)
+
+@pytest.fixture
+def sdk(multicall_node:MulticallNode) -> FWXPerpSDK:
+    w3 = Web3(Web3.HTTPProvider(multicall_node.url))
+    sdk = FWXPerpSDK(w3,get_rpc_detail(multicall_node.url,chain_id=8453),'0x' + '01'*32,'0x' + '33'*20,CORE_ADDRESS,
+                     '0x' + '44'*20,USDC.address,nft_id=NFT_ID)
+    # settle the first-use chain id check so it does not count as a batch
+    sdk.w3.eth.chain_id
+    return sdk
+
+def test_batch_sends_every_read_in_one_request(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    core = sdk.perp.core
+    answer(multicall_node,core.getPosition(NFT_ID,BTC.address),POSITION)
+    answer(multicall_node,core.getPosition(NFT_ID,ETH.address),(0,0,USDC.address,ETH.address,0,0,0,0))
+    answer(multicall_node,core.tpsls(NFT_ID,3),(80_000*10**18,50_000*10**18))
+    answer(multicall_node,sdk.perp.usdc.balanceOf(sdk.wallet_address),250*10**6)
+    answer(multicall_node,sdk.perp.usdc.allowance(sdk.wallet_address,core.address),2**256 - 1)
+    answer(multicall_node,sdk.perp.membership.getDefaultMembership(sdk.wallet_address),NFT_ID)
+
+    with sdk.batch(block_identifier=250) as b:
+        positions = [b.get_position(BTC.address),b.get_position(ETH.address)]
+        tpsl = b.get_tpsl(3)
+        balance = b.get_usdc_balance()
+        allowance = b.get_allowance()
+        membership = b.get_default_membership()
+
+    assert (multicall_node.batches,multicall_node.calls['eth_call']) == (1,6)
+    assert multicall_node.call_blocks == [hex(250)]*6
+    assert positions[0].result() == FWXPerpCoreGetPositionRespond(*POSITION)
+    assert positions[1].result().pos_id == 0
+    assert tpsl.result() == FWXPerpCoreTPSLRespond(80_000*10**18,50_000*10**18)
+    assert (balance.result(),allowance.result(),membership.result()) == (250*10**6,2**256 - 1,NFT_ID)
+    assert b.results == [call.result() for call in (*positions,tpsl,balance,allowance,membership)]
+
+def test_one_failing_read_keeps_the_other_results(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    core = sdk.perp.core
+    answer(multicall_node,core.tradingFeeRates(BTC.address),5*10**14)
+    answer(multicall_node,core.isLiquidable(NFT_ID,9))
+    answer(multicall_node,core.maintenanceMarginRatio(BTC.address),10**16)
+
+    with pytest.raises(ContractLogicError):
+        with sdk.batch() as b:
+            fee_rate = b.get_trading_fee_rate(BTC.address)
+            liquidable = b.is_liquidable(9)
+            margin_ratio = b.get_maintenance_margin_ratio(BTC.address)
+
+    assert (fee_rate.result(),margin_ratio.result()) == (5*10**14,10**16)
+    with pytest.raises(ContractLogicError):
+        liquidable.result()
+    # the batch reply carried the revert, so the calls were read again one by one
+    assert (multicall_node.batches,multicall_node.calls['eth_call']) == (1,6)
+
+def test_nodes_without_batch_support_are_read_call_by_call(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    multicall_node.batch = False
+    answer(multicall_node,sdk.perp.core.tradingFeeRates(BTC.address),5*10**14)
+    answer(multicall_node,sdk.perp.usdc.balanceOf(sdk.wallet_address),250*10**6)
+    with sdk.batch() as b:
+        fee_rate = b.get_trading_fee_rate(BTC.address)
+        balance = b.get_usdc_balance()
+    assert (fee_rate.result(),balance.result()) == (5*10**14,250*10**6)
+    assert multicall_node.calls['eth_call'] == 2
@@ -0,0 +1,105 @@
+from typing import (
+    Any,
+    List,
+    Tuple
+)
+import pytest
+from eth_abi import encode
+from web3 import Web3
+
+from fwx.book import PositionBook
+from fwx.constant import PYTH_ID
+from fwx.perp import Perp
+from fwx.registry import get_chain_registry
+from fwx.w3 import get_rpc_detail
+
+from stand_ins import (
+    CORE_ADDRESS,
+    ChainNode,
+    close_log,
+    ok,
+    open_log,
+)
+
+REGISTRY = get_chain_registry(8453)
+BTC = REGISTRY.get_token('BTC')
+AVAX = REGISTRY.get_token('AVAX')
+USDC = REGISTRY.get_token('USDC')
+POSITIONS_TYPE = '(uint64,bool,address,address,uint128,uint128,uint128,uint128,uint256,int256,int256,uint256,uint256,uint256,uint256)[]'
+
+def position_row(pos_id:int,
+                 contract_size:int,
+                 entry_price:int,
+                 underlying_address:str=BTC.address) -> Tuple[Any,...]:
+    return (pos_id,True,USDC.address,underlying_address,entry_price,0,contract_size,10**9,0,0,0,0,2*10**18,0,0)
+
+def hermes_payload(*symbols:str,price:int=70_000*10**8) -> Any:
+    feed = {'price':str(price),'conf':'0','expo':-8,'publish_time':0}
+    return {'parsed':[{'id':PYTH_ID[symbol],'price':feed,'ema_price':feed} for symbol in symbols],'binary':{'data':[]}}
+
+class StaticPriceCache:
+
+    def get_pyth_data(self) -> List[Any]:
+        return []
+
+@pytest.fixture
+def helper(chain:ChainNode) -> List[Tuple[Any,...]]:
+    # rows returned by getAllActivePositions, changed in place by the tests
+    rows:List[Tuple[Any,...]] = []
+    handle = chain.handle
+    def handle_call(req:Any) -> Any:
+        if req['method'] == 'eth_call':
+            chain.calls['helper'] += 1
+            return ok(req,'0x' + encode([POSITIONS_TYPE],[rows]).hex())
+        return handle(req)
+    chain.handle = handle_call # type: ignore
+    return rows
+
+@pytest.fixture
+def perp(chain:ChainNode) -> Perp:
+    for _ in range(5):
+        chain.mine()
+    w3 = Web3(Web3.HTTPProvider(chain.url))
+    return Perp(w3,get_rpc_detail(chain.url,chain_id=8453),'0x' + '33'*20,CORE_ADDRESS,'0x' + '44'*20,USDC.address,price_cache=StaticPriceCache()) # type: ignore
+
+def test_events_update_the_book_without_helper_calls(chain:ChainNode,helper:List[Any],perp:Perp) -> None:
+    helper.append(position_row(1,10**8,60_000*10**18))
+    book = PositionBook(perp,nft_ids=[7])
+    follower = book.make_follower(from_block=5,confirmations=0)
+    assert [p.pos_id for p in book.get_positions(7)] == [1]
+    assert chain.calls['helper'] == 1
+
+    # a pair the book has not seen marks the nft dirty, the next read learns its underlying
+    chain.mine([open_log(7,2)])
+    follower.poll()
+    helper.append(position_row(2,10**18,65_000*10**18))
+    book.get_positions(7)
+    assert chain.calls['helper'] == 2
+
+    chain.mine([open_log(7,2)])
+    chain.mine([close_log(7,1)])
+    follower.poll()
+    positions = book.get_positions(7)
+    assert [(p.pos_id,p.contract_size,p.entry_price) for p in positions] == [(2,2*10**18,65_000*10**18)]
+    assert chain.calls['helper'] == 2
+
+def test_untracked_nfts_cost_no_helper_calls(chain:ChainNode,helper:List[Any],perp:Perp) -> None:
+    book = PositionBook(perp)
+    follower = book.make_follower(from_block=5,confirmations=0)
+    chain.mine([open_log(8,1),open_log(9,1)])
+    follower.poll()
+    assert book._due() == []
+    assert chain.calls['helper'] == 0
+
+    book.get_positions(8)
+    chain.mine([open_log(8,2),open_log(9,2)])
+    follower.poll()
+    assert book.is_tracked(8) and not book.is_tracked(9)
+    assert chain.calls['helper'] == 1
+
+def test_marks_skip_underlyings_without_a_feed(chain:ChainNode,helper:List[Any],perp:Perp) -> None:
+    helper.extend([position_row(1,10**18,60_000*10**18),
+                   position_row(2,10**18,30*10**18,AVAX.address)])
+    book = PositionBook(perp,nft_ids=[7])
+    marks = book.get_marks(7,hermes_payload('BTC'))
+    assert [(m.pos_id,m.mark_price,m.pnl) for m in marks] == [(1,70_000*10**18,10_000*10**18)]
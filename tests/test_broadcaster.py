@@ -0,0 +1,57 @@
+from typing import Iterator
+import time
+import pytest
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from fwx.provider import TransactionBroadcaster
+
+from stand_ins import (
+    FakeNode,
+    error,
+)
+
+RAW_TX = bytes.fromhex('02f86c' + 'ab'*40)
+TX_HASH = HexBytes(keccak(RAW_TX))
+
+@pytest.fixture
+def backup() -> Iterator[FakeNode]:
+    node = FakeNode()
+    yield node
+    node.close()
+
+def test_first_acceptance_wins(node:FakeNode,backup:FakeNode) -> None:
+    node.delay = 0.5
+    broadcaster = TransactionBroadcaster([node.url,backup.url])
+    start = time.perf_counter()
+    try:
+        assert broadcaster.broadcast(RAW_TX) == TX_HASH
+        assert time.perf_counter() - start < 0.4
+        assert backup.sent == [TX_HASH.to_0x_hex()]
+        # the slow endpoint still gets the transaction
+        deadline = time.monotonic() + 2
+        while node.sent == [] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert node.sent == [TX_HASH.to_0x_hex()]
+    finally:
+        broadcaster.close()
+
+def test_already_known_counts_as_accepted(node:FakeNode,backup:FakeNode) -> None:
+    node.script['eth_sendRawTransaction'] = [lambda req: error(req,'already known')]
+    backup.script['eth_sendRawTransaction'] = [lambda req: error(req,'nonce too low')]
+    broadcaster = TransactionBroadcaster([node.url,backup.url])
+    try:
+        assert broadcaster.broadcast(RAW_TX) == TX_HASH
+    finally:
+        broadcaster.close()
+
+def test_every_endpoint_rejecting_raises(node:FakeNode,backup:FakeNode) -> None:
+    node.script['eth_sendRawTransaction'] = [lambda req: error(req,'nonce too low')]
+    backup.script['eth_sendRawTransaction'] = [lambda req: error(req,'insufficient funds for gas')]
+    broadcaster = TransactionBroadcaster([node.url,backup.url])
+    try:
+        with pytest.raises(ValueError,match='every RPC endpoint') as e:
+            broadcaster.broadcast(RAW_TX)
+    finally:
+        broadcaster.close()
+    assert 'nonce too low' in str(e.value) and 'insufficient funds for gas' in str(e.value)
@@ -0,0 +1,75 @@
+import json
+import pytest
+from web3 import Web3
+
+from fwx.w3 import (
+    Web3HTTP,
+    forget_chain_id,
+    get_cached_chain_id,
+    get_rpc_detail,
+    load_chain_id_cache,
+    remember_chain_id,
+)
+
+from stand_ins import FakeNode
+
+def test_known_chain_id_makes_no_request(node:FakeNode) -> None:
+    rpc_detail = get_rpc_detail(node.url,chain_id=8453)
+    assert (rpc_detail.chain_id,rpc_detail.chain_id_verified,rpc_detail.rpcs) == (8453,False,(node.url,))
+    assert rpc_detail.chain_detail.native == 'ETH'
+    assert sum(node.calls.values()) == 0
+
+def test_fetched_chain_id_is_cached(node:FakeNode) -> None:
+    rpc_detail = get_rpc_detail(node.url)
+    assert (rpc_detail.chain_id,rpc_detail.chain_id_verified) == (8453,True)
+    assert get_cached_chain_id(node.url) == 8453
+    again = get_rpc_detail(node.url)
+    assert (again.chain_id,again.chain_id_verified) == (8453,False)
+    assert node.calls['eth_chainId'] == 1
+
+def test_cache_file_round_trips(chain_id_cache:str) -> None:
+    assert load_chain_id_cache() == {}
+    remember_chain_id(['http://a','http://b'],8453)
+    remember_chain_id('http://c',43114)
+    with open(chain_id_cache) as f:
+        assert json.load(f) == {'http://a':8453,'http://b':8453,'http://c':43114}
+    assert get_cached_chain_id(['http://x','http://b']) == 8453
+    forget_chain_id(['http://a','http://b'])
+    assert load_chain_id_cache() == {'http://c':43114}
+
+def test_unreadable_cache_is_ignored(chain_id_cache:str) -> None:
+    with open(chain_id_cache,'w') as f:
+        f.write('not json')
+    assert get_cached_chain_id('http://a') is None
+    remember_chain_id('http://a',8453)
+    assert load_chain_id_cache() == {'http://a':8453}
+
+def test_mismatch_raises_on_first_use_and_is_forgotten(node:FakeNode) -> None:
+    remember_chain_id(node.url,43114)
+    client = Web3HTTP(Web3(Web3.HTTPProvider(node.url)),get_rpc_detail(node.url))
+    assert client.chain_id == 43114
+    assert sum(node.calls.values()) == 0
+    with pytest.raises(ValueError,match='serves chain 8453, expected 43114'):
+        client.w3.eth.block_number
+    assert get_cached_chain_id(node.url) is None
+
+def test_chain_id_is_checked_once_per_client(node:FakeNode) -> None:
+    client = Web3HTTP(Web3(Web3.HTTPProvider(node.url)),get_rpc_detail(node.url,chain_id=8453))
+    for _ in range(3):
+        client.w3.eth.block_number
+    for _ in range(2):
+        with client.w3.batch_requests() as batch:
+            batch.add(client.w3.eth.get_block_number())
+            batch.execute()
+    assert node.calls['eth_chainId'] == 1
+    assert get_cached_chain_id(node.url) == 8453
+
+def test_batch_refused_by_the_node_leaves_the_check_to_single_requests(node:FakeNode) -> None:
+    node.batch = False
+    client = Web3HTTP(Web3(Web3.HTTPProvider(node.url)),get_rpc_detail(node.url,chain_id=8453))
+    with pytest.raises(Exception,match='batch requests are not supported'):
+        with client.w3.batch_requests() as batch:
+            batch.add(client.w3.eth.get_block_number())
+            batch.execute()
+    assert client.w3.eth.block_number == 100
+    assert node.calls['eth_chainId'] == 1
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import pytest
+
+import fwx.constant
+from fwx.constant import (
+    ABI_FILES,
+    load_abi,
+)
+
+def test_legacy_abi_names_still_resolve() -> None:
+    from fwx.constant import FWX_PERP_CORE_ABI
+    assert FWX_PERP_CORE_ABI is load_abi('FWX_PERP_CORE_ABI')
+    for name in ABI_FILES:
+        abi = getattr(fwx.constant,name)
+        assert abi is load_abi(name)
+        assert any(entry['type'] == 'function' for entry in abi)
+    assert 'aggregate3' in [entry.get('name') for entry in fwx.constant.MULTICALL3_ABI]
+
+def test_unknown_names_fail() -> None:
+    with pytest.raises(ValueError):
+        load_abi('NOT_AN_ABI')
+    with pytest.raises(AttributeError):
+        fwx.constant.NOT_AN_ABI
+    with pytest.raises(ImportError):
+        from fwx.constant import NOT_AN_ABI # noqa: F401
+
+def test_abis_load_lazily() -> None:
+    # a fresh interpreter, so nothing this test session already parsed counts
+    script = ('import sys\n'
+              'import fwx.constant\n'
+              'assert "web3" not in sys.modules\n'
+              'import fwx.perp\n'
+              'from fwx.constant import load_abi\n'
+              'assert load_abi.cache_info().currsize == 0\n'
+              'fwx.constant.ERC20_ABI\n'
+              'assert load_abi.cache_info().currsize == 1\n')
+    result = subprocess.run([sys.executable,'-c',script],capture_output=True,text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0,result.stderr
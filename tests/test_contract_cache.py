@@ -0,0 +1,41 @@
+import gc
+import weakref
+from web3 import Web3
+
+from fwx.constant import load_abi
+from fwx.contract import FWXPerpCoreContract
+from fwx.w3 import (
+    _contract_cache,
+    get_rpc_detail,
+)
+
+from stand_ins import CORE_ADDRESS
+
+RPC = 'http://127.0.0.1:9'
+
+def make_core(w3:Web3) -> FWXPerpCoreContract:
+    return FWXPerpCoreContract(w3,get_rpc_detail(RPC,chain_id=8453),CORE_ADDRESS) # type: ignore
+
+def test_wrappers_on_one_client_share_contracts() -> None:
+    w3 = Web3(Web3.HTTPProvider(RPC))
+    first = make_core(w3)
+    second = make_core(w3)
+    assert second.contract is first.contract
+    assert type(first.contract).abi is load_abi('FWX_PERP_CORE_ABI')
+    # another client gets its own contract, bound to that client
+    other = make_core(Web3(Web3.HTTPProvider(RPC)))
+    assert other.contract is not first.contract
+    assert other.contract.w3 is other.w3
+
+def test_dropped_clients_are_collected() -> None:
+    refs = []
+    w3_ids = set()
+    for _ in range(5):
+        w3 = Web3(Web3.HTTPProvider(RPC))
+        make_core(w3)
+        refs.append(weakref.ref(w3))
+        w3_ids.add(id(w3))
+    del w3
+    gc.collect()
+    assert [ref() for ref in refs] == [None]*5
+    assert [key for key in _contract_cache.keys() if key[0] in w3_ids] == []
@@ -0,0 +1,98 @@
+import random
+from typing import (
+    Any,
+    Dict,
+    List
+)
+import pytest
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+from web3.logs import DISCARD
+
+from fwx.constant import load_abi
+from fwx.decoder import (
+    DECODED_EVENTS,
+    decode_log,
+    decode_logs,
+    decode_receipt,
+    select_log_decoders,
+)
+from fwx.types import TypedEventData
+
+from stand_ins import (
+    CORE_ADDRESS,
+    encode_log,
+)
+
+OTHER_ADDRESS = Web3.to_checksum_address('0x' + '55'*20)
+
+def random_value(rng:random.Random,abi_type:str) -> Any:
+    if abi_type == 'address':
+        return Web3.to_checksum_address(rng.randbytes(20))
+    if abi_type == 'bool':
+        return rng.random() < 0.5
+    if abi_type == 'bytes32':
+        return rng.randbytes(32)
+    bits = int(abi_type.lstrip('uint') or 256)
+    if abi_type.startswith('uint'):
+        return rng.getrandbits(bits)
+    return rng.getrandbits(bits) - 2**(bits - 1)
+
+def event_abi(abi_name:str,event_name:str) -> Dict[str,Any]:
+    return next(item for item in load_abi(abi_name) if item.get('type') == 'event' and item['name'] == event_name)
+
+@pytest.mark.parametrize('abi_name,event_name,event_type,args_type',DECODED_EVENTS,ids=[e[1] for e in DECODED_EVENTS])
+def test_fast_decoder_matches_web3(abi_name:str,event_name:str,event_type:Any,args_type:Any) -> None:
+    abi = event_abi(abi_name,event_name)
+    web3_event = Web3().eth.contract(abi=[abi]).events[event_name]()
+    rng = random.Random(event_name)
+    for i in range(20):
+        values = [random_value(rng,arg['type']) for arg in abi['inputs']]
+        # the raw JSON log, and the same log as web3 returns it from get_logs
+        raw_log = encode_log(abi,values,block=1000 + i,index=i)
+        log = log_entry_formatter(raw_log)
+        expected = web3_event.process_log(log)
+        event = decode_log(log)
+
+        assert decode_log(raw_log) == event
+        assert type(event) is event_type
+        assert (event.address,event.block_hash,event.block_number,event.event,event.log_index,event.transaction_hash,event.transaction_index) == \
+               (expected['address'],expected['blockHash'],expected['blockNumber'],expected['event'],expected['logIndex'],
+                expected['transactionHash'],expected['transactionIndex'])
+        assert event.args == args_type(*[expected['args'][arg['name']] for arg in abi['inputs']])
+
+def test_records_carry_no_instance_dict() -> None:
+    abi = event_abi('FWX_PERP_CORE_ABI','OpenPosition')
+    rng = random.Random(0)
+    logs:List[Any] = [encode_log(abi,[random_value(rng,arg['type']) for arg in abi['inputs']],index=i) for i in range(3)]
+    events = decode_logs(logs)
+    assert len(events) == 3
+    for event in events:
+        assert isinstance(event,TypedEventData)
+        assert not hasattr(event,'__dict__')
+        assert event._replace(block_number=7) == (*event[:2],7,*event[3:])
+
+def test_receipt_decoding_matches_web3_process_receipt() -> None:
+    rng = random.Random(1)
+    core_events = [event_abi('FWX_PERP_CORE_ABI',name) for name in ('OpenPosition','ClosePosition','CollectFees','LiquidatePosition')]
+    transfer = event_abi('ERC20_ABI','Transfer')
+    nft_transfer = {**transfer,'inputs':[{**arg,'indexed':True} for arg in transfer['inputs']]}
+    raw_logs:List[Any] = []
+    for i in range(24):
+        abi = (core_events + [transfer,nft_transfer])[i % 6]
+        address = (CORE_ADDRESS,OTHER_ADDRESS)[i//6 % 2]
+        raw_logs.append(encode_log(abi,[random_value(rng,arg['type']) for arg in abi['inputs']],block=500,index=i,address=address))
+    raw_logs.append({**raw_logs[0],'topics':[],'logIndex':hex(24)})
+    receipt = {'logs':[log_entry_formatter(log) for log in raw_logs]}
+
+    contract = Web3().eth.contract(abi=core_events + [transfer])
+    for address in (CORE_ADDRESS,OTHER_ADDRESS):
+        expected = sorted((event for e in contract.events for event in e().process_receipt(receipt,errors=DISCARD)
+                           if event['address'] == address),key=lambda event: event['logIndex'])
+        events = decode_receipt(receipt,address.lower())
+        assert [(event.event,event.log_index,tuple(event.args)) for event in events] == \
+               [(event['event'],event['logIndex'],tuple(event['args'].values())) for event in expected]
+    # the ERC721-shaped Transfer logs share topic0 with ERC20 Transfer but are skipped
+    assert len(decode_receipt(receipt)) == 20
+    hot = select_log_decoders('OpenPosition')
+    assert {event.event for event in decode_receipt(receipt,decoders=hot)} == {'OpenPosition'}
@@ -0,0 +1,126 @@
+from typing import (
+    Any,
+    List,
+    Tuple
+)
+import pytest
+from web3 import Web3
+
+from fwx.events import EventFollower
+
+from stand_ins import (
+    CORE_ADDRESS,
+    ChainNode,
+    open_log,
+)
+
+Seen = List[Tuple[int,int]]
+
+def follow(chain:ChainNode,
+           from_block:int,
+           confirmations:int=2,
+           reorg_window:int=64) -> Tuple[EventFollower,Seen,Seen]:
+    delivered:Seen = []
+    retracted:Seen = []
+    follower = EventFollower(Web3(Web3.HTTPProvider(chain.url)),
+                             CORE_ADDRESS,
+                             from_block,
+                             on_event=lambda e: delivered.append((e.block_number,e.args.pos_id)),
+                             on_retract=lambda e: retracted.append((e.block_number,e.args.pos_id)),
+                             confirmations=confirmations,
+                             reorg_window=reorg_window)
+    return follower,delivered,retracted
+
+def mine_empty(chain:ChainNode,count:int) -> None:
+    for _ in range(count):
+        chain.mine()
+
+def test_events_wait_for_confirmations(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,_ = follow(chain,10)
+    chain.mine([open_log(1,1)])
+    chain.mine([open_log(1,2),open_log(1,3)])
+    follower.poll()
+    assert delivered == []
+    mine_empty(chain,2)
+    follower.poll()
+    assert delivered == [(10,1),(11,2),(11,3)]
+
+def test_a_child_of_the_newest_block_costs_two_requests(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,retracted = follow(chain,10,confirmations=0)
+    follower.poll()
+    chain.calls.clear()
+    chain.mine([open_log(1,1)])
+    follower.poll()
+    assert dict(chain.calls) == {'eth_getBlockByNumber':1,'eth_getLogs':1}
+    assert delivered == [(10,1)] and retracted == []
+
+def test_a_replaced_tip_is_fetched_again(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,retracted = follow(chain,10,confirmations=0)
+    chain.mine([open_log(1,1)])
+    follower.poll()
+    # the new head sits one above the newest block seen, but on a different parent
+    chain.reorg(10,[[open_log(1,2)],[]])
+    follower.poll()
+    assert retracted == [(10,1)]
+    assert delivered == [(10,1),(10,2)]
+
+def test_a_fork_inside_the_window_retracts_and_redelivers(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,retracted = follow(chain,10)
+    chain.mine([open_log(1,1)])
+    chain.mine([open_log(1,2),open_log(1,3)])
+    mine_empty(chain,3)
+    follower.poll()
+    assert delivered == [(10,1),(11,2),(11,3)]
+
+    chain.reorg(11,[[open_log(1,4)],[],[],[]])
+    follower.poll()
+    # newest first, so a consumer can undo them in order
+    assert retracted == [(11,3),(11,2)]
+    assert delivered[3:] == [(11,4)]
+
+def test_an_unconfirmed_reorg_is_handled_quietly(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,retracted = follow(chain,10)
+    chain.mine([open_log(1,1)])
+    follower.poll()
+    chain.reorg(10,[[open_log(1,2)]])
+    mine_empty(chain,2)
+    follower.poll()
+    assert retracted == []
+    assert delivered == [(10,2)]
+
+def test_a_reorg_deeper_than_the_window_raises(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,_,_ = follow(chain,5,reorg_window=4)
+    follower.poll()
+    mine_empty(chain,6)
+    follower.poll()
+    chain.reorg(8,[[] for _ in range(10)])
+    with pytest.raises(ValueError,match='deeper than'):
+        follower.poll()
+
+def test_a_head_that_moves_between_requests_is_fetched_again(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,retracted = follow(chain,10,confirmations=0)
+    chain.mine([open_log(1,1)])
+    # the head block is replaced after eth_getBlockByNumber but before eth_getLogs
+    chain.before_logs = lambda: chain.reorg(10,[[open_log(1,2)]])
+    assert follower.poll() == 0
+    assert follower.next_block == 10
+
+    follower.poll()
+    assert delivered == [(10,2)] and retracted == []
+
+def test_the_head_advancing_between_requests_is_picked_up_next_poll(chain:ChainNode) -> None:
+    mine_empty(chain,10)
+    follower,delivered,_ = follow(chain,10,confirmations=0)
+    chain.mine([open_log(1,1)])
+    chain.before_logs = lambda: chain.mine([open_log(1,2)]) and None
+    follower.poll()
+    assert delivered == [(10,1)]
+    follower.poll()
+    assert delivered == [(10,1),(11,2)]
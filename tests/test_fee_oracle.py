@@ -0,0 +1,49 @@
+import time
+from web3 import Web3
+
+from fwx.w3 import FeeOracle
+
+from stand_ins import FakeNode
+
+def test_burst_of_transactions_shares_one_lookup(node:FakeNode) -> None:
+    oracle = FeeOracle(Web3(Web3.HTTPProvider(node.url)))
+    estimates = [oracle.get_fee_estimate() for _ in range(10)]
+    assert all(fee_estimate is estimates[0] for fee_estimate in estimates)
+    assert (node.calls['eth_getBlockByNumber'],node.calls['eth_maxPriorityFeePerGas']) == (1,1)
+
+def test_estimate_is_reused_until_the_head_moves(node:FakeNode) -> None:
+    oracle = FeeOracle(Web3(Web3.HTTPProvider(node.url)),max_age=0)
+    first = oracle.get_fee_estimate()
+    assert first.block_number == 100
+    assert oracle.get_fee_estimate() is first
+    assert node.calls['eth_maxPriorityFeePerGas'] == 1
+
+    node.block = 101
+    assert oracle.get_fee_estimate().block_number == 101
+    assert node.calls['eth_maxPriorityFeePerGas'] == 2
+
+def test_new_heads_update_the_estimate_without_requests(node:FakeNode) -> None:
+    oracle = FeeOracle(Web3(Web3.HTTPProvider(node.url)))
+    oracle.on_new_head({'number':100,'baseFeePerGas':5})
+    node.calls.clear()
+    oracle.on_new_head({'number':101,'baseFeePerGas':7})
+    fee_estimate = oracle.get_fee_estimate()
+    assert (fee_estimate.base_fee,fee_estimate.block_number) == (7,101)
+    # an older head arriving late does not roll the estimate back
+    oracle.on_new_head({'number':100,'baseFeePerGas':5})
+    assert oracle.get_fee_estimate().base_fee == 7
+    assert sum(node.calls.values()) == 0
+
+def test_background_refresh_serves_callers(node:FakeNode) -> None:
+    node.block = 105
+    oracle = FeeOracle(Web3(Web3.HTTPProvider(node.url))).start(poll_interval=10)
+    try:
+        deadline = time.monotonic() + 5
+        while node.calls['eth_maxPriorityFeePerGas'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        calls = sum(node.calls.values())
+        assert oracle.get_fee_estimate().block_number == 105
+        assert sum(node.calls.values()) == calls
+    finally:
+        oracle.stop()
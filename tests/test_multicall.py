@@ -0,0 +1,70 @@
+import pytest
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from fwx.perp import FWXPerpSDK
+from fwx.registry import get_chain_registry
+from fwx.types import (
+    FWXPerpCoreGetPositionRespond,
+    FWXPerpCoreTPSLRespond,
+)
+from fwx.w3 import get_rpc_detail
+
+from stand_ins import (
+    CORE_ADDRESS,
+    MulticallNode,
+    answer,
+)
+
+REGISTRY = get_chain_registry(8453)
+BTC = REGISTRY.get_token('BTC')
+USDC = REGISTRY.get_token('USDC')
+NFT_ID = 7
+
+@pytest.fixture
+def sdk(multicall_node:MulticallNode) -> FWXPerpSDK:
+    w3 = Web3(Web3.HTTPProvider(multicall_node.url))
+    return FWXPerpSDK(w3,get_rpc_detail(multicall_node.url,chain_id=8453),'0x' + '01'*32,'0x' + '33'*20,CORE_ADDRESS,
+                      '0x' + '44'*20,USDC.address,nft_id=NFT_ID)
+
+def test_batch_reads_every_view_in_one_call(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    core = sdk.perp.core
+    position = (3,1_700_000_000,USDC.address,BTC.address,65_000*10**18,10**18,5*10**18,10**19)
+    answer(multicall_node,core.getPosition(NFT_ID,BTC.address),position)
+    answer(multicall_node,core.tpsls(NFT_ID,3),(80_000*10**18,50_000*10**18))
+    answer(multicall_node,core.isLiquidable(NFT_ID,3),False)
+    answer(multicall_node,core.tradingFeeRates(BTC.address),5*10**14)
+    answer(multicall_node,core.maintenanceMarginRatio(BTC.address),10**16)
+    multicall_node.block = 321
+
+    with sdk.batch(multicall=True) as b:
+        get_position = b.get_position(BTC.address)
+        tpsl = b.get_tpsl(3)
+        liquidable = b.is_liquidable(3)
+        fee_rate = b.get_trading_fee_rate(BTC.address)
+        margin_ratio = b.get_maintenance_margin_ratio(BTC.address)
+
+    assert multicall_node.calls['eth_call'] == 1
+    assert b.block_number == 321
+    assert get_position.result() == FWXPerpCoreGetPositionRespond(*position)
+    assert tpsl.result() == FWXPerpCoreTPSLRespond(80_000*10**18,50_000*10**18)
+    assert (liquidable.result(),fee_rate.result(),margin_ratio.result()) == (False,5*10**14,10**16)
+
+def test_batch_reads_at_the_requested_block(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    answer(multicall_node,sdk.perp.core.tradingFeeRates(BTC.address),5*10**14)
+    with sdk.batch(block_identifier=250,multicall=True) as b:
+        fee_rate = b.get_trading_fee_rate(BTC.address)
+    assert multicall_node.call_blocks == [hex(250)]
+    assert (b.block_number,fee_rate.result()) == (250,5*10**14)
+
+def test_allow_failure_turns_reverts_into_none(multicall_node:MulticallNode,sdk:FWXPerpSDK) -> None:
+    core = sdk.perp.core
+    answer(multicall_node,core.tradingFeeRates(BTC.address),5*10**14)
+    answer(multicall_node,core.isLiquidable(NFT_ID,9))
+    funcs = [core.tradingFeeRates(BTC.address),core.isLiquidable(NFT_ID,9)]
+
+    respond = sdk.perp.multicall.aggregate(funcs,allow_failure=True)
+    assert (respond.block_number,respond.results) == (multicall_node.block,[5*10**14,None])
+
+    with pytest.raises(ContractLogicError):
+        sdk.perp.multicall.aggregate(funcs)
@@ -0,0 +1,44 @@
+import pytest
+from web3 import Web3
+
+from fwx.w3 import (
+    Web3HTTPWallet,
+    get_rpc_detail,
+)
+
+from stand_ins import (
+    FakeNode,
+    error,
+)
+
+PRIVATE_KEY = '0x' + '22'*32
+
+@pytest.fixture
+def wallet(node:FakeNode) -> Web3HTTPWallet:
+    node.nonce = 5
+    return Web3HTTPWallet(Web3(Web3.HTTPProvider(node.url)),get_rpc_detail(node.url,chain_id=8453),PRIVATE_KEY)
+
+def transfer() -> dict:
+    return {'to':'0x' + '33'*20,'value':0,'gas':21_000}
+
+def test_nonces_are_handed_out_locally(node:FakeNode,wallet:Web3HTTPWallet) -> None:
+    for nonce in (5,6,7):
+        wallet.send_transaction(transfer()) # type: ignore
+        assert wallet.last_nonce == nonce
+    assert node.calls['eth_getTransactionCount'] == 1
+
+def test_a_failed_send_gives_its_nonce_back(node:FakeNode,wallet:Web3HTTPWallet) -> None:
+    node.script['eth_sendRawTransaction'] = [lambda req: error(req,'insufficient funds for gas * price + value')]
+    with pytest.raises(Exception):
+        wallet.send_transaction(transfer()) # type: ignore
+    wallet.send_transaction(transfer()) # type: ignore
+    assert wallet.last_nonce == 5
+
+def test_a_failed_resend_gives_its_nonce_back(node:FakeNode,wallet:Web3HTTPWallet) -> None:
+    node.script['eth_sendRawTransaction'] = [lambda req: error(req,'nonce too low'),
+                                             lambda req: error(req,'insufficient funds for gas * price + value')]
+    with pytest.raises(Exception):
+        wallet.send_transaction(transfer()) # type: ignore
+    wallet.send_transaction(transfer()) # type: ignore
+    assert wallet.last_nonce == 5
+    assert node.calls['eth_getTransactionCount'] == 2
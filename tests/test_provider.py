@@ -0,0 +1,97 @@
+from typing import Iterator
+import pytest
+import requests
+from web3 import Web3
+
+from fwx.provider import RPCPoolProvider
+
+from stand_ins import (
+    FakeNode,
+    error,
+)
+
+DEAD_URL = 'http://127.0.0.1:9'
+SIGNED_TX = '0x02f86c'
+
+@pytest.fixture
+def backup() -> Iterator[FakeNode]:
+    node = FakeNode()
+    yield node
+    node.close()
+
+def test_requests_go_to_the_fastest_endpoint(node:FakeNode,backup:FakeNode) -> None:
+    node.delay = 0.05
+    provider = RPCPoolProvider([node.url,backup.url])
+    w3 = Web3(provider)
+    for _ in range(6):
+        w3.eth.block_number
+    assert provider.ranked_endpoints()[0].endpoint_uri == backup.url
+    assert backup.calls['eth_blockNumber'] > node.calls['eth_blockNumber']
+
+def test_transport_errors_fail_over(node:FakeNode) -> None:
+    provider = RPCPoolProvider([DEAD_URL,node.url])
+    assert Web3(provider).eth.block_number == 100
+    assert provider.get_endpoint_stats()[0].errors == 1
+
+@pytest.mark.parametrize('response',[{'status':429,'jsonrpc':'2.0','error':{'code':429,'message':'Too Many Requests'}},
+                                     {'jsonrpc':'2.0','error':{'code':-32005,'message':'limit exceeded'}}])
+def test_rate_limits_fail_over(node:FakeNode,backup:FakeNode,response:dict) -> None:
+    node.script['eth_blockNumber'] = [response]
+    provider = RPCPoolProvider([node.url,backup.url])
+    assert Web3(provider).eth.block_number == 100
+    assert backup.calls['eth_blockNumber'] == 1
+
+def test_reverts_do_not_fail_over(node:FakeNode,backup:FakeNode) -> None:
+    node.script['eth_call'] = [lambda req: error(req,'execution reverted',-32603)]
+    provider = RPCPoolProvider([node.url,backup.url])
+    response = provider.make_request('eth_call',[{'to':'0x' + '11'*20,'data':'0x'},'latest']) # type: ignore
+    assert response['error']['code'] == -32603
+    assert backup.calls['eth_call'] == 0
+    assert provider.get_endpoint_stats()[0].errors == 0
+
+def test_writes_are_not_repeated_on_another_endpoint(node:FakeNode) -> None:
+    provider = RPCPoolProvider([DEAD_URL,node.url])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        provider.make_request('eth_sendRawTransaction',[SIGNED_TX]) # type: ignore
+    assert node.calls['eth_sendRawTransaction'] == 0
+
+CALL = [{'to':'0x' + '11'*20,'data':'0xaabbccdd'},'latest']
+
+def test_hedging_a_single_endpoint_pool(node:FakeNode) -> None:
+    provider = RPCPoolProvider([node.url])
+    with provider.hedging():
+        response = provider.make_request('eth_call',CALL) # type: ignore
+    assert response['result'] == node.call_result
+    assert node.calls['eth_call'] == 1
+
+def test_hedge_delay_is_the_latency_quantile_per_selector() -> None:
+    provider = RPCPoolProvider([DEAD_URL],hedge_default_delay=0.25,hedge_min_delay=0.02)
+    for i in range(100):
+        provider._record_call_latency('0xaabbccdd',(i + 1)/1000)
+    for _ in range(19):
+        provider._record_call_latency('0x11223344',0.001)
+    assert provider.hedge_delay('0xaabbccdd') == pytest.approx(0.096)
+    # too few samples for a quantile
+    assert provider.hedge_delay('0x11223344') == 0.25
+    provider._record_call_latency('0x11223344',0.001)
+    assert provider.hedge_delay('0x11223344') == 0.02
+
+def test_slow_primary_is_hedged_on_the_next_endpoint(node:FakeNode,backup:FakeNode) -> None:
+    node.delay = 0.5
+    provider = RPCPoolProvider([node.url,backup.url],hedge_default_delay=0.02)
+    with provider.hedging():
+        response = provider.make_request('eth_call',CALL) # type: ignore
+    assert response['result'] == backup.call_result
+    assert provider.get_hedge_stats() == (1,1,1,0)
+
+def test_rate_limited_primary_fails_over_without_waiting(node:FakeNode,backup:FakeNode) -> None:
+    node.script['eth_call'] = [lambda req: error(req,'limit exceeded',-32005)]
+    provider = RPCPoolProvider([node.url,backup.url],hedge_default_delay=5)
+    with provider.hedging():
+        response = provider.make_request('eth_call',CALL) # type: ignore
+        assert 'result' in response
+        assert provider.get_hedge_stats() == (1,0,1,1)
+        # a fast primary answers alone
+        provider.make_request('eth_call',CALL) # type: ignore
+    assert provider.get_hedge_stats() == (2,0,1,1)
+    assert backup.calls['eth_call'] == 1
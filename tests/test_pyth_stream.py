@@ -0,0 +1,68 @@
+import time
+import pytest
+
+from fwx.constant import PYTH_ID
+from fwx.pyth import (
+    HermesPriceStream,
+    create_pyth_update_data,
+)
+
+from stand_ins import (
+    HermesStreamServer,
+    price_entry,
+    price_message,
+)
+
+BTC = PYTH_ID['BTC']
+AVAX = PYTH_ID['AVAX']
+
+def wait_for(condition:object,timeout:float=2) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition(): # type: ignore
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_stream_fills_the_price_book(hermes:HermesStreamServer) -> None:
+    hermes.connections.append([price_message('01',price_entry(BTC,70_000*10**8,1)),
+                               price_message('02',price_entry(BTC,71_000*10**8,2),price_entry(AVAX,30*10**8,2))])
+    with HermesPriceStream(['0x' + BTC.upper(),AVAX],base_url=hermes.url,reconnect_delay=0.05) as stream:
+        assert stream.wait_ready(2)
+        wait_for(lambda: stream.price_book[BTC][1] == '02')
+        raw = stream.get_raw_pyth_data()
+        snapshot = stream.get_price_snapshot()
+        pyth_data = stream.get_pyth_data()
+    path,params,accept = hermes.requests[0]
+    assert path == '/v2/updates/price/stream'
+    assert params == [('ids[]',BTC),('ids[]',AVAX),('encoding','hex'),('parsed','true')]
+    assert accept == 'text/event-stream'
+    # both feeds came in the same update, so the payload carries that blob once
+    assert raw['binary']['data'] == ['02']
+    assert create_pyth_update_data(raw) == [bytes.fromhex('02')]
+    assert snapshot.get_price('BTC') == pytest.approx(71_000)
+    assert [p[0] for p in pyth_data] == [bytes.fromhex(BTC),bytes.fromhex(AVAX)]
+
+def test_older_prices_do_not_replace_newer(hermes:HermesStreamServer) -> None:
+    hermes.connections.append([price_message('02',price_entry(BTC,71_000*10**8,2)),
+                               price_message('01',price_entry(BTC,70_000*10**8,1))])
+    with HermesPriceStream([BTC],base_url=hermes.url,reconnect_delay=0.05) as stream:
+        assert stream.wait_ready(2)
+        # the stale message was sent last, so once the stream has reconnected it has been seen
+        wait_for(lambda: len(hermes.requests) >= 2)
+        assert stream.price_book[BTC] == (price_entry(BTC,71_000*10**8,2),'02')
+
+def test_stream_reconnects_after_hang_up_and_errors(hermes:HermesStreamServer) -> None:
+    hermes.status = 503
+    stream = HermesPriceStream([BTC,AVAX],base_url=hermes.url,reconnect_delay=0.05,max_reconnect_delay=0.1).start()
+    try:
+        assert not stream.wait_ready(0.2)
+        with pytest.raises(ValueError):
+            stream.get_raw_pyth_data()
+        assert len(hermes.requests) >= 2
+        hermes.connections += [[price_message('01',price_entry(BTC,70_000*10**8,1))],
+                               [price_message('02',price_entry(AVAX,30*10**8,1))]]
+        hermes.status = 200
+        assert stream.wait_ready(2)
+        assert stream.get_raw_pyth_data()['binary']['data'] == ['01','02']
+    finally:
+        stream.stop(2)
+    assert not stream.is_running
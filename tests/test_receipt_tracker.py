@@ -0,0 +1,79 @@
+from typing import Any
+import threading
+import time
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+
+from fwx.w3 import (
+    ReceiptTracker,
+    TransactionReverted,
+)
+
+from stand_ins import FakeNode
+
+TX_HASH = HexBytes('0x' + '12'*32)
+
+def failing_callback(called:threading.Event) -> Any:
+    def on_receipt(receipt:Any) -> None:
+        called.set()
+        raise RuntimeError('callback failed')
+    return on_receipt
+
+def test_revert_is_raised_when_the_callback_fails(node:FakeNode) -> None:
+    called = threading.Event()
+    tracker = ReceiptTracker(Web3(Web3.HTTPProvider(node.url)),on_receipt=failing_callback(called))
+    handle = tracker.track(TX_HASH)
+    node.receipts[TX_HASH.to_0x_hex()] = node.receipt(TX_HASH.to_0x_hex(),status=0)
+    with pytest.raises(TransactionReverted):
+        handle.result(timeout=5)
+    assert called.wait(5)
+
+def test_success_resolves_when_the_callback_fails(node:FakeNode) -> None:
+    called = threading.Event()
+    tracker = ReceiptTracker(Web3(Web3.HTTPProvider(node.url)),on_receipt=failing_callback(called))
+    handle = tracker.track(TX_HASH,decoder=lambda receipt: ['decoded'])
+    node.receipts[TX_HASH.to_0x_hex()] = node.receipt(TX_HASH.to_0x_hex())
+    assert handle.result(timeout=5)['status'] == 1
+    assert handle.events == ['decoded']
+    assert called.wait(5)
+
+def hashes(count:int) -> Any:
+    return [HexBytes(bytes([i + 1])*32) for i in range(count)]
+
+def test_outstanding_receipts_are_polled_in_one_batch(node:FakeNode) -> None:
+    tracker = ReceiptTracker(Web3(Web3.HTTPProvider(node.url)))
+    txn_hashes = hashes(3)
+    node.receipts[txn_hashes[0].to_0x_hex()] = node.receipt(txn_hashes[0].to_0x_hex())
+    receipts = tracker.fetch_receipts(txn_hashes)
+    assert receipts[txn_hashes[0]]['status'] == 1
+    assert receipts[txn_hashes[1]] is None and receipts[txn_hashes[2]] is None
+    assert node.batches == 1
+    assert node.calls['eth_getTransactionReceipt'] == 3
+
+def test_batching_is_retried_after_the_provider_rejects_it() -> None:
+    node = FakeNode(batch=False)
+    try:
+        tracker = ReceiptTracker(Web3(Web3.HTTPProvider(node.url)),batch_retry_interval=0.2)
+        txn_hashes = hashes(2)
+        assert tracker.fetch_receipts(txn_hashes) == {txn_hash:None for txn_hash in txn_hashes}
+        tracker.fetch_receipts(txn_hashes)
+        assert node.batches == 1
+        assert node.calls['eth_getTransactionReceipt'] == 4
+
+        node.batch = True
+        time.sleep(0.2)
+        tracker.fetch_receipts(txn_hashes)
+        assert node.batches == 2
+    finally:
+        node.close()
+
+def test_a_rate_limited_batch_does_not_disable_batching(node:FakeNode) -> None:
+    tracker = ReceiptTracker(Web3(Web3.HTTPProvider(node.url)))
+    txn_hashes = hashes(2)
+    node.rate_limited_batches = 1
+    with pytest.raises(Exception):
+        tracker.fetch_receipts(txn_hashes)
+    tracker.fetch_receipts(txn_hashes)
+    assert node.batches == 1
+    assert node.calls['eth_getTransactionReceipt'] == 2
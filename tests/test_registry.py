@@ -0,0 +1,41 @@
+import pytest
+
+from fwx.constant import PYTH_ID
+from fwx.registry import get_chain_registry
+
+REGISTRY = get_chain_registry(8453)
+BTC = REGISTRY.get_token('BTC')
+
+def test_registry_is_built_once_per_chain() -> None:
+    assert get_chain_registry('8453') is REGISTRY
+    assert REGISTRY.chain_id == 8453
+    with pytest.raises(ValueError,match='not found or not supported'):
+        get_chain_registry(1)
+
+def test_registry_rejects_mutation() -> None:
+    with pytest.raises(AttributeError):
+        REGISTRY.chain_id = 1
+    with pytest.raises(AttributeError):
+        REGISTRY.extra = 1 # type: ignore
+    with pytest.raises(AttributeError):
+        del REGISTRY.by_symbol
+    with pytest.raises(TypeError):
+        REGISTRY.by_symbol['BTC'] = REGISTRY.get_token('ETH') # type: ignore
+    with pytest.raises(TypeError):
+        REGISTRY.chain_detail.token_details['FAKE'] = BTC # type: ignore
+    assert REGISTRY.get_token('BTC') is BTC
+
+@pytest.mark.parametrize('key',['BTC',BTC.address,BTC.address.lower(),PYTH_ID['BTC'],'0x' + PYTH_ID['BTC'].upper()])
+def test_find_token_by_symbol_address_or_feed(key:str) -> None:
+    assert REGISTRY.find_token(key) is BTC
+
+@pytest.mark.parametrize('key',['btc','DOGE','0x' + '12'*20,'12'*32,''])
+def test_unknown_tokens_are_not_found(key:str) -> None:
+    assert REGISTRY.find_token(key) is None
+    with pytest.raises(ValueError,match='not found in chain 8453'):
+        REGISTRY.get_token(key)
+
+def test_get_symbol() -> None:
+    assert REGISTRY.get_symbol(BTC.address.lower()) == 'BTC'
+    with pytest.raises(ValueError):
+        REGISTRY.get_symbol('0x' + '12'*20)
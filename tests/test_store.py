@@ -0,0 +1,49 @@
+import pytest
+from web3 import Web3
+
+from fwx.contract import FWXPerpCoreContract
+from fwx.store import EventStore
+from fwx.w3 import get_rpc_detail
+
+from stand_ins import (
+    CORE_ADDRESS,
+    ChainNode,
+    close_log,
+    open_log,
+)
+
+@pytest.fixture
+def core(chain:ChainNode) -> FWXPerpCoreContract:
+    return FWXPerpCoreContract(Web3(Web3.HTTPProvider(chain.url)),get_rpc_detail(chain.url,chain_id=8453),Web3.to_checksum_address(CORE_ADDRESS))
+
+def test_sync_stops_short_of_the_head(chain:ChainNode,core:FWXPerpCoreContract) -> None:
+    for pos_id in range(1,21):
+        chain.mine([open_log(7,pos_id)])
+    store = EventStore()
+    assert store.sync(core,from_block=0,confirmations=5) == 15
+    assert store.get_last_synced_block(core.address) == 14
+    chain.mine()
+    assert store.sync(core,confirmations=5) == 1
+
+def test_sync_rolls_back_a_reorged_head(chain:ChainNode,core:FWXPerpCoreContract) -> None:
+    for pos_id in range(1,11):
+        chain.mine([open_log(7,pos_id)])
+    store = EventStore()
+    store.sync(core,from_block=0,confirmations=0)
+    assert store.count_events() == 10
+
+    # blocks 7 to 9 are replaced; block 6 and below are unchanged
+    chain.reorg(7,[[close_log(7,1)],[],[],[]])
+    store.sync(core,confirmations=0)
+    events = [(e.event,e.block_number,e.args.pos_id) for e in store.get_events(from_block=5)]
+    assert events == [('OpenPosition',5,6),('OpenPosition',6,7),('ClosePosition',7,1)]
+    assert store.get_last_synced_block(core.address) == 10
+
+def test_sync_resumes_quietly_when_the_head_is_unchanged(chain:ChainNode,core:FWXPerpCoreContract) -> None:
+    chain.mine([open_log(7,1)])
+    chain.mine()
+    store = EventStore()
+    store.sync(core,from_block=0,confirmations=0)
+    chain.mine([open_log(7,2)])
+    assert store.sync(core,confirmations=0) == 1
+    assert store.count_events() == 2